@@ -0,0 +1,65 @@
+'''
+Business: Именованные запросы функции payment-details для реестра подготовленных выражений
+Args: нет
+Returns: Statement для statements.execute(); PD_BULK_* - SQL и шаблоны строк для execute_values
+'''
+
+from statements import statement
+
+PD_GET = statement('pd_get', """
+    SELECT id, recipient_name, account_number, currency, is_active, created_at, weight, daily_cap_cny
+    FROM payment_details WHERE id = $1
+""")
+
+PD_LIST = statement('pd_list', """
+    SELECT id, recipient_name, account_number, currency, is_active, created_at, weight, daily_cap_cny
+    FROM payment_details ORDER BY created_at DESC
+""")
+
+PD_INSERT = statement('pd_insert', """
+    INSERT INTO payment_details (recipient_name, account_number, currency, is_active, weight, daily_cap_cny)
+    VALUES ($1, $2, $3, true, $4::int, NULLIF($5::numeric, 0))
+    RETURNING id, recipient_name, account_number, currency, is_active, created_at, weight, daily_cap_cny
+""")
+
+# weight и daily_cap_cny: NULL - оставить как было (админка их не отправляет), лимит 0 - снять
+PD_UPDATE = statement('pd_update', """
+    UPDATE payment_details
+    SET recipient_name = $1, account_number = $2, currency = $3, is_active = $4, updated_at = NOW(),
+        weight = COALESCE($6::int, weight),
+        daily_cap_cny = CASE WHEN $7::numeric IS NULL THEN daily_cap_cny ELSE NULLIF($7::numeric, 0) END
+    WHERE id = $5
+    RETURNING id, recipient_name, account_number, currency, is_active, created_at, weight, daily_cap_cny
+""")
+
+PD_DELETE = statement('pd_delete', """
+    DELETE FROM payment_details WHERE id = $1
+""")
+
+# Пакетные варианты для execute_values: одна команда на всю пачку вместо запроса на строку.
+# id из последовательности растут в порядке VALUES, поэтому ORDER BY id возвращает строки в порядке пачки
+PD_BULK_INSERT = """
+    WITH ins AS (
+        INSERT INTO payment_details (recipient_name, account_number, currency, is_active, weight, daily_cap_cny)
+        VALUES %s
+        RETURNING id, recipient_name, account_number, currency, is_active, created_at, weight, daily_cap_cny
+    )
+    SELECT * FROM ins ORDER BY id
+"""
+PD_BULK_INSERT_TEMPLATE = '(%s, %s, %s, true, %s::int, NULLIF(%s::numeric, 0))'
+
+PD_BULK_UPDATE = """
+    UPDATE payment_details pd
+    SET recipient_name = v.recipient_name, account_number = v.account_number, currency = v.currency,
+        is_active = v.is_active, updated_at = NOW(), weight = COALESCE(v.weight, pd.weight),
+        daily_cap_cny = CASE WHEN v.daily_cap_cny IS NULL THEN pd.daily_cap_cny ELSE NULLIF(v.daily_cap_cny, 0) END
+    FROM (VALUES %s) AS v(id, recipient_name, account_number, currency, is_active, weight, daily_cap_cny)
+    WHERE pd.id = v.id
+    RETURNING pd.id, pd.recipient_name, pd.account_number, pd.currency, pd.is_active, pd.created_at,
+              pd.weight, pd.daily_cap_cny
+"""
+PD_BULK_UPDATE_TEMPLATE = '(%s::int, %s::varchar, %s::varchar, %s::varchar, %s::boolean, %s::int, %s::numeric)'
+
+PD_BULK_DELETE = """
+    DELETE FROM payment_details WHERE id = ANY(%s::int[]) RETURNING id
+"""
@@ -0,0 +1,235 @@
+'''
+Business: Обработчики методов API реквизитов; index.py импортирует модуль при первом запросе, не на холодном старте
+Args: event, context - как у handler в index.py
+Returns: get / post / put / delete - HTTP response dict
+'''
+
+from decimal import Decimal
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+from psycopg2.extensions import connection as PgConnection, cursor as PgCursor
+from psycopg2.extras import execute_values
+
+from bulk import Outcome, Writer, parse_bulk, run_bulk
+from db import connection, replica_allowed
+from metrics import phase
+from queries import (
+    PD_BULK_DELETE, PD_BULK_INSERT, PD_BULK_INSERT_TEMPLATE, PD_BULK_UPDATE, PD_BULK_UPDATE_TEMPLATE,
+    PD_DELETE, PD_GET, PD_INSERT, PD_LIST, PD_UPDATE
+)
+from runtime import (
+    CORS_HEADERS, dumps, error, json_body, parse_fields, project, respond, respond_negotiated, respond_raw
+)
+from statements import execute
+from versions import cached_body, collection_version, etag, not_modified, remember_body, variant_key
+
+# Доля реквизита в распределении пополнений и дневной лимит в CNY (NUMERIC(12, 2)), см. transactions/allocation.py
+MAX_WEIGHT = 1000
+MAX_DAILY_CAP_CNY = Decimal('9999999999.99')
+VERSIONED_BY = ('payment_details',)
+LIST_KEY = variant_key('payment_details', {})
+# Поля реквизита, которые можно запросить через ?fields=
+DETAIL_FIELDS = ('id', 'recipient_name', 'account_number', 'currency', 'is_active', 'created_at', 'weight', 'daily_cap_cny')
+# no-cache: браузер хранит ответ, но каждый раз переспрашивает с If-None-Match и получает 304
+CACHE_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Expose-Headers': 'ETag',
+    'Cache-Control': 'no-cache',
+    # Тело листинга может прийти сжатым: промежуточные кэши различают варианты по Accept-Encoding
+    'Vary': 'Accept-Encoding'
+}
+
+def serialize(row: Tuple) -> Dict[str, Any]:
+    return {
+        'id': row[0],
+        'recipient_name': row[1],
+        'account_number': row[2],
+        'currency': row[3],
+        'is_active': row[4],
+        'created_at': row[5].isoformat() if row[5] else None,
+        'weight': row[6],
+        'daily_cap_cny': float(row[7]) if row[7] is not None else None
+    }
+
+def text_field(item: Dict[str, Any], name: str, default: str, max_length: int) -> str:
+    value = item.get(name, default)
+    if not isinstance(value, str) or len(value) > max_length:
+        raise ValueError(f'{name} must be a string up to {max_length} characters')
+    return value
+
+def allocation_fields(item: Dict[str, Any], default_weight: Optional[int]) -> Tuple[Optional[int], Optional[Decimal]]:
+    '''weight и daily_cap_cny; None в PUT - оставить прежние, daily_cap_cny = 0 - без лимита'''
+    weight = item.get('weight')
+    if weight is None:
+        weight = default_weight
+    elif isinstance(weight, bool) or not isinstance(weight, int) or not 0 < weight <= MAX_WEIGHT:
+        raise ValueError(f'weight must be an integer 1..{MAX_WEIGHT}')
+    cap = item.get('daily_cap_cny')
+    if cap is not None:
+        if isinstance(cap, bool) or not isinstance(cap, (int, float)) or not 0 <= cap <= MAX_DAILY_CAP_CNY:
+            raise ValueError('daily_cap_cny must be a non-negative amount in CNY')
+        cap = Decimal(str(cap))
+    return weight, cap
+
+def validate_new(item: Dict[str, Any]) -> Tuple[str, str, str, Optional[int], Optional[Decimal]]:
+    '''Те же значения по умолчанию, что у одиночного POST; длины - из схемы, чтобы не ловить их ошибкой БД'''
+    return (
+        text_field(item, 'recipient_name', '', 255),
+        text_field(item, 'account_number', '', 255),
+        text_field(item, 'currency', 'CNY', 10),
+    ) + allocation_fields(item, 1)
+
+def validate_update(item: Dict[str, Any]) -> Tuple[int, str, str, str, bool, Optional[int], Optional[Decimal]]:
+    is_active = item.get('is_active', True)
+    if not isinstance(is_active, bool):
+        raise ValueError('is_active must be a boolean')
+    return (
+        int(item['id']),
+        text_field(item, 'recipient_name', '', 255),
+        text_field(item, 'account_number', '', 255),
+        text_field(item, 'currency', '', 10),
+        is_active,
+    ) + allocation_fields(item, None)
+
+def write_inserts(cur: PgCursor, rows: List[Tuple]) -> List[Outcome]:
+    inserted = execute_values(cur, PD_BULK_INSERT, rows, template=PD_BULK_INSERT_TEMPLATE, page_size=len(rows), fetch=True)
+    return [(201, serialize(row)) for row in inserted]
+
+def write_updates(cur: PgCursor, rows: List[Tuple]) -> List[Outcome]:
+    updated = execute_values(cur, PD_BULK_UPDATE, rows, template=PD_BULK_UPDATE_TEMPLATE, page_size=len(rows), fetch=True)
+    by_id = {row[0]: serialize(row) for row in updated}
+    return [(200, by_id[row[0]]) if row[0] in by_id else (404, 'Payment detail not found') for row in rows]
+
+def write_deletes(cur: PgCursor, ids: List[int]) -> List[Outcome]:
+    # Реквизиты, на которые ссылаются транзакции, удалить нельзя: в partial-режиме упадут только они
+    cur.execute(PD_BULK_DELETE, (ids,))
+    deleted = {row[0] for row in cur.fetchall()}
+    return [(200, {'id': detail_id}) if detail_id in deleted else (404, 'Payment detail not found') for detail_id in ids]
+
+def bulk_write(conn: PgConnection, items: List[Any], atomic: bool, validate: Callable[[Any], Any], write: Writer) -> Dict[str, Any]:
+    '''Вся пачка - одна транзакция и один коммит вместо запроса и коммита на каждую строку'''
+    with conn.cursor() as cur:
+        status_code, result = run_bulk(cur, items, atomic, validate, write)
+    conn.commit()
+    return respond(status_code, result)
+
+def parse_bulk_request(event: Dict[str, Any]) -> Optional[Tuple[List[Any], bool]]:
+    '''Пачка из тела POST/PUT/DELETE или из ?ids= у DELETE; None - одиночный запрос'''
+    query_params = event.get('queryStringParameters', {}) or {}
+    if event.get('httpMethod') == 'DELETE':
+        if query_params.get('ids'):
+            return parse_bulk({'items': query_params['ids'].split(','), 'mode': query_params.get('mode')})
+        if not event.get('body'):
+            return None
+    return parse_bulk(json_body(event))
+
+def get(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    query_params = event.get('queryStringParameters', {}) or {}
+    detail_id = query_params.get('id')
+    try:
+        fields = parse_fields(query_params, DETAIL_FIELDS)
+    except ValueError as e:
+        return error(400, str(e))
+    list_key = variant_key('payment_details', {'fields': ','.join(fields)}) if fields else LIST_KEY
+    
+    with connection(readonly=replica_allowed(event)) as conn:
+        if detail_id:
+            with conn.cursor() as cur:
+                execute(cur, PD_GET, [detail_id])
+                row = cur.fetchone()
+            
+                if row:
+                    return respond(200, project([serialize(row)], fields)[0])
+    
+        with conn.cursor() as cur:
+            # Версия коллекции — один поиск по PK; полный список читается только при её смене
+            version = collection_version(cur, VERSIONED_BY)
+            list_etag = etag(list_key, version)
+            if not_modified(event, list_etag):
+                return respond_raw(304, '', {**CACHE_HEADERS, 'ETag': list_etag})
+            
+            body = cached_body(list_key, version)
+            if body is None:
+                execute(cur, PD_LIST)
+                rows = cur.fetchall()
+            
+                with phase('serialize'):
+                    body = dumps(project([serialize(row) for row in rows], fields))
+                remember_body(list_key, version, body)
+    
+    headers = {**CACHE_HEADERS, 'Content-Type': 'application/json', 'ETag': list_etag}
+    return respond_negotiated(event, 200, body, headers, reuse=True)
+
+def post(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    try:
+        bulk = parse_bulk_request(event)
+        if bulk is None:
+            body_data = json_body(event)
+            recipient_name = body_data.get('recipient_name', '')
+            account_number = body_data.get('account_number', '')
+            currency = body_data.get('currency', 'CNY')
+            weight, daily_cap_cny = allocation_fields(body_data, 1)
+    except ValueError as e:
+        return error(400, str(e))
+    
+    with connection() as conn:
+        if bulk is not None:
+            items, atomic = bulk
+            return bulk_write(conn, items, atomic, validate_new, write_inserts)
+        
+        with conn.cursor() as cur:
+            execute(cur, PD_INSERT, [recipient_name, account_number, currency, weight, daily_cap_cny])
+            row = cur.fetchone()
+            conn.commit()
+    
+    return respond(201, serialize(row))
+
+def put(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    try:
+        bulk = parse_bulk_request(event)
+        if bulk is None:
+            body_data = json_body(event)
+            detail_id = body_data.get('id')
+            recipient_name = body_data.get('recipient_name', '')
+            account_number = body_data.get('account_number', '')
+            currency = body_data.get('currency', '')
+            is_active = body_data.get('is_active', True)
+            weight, daily_cap_cny = allocation_fields(body_data, None)
+    except ValueError as e:
+        return error(400, str(e))
+    
+    with connection() as conn:
+        if bulk is not None:
+            items, atomic = bulk
+            return bulk_write(conn, items, atomic, validate_update, write_updates)
+        
+        with conn.cursor() as cur:
+            execute(
+                cur,
+                PD_UPDATE,
+                [recipient_name, account_number, currency, is_active, detail_id, weight, daily_cap_cny]
+            )
+            row = cur.fetchone()
+            conn.commit()
+    
+    if row:
+        return respond(200, serialize(row))
+    return error(404, 'Payment detail not found')
+
+def delete(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    try:
+        bulk = parse_bulk_request(event)
+    except ValueError as e:
+        return error(400, str(e))
+    
+    with connection() as conn:
+        if bulk is not None:
+            items, atomic = bulk
+            return bulk_write(conn, items, atomic, int, write_deletes)
+        
+        query_params = event.get('queryStringParameters', {}) or {}
+        with conn.cursor() as cur:
+            execute(cur, PD_DELETE, [query_params.get('id')])
+            conn.commit()
+    
+    return respond_raw(204, '', CORS_HEADERS)
@@ -0,0 +1,68 @@
+'''
+Business: Реестр именованных параметризованных запросов, подготовленных один раз на соединение пула
+Args: statement(name, sql) - регистрирует запрос с плейсхолдерами $1..$n
+Returns: execute() - выполняет EXECUTE с привязанными параметрами, при первом вызове на соединении делает PREPARE
+'''
+
+import re
+import threading
+import weakref
+from typing import Any, Dict, NamedTuple, Sequence
+
+import psycopg2
+from psycopg2.extensions import connection as PgConnection, cursor as PgCursor
+
+from metrics import phase
+
+PLACEHOLDER_RE = re.compile(r'\$(\d+)')
+PREPARED = 'prepared'
+UNKNOWN = 'unknown'
+
+
+class Statement(NamedTuple):
+    name: str
+    sql: str
+    arity: int
+
+
+_registry: Dict[str, Statement] = {}
+_registry_lock = threading.Lock()
+# PREPARE живёт в сессии Postgres, поэтому учёт ведём по объекту соединения
+_prepared: 'weakref.WeakKeyDictionary[PgConnection, Dict[str, str]]' = weakref.WeakKeyDictionary()
+
+
+def statement(name: str, sql: str) -> Statement:
+    '''Регистрирует запрос; повторная регистрация с тем же именем возвращает уже известный'''
+    stmt = _registry.get(name)
+    if stmt is None:
+        with _registry_lock:
+            stmt = _registry.get(name)
+            if stmt is None:
+                arity = max((int(n) for n in PLACEHOLDER_RE.findall(sql)), default=0)
+                stmt = _registry[name] = Statement(name, sql, arity)
+    return stmt
+
+
+def execute(cur: PgCursor, stmt: Statement, params: Sequence[Any] = ()) -> None:
+    '''PREPARE (если нужно) и EXECUTE уходят одним round trip'''
+    if len(params) != stmt.arity:
+        raise ValueError(f'{stmt.name} expects {stmt.arity} params, got {len(params)}')
+    prepared = _prepared.setdefault(cur.connection, {})
+    state = prepared.get(stmt.name)
+    if state == UNKNOWN:
+        cur.execute('SELECT 1 FROM pg_prepared_statements WHERE name = %s', (stmt.name,))
+        state = PREPARED if cur.fetchone() else None
+
+    sql = f'EXECUTE {stmt.name}'
+    if stmt.arity:
+        sql += ' (' + ', '.join(['%s'] * stmt.arity) + ')'
+    if state != PREPARED:
+        sql = f'PREPARE {stmt.name} AS {stmt.sql}; ' + sql
+    try:
+        with phase('db_query'):
+            cur.execute(sql, params or None)
+    except psycopg2.Error:
+        # PREPARE не транзакционный и мог пережить ошибку в EXECUTE — проверим при следующем вызове
+        prepared[stmt.name] = PREPARED if state == PREPARED else UNKNOWN
+        raise
+    prepared[stmt.name] = PREPARED
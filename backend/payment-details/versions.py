@@ -0,0 +1,77 @@
+'''
+Business: Условный GET: ETag из счётчика версий коллекций и кэш сериализованного ответа в памяти процесса
+Args: COLLECTION_BODY_CACHE_SIZE - сколько вариантов ответа (коллекция + параметры запроса) держать в кэше
+Returns: collection_version() - сумма слотов одним чтением по PK; etag()/not_modified() для 304; cached_body()/remember_body()
+'''
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+from psycopg2.extensions import cursor as PgCursor
+
+from statements import execute, statement
+
+COLLECTION_BODY_CACHE_SIZE = int(os.environ.get('COLLECTION_BODY_CACHE_SIZE', '64'))
+
+# Счётчики увеличивают триггеры из V0009 (по слоту на соединение, V0014); сумма слотов всех коллекций
+# растёт при записи в любую из таблиц
+COLLECTION_VERSION = statement('collection_version', """
+    SELECT COALESCE(SUM(version), 0) FROM collection_versions WHERE name = ANY($1::varchar[])
+""")
+
+_bodies: 'OrderedDict[str, Tuple[int, str]]' = OrderedDict()
+_bodies_lock = threading.Lock()
+
+
+def collection_version(cur: PgCursor, names: Sequence[str]) -> int:
+    execute(cur, COLLECTION_VERSION, [list(names)])
+    return int(cur.fetchone()[0])
+
+
+def variant_key(collection: str, query_params: Dict[str, Any]) -> str:
+    '''Один и тот же набор параметров в любом порядке даёт один ключ'''
+    canonical = '&'.join(f'{key}={value}' for key, value in sorted(query_params.items()))
+    return f"{collection}?{canonical}"
+
+
+def etag(key: str, version: int) -> str:
+    # Слабый ETag: тело одно и то же, а сжатие и заголовки поверх него могут отличаться
+    return f'W/"{version}-{hashlib.sha1(key.encode()).hexdigest()[:12]}"'
+
+
+def not_modified(event: Dict[str, Any], current: str) -> bool:
+    if_none_match = None
+    for name, value in (event.get('headers') or {}).items():
+        if name.lower() == 'if-none-match':
+            if_none_match = value
+            break
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    # Сравнение для If-None-Match всегда слабое: W/ не учитываем
+    current = current[2:] if current.startswith('W/') else current
+    return any(
+        (tag[2:] if tag.startswith('W/') else tag) == current
+        for tag in (part.strip() for part in if_none_match.split(','))
+    )
+
+
+def cached_body(key: str, version: int) -> Optional[str]:
+    with _bodies_lock:
+        entry = _bodies.get(key)
+        if entry is None or entry[0] != version:
+            return None
+        _bodies.move_to_end(key)
+        return entry[1]
+
+
+def remember_body(key: str, version: int, body: str) -> None:
+    with _bodies_lock:
+        _bodies[key] = (version, body)
+        _bodies.move_to_end(key)
+        while len(_bodies) > COLLECTION_BODY_CACHE_SIZE:
+            _bodies.popitem(last=False)
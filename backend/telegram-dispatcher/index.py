@@ -0,0 +1,20 @@
+'''
+Business: Разбор очереди telegram_outbox пачками с учётом лимитов Telegram Bot API
+Args: event - вызов по таймеру или POST (ручной запуск); context - object с request_id
+Returns: HTTP response dict со счётчиками sent/retried/deferred/released/failed
+'''
+from typing import Any, Dict
+
+from metrics import instrumented
+from runtime import Api, lazy, timer_event
+
+# requests и psycopg2 импортируются при первом запуске: preflight и 405 отвечают без них
+run = lazy('routes', 'post')
+# Из HTTP очередь разбирает только POST: GET и HEAD от краулеров и проверок живости получают 405
+api = Api({'POST': run})
+
+@instrumented('telegram-dispatcher')
+def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    if timer_event(event):
+        return run(event, context)
+    return api(event, context)
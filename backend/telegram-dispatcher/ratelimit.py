@@ -0,0 +1,39 @@
+'''
+Business: Token bucket для лимитов Telegram Bot API (глобальный и на чат)
+Args: rate - токенов в секунду, capacity - размер всплеска
+Returns: TokenBucket.wait_time() / take() / block()
+'''
+
+import time
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def wait_time(self) -> float:
+        '''Сколько секунд ждать до следующего токена; 0 - можно отправлять сейчас'''
+        now = time.monotonic()
+        self._refill(now)
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self) -> None:
+        self._refill(time.monotonic())
+        self.tokens -= 1
+
+    def block(self, seconds: float) -> None:
+        '''retry_after из ответа 429: Telegram сам сказал, сколько молчать'''
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.tokens = 0
@@ -0,0 +1,246 @@
+'''
+Business: Разбор очереди telegram_outbox пачками с учётом лимитов Telegram Bot API; index.py импортирует модуль
+          (requests, psycopg2) при первом запуске, не на холодном старте
+Args: event, context - как у handler в index.py
+Returns: post - HTTP response dict со счётчиками sent/retried/deferred/released/failed
+'''
+import json
+import os
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+from psycopg2.extras import execute_batch
+
+from db import connection
+from metrics import phase
+from ratelimit import TokenBucket
+from runtime import error, respond
+
+TELEGRAM_API_URL = os.environ.get('TELEGRAM_API_URL', 'https://api.telegram.org')
+OUTBOX_BATCH_SIZE = int(os.environ.get('OUTBOX_BATCH_SIZE', '50'))
+OUTBOX_LEASE_SECONDS = int(os.environ.get('OUTBOX_LEASE_SECONDS', '60'))
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get('OUTBOX_MAX_ATTEMPTS', '8'))
+DISPATCH_TIME_BUDGET = float(os.environ.get('DISPATCH_TIME_BUDGET', '50'))
+# Меньше этого до конца бюджета новую отправку не начинаем: запись возвращается в очередь без траты попытки
+DISPATCH_SEND_RESERVE = float(os.environ.get('DISPATCH_SEND_RESERVE', '0.5'))
+BACKOFF_BASE_SECONDS = 2.0
+BACKOFF_MAX_SECONDS = 600.0
+
+# Лимиты Telegram: ~30 сообщений в секунду на бота, 1 в секунду в личный чат, 20 в минуту в группу
+GLOBAL_BUCKET = TokenBucket(rate=30, capacity=30)
+_chat_buckets: Dict[str, TokenBucket] = {}
+# Сессия и бакеты живут между тёплыми вызовами: keep-alive до api.telegram.org и память о 429
+_session = requests.Session()
+
+Outcome = Tuple[str, float, Optional[str], Optional[Dict[str, Any]]]
+
+
+def chat_bucket(chat_id: str) -> TokenBucket:
+    bucket = _chat_buckets.get(chat_id)
+    if bucket is None:
+        if chat_id.startswith('-'):
+            bucket = TokenBucket(rate=20 / 60, capacity=20)
+        else:
+            bucket = TokenBucket(rate=1, capacity=3)
+        _chat_buckets[chat_id] = bucket
+    return bucket
+
+
+def backoff(attempts: int) -> float:
+    return min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS ** attempts)
+
+
+def claim_batch(limit: int) -> List[Tuple]:
+    '''Забираем пачку под аренду: упавший диспетчер не держит записи дольше OUTBOX_LEASE_SECONDS'''
+    with connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                UPDATE telegram_outbox o
+                SET attempts = o.attempts + 1,
+                    next_attempt_at = NOW() + make_interval(secs => %s)
+                WHERE o.id IN (
+                    SELECT id FROM telegram_outbox
+                    WHERE status = 'pending' AND next_attempt_at <= NOW()
+                    ORDER BY next_attempt_at, id
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING o.id, o.method, o.chat_id, o.payload, o.photo,
+                          o.photo_filename, o.photo_content_type, o.attempts, o.content_sha256
+                """,
+                (OUTBOX_LEASE_SECONDS, limit)
+            )
+            rows = cur.fetchall()
+        conn.commit()
+    return sorted(rows, key=lambda row: row[0])
+
+
+def known_file_ids(batch: List[Tuple]) -> Dict[str, str]:
+    '''file_id уже загруженных в Telegram картинок из пачки: одна выборка на пачку'''
+    hashes = list({row[8] for row in batch if row[8] and row[4] is not None})
+    if not hashes:
+        return {}
+    with connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT content_sha256, file_id FROM telegram_files WHERE content_sha256 = ANY(%s)",
+                (hashes,)
+            )
+            return dict(cur.fetchall())
+
+
+def uploaded_file(result: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    '''Самый крупный из размеров, которые Telegram вернул на sendPhoto'''
+    photos = result.get('photo') if isinstance(result, dict) else None
+    return photos[-1] if photos else None
+
+
+def post(bot_token: str, method: str, payload: Dict[str, Any], photo: Optional[Tuple[str, bytes, str]],
+         deadline: float) -> Tuple[int, Dict[str, Any]]:
+    url = f"{TELEGRAM_API_URL}/bot{bot_token}/{method}"
+    # Таймауты урезаны до остатка бюджета: медленный Telegram не растянет вызов за DISPATCH_TIME_BUDGET
+    remaining = max(deadline - time.monotonic(), 0.1)
+    with phase('telegram'):
+        if photo is not None:
+            data = {key: value if isinstance(value, str) else json.dumps(value) for key, value in payload.items()}
+            response = _session.post(url, data=data, files={'photo': photo}, timeout=(min(3.05, remaining), min(20, remaining)))
+        else:
+            response = _session.post(url, json=payload, timeout=(min(3.05, remaining), min(10, remaining)))
+    try:
+        return response.status_code, response.json()
+    except ValueError:
+        return response.status_code, {'ok': False, 'description': response.text[:500]}
+
+
+def deliver(bot_token: str, row: Tuple, known_files: Dict[str, str], deadline: float) -> Outcome:
+    '''Возвращает (итог, через сколько секунд повторить, ошибка, ответ Telegram)'''
+    _, method, chat_id, payload, photo, photo_filename, photo_content_type, attempts, content_sha256 = row
+
+    wait = chat_bucket(chat_id).wait_time()
+    if wait > 0:
+        # Этот чат упёрся в лимит — откладываем без траты попытки, остальные чаты едут дальше
+        return 'deferred', wait, None, None
+
+    wait = GLOBAL_BUCKET.wait_time()
+    if wait > 0:
+        time.sleep(wait)
+    if deadline - time.monotonic() < DISPATCH_SEND_RESERVE:
+        # Бюджет вызова исчерпан — отдаём запись следующему запуску сразу, не дожидаясь конца аренды
+        return 'released', 0.0, None, None
+    GLOBAL_BUCKET.take()
+    chat_bucket(chat_id).take()
+
+    upload = (photo_filename or 'photo.jpg', bytes(photo), photo_content_type or 'image/jpeg') if photo is not None else None
+    file_id = known_files.get(content_sha256) if content_sha256 else None
+    try:
+        if file_id and upload:
+            # Картинку с таким хэшем Telegram уже хранит — отправляем file_id вместо мегабайт
+            status, body = post(bot_token, method, {**payload, 'photo': file_id}, None, deadline)
+            if status == 400:
+                # file_id протух — забываем его и загружаем заново
+                known_files.pop(content_sha256, None)
+                status, body = post(bot_token, method, payload, upload, deadline)
+        else:
+            status, body = post(bot_token, method, payload, upload, deadline)
+    except requests.RequestException as e:
+        return 'retry', backoff(attempts), str(e), None
+
+    if status == 200 and body.get('ok'):
+        uploaded = uploaded_file(body.get('result')) if content_sha256 else None
+        if uploaded:
+            known_files[content_sha256] = uploaded['file_id']
+        return 'sent', 0.0, None, body.get('result')
+    if status == 429:
+        retry_after = float((body.get('parameters') or {}).get('retry_after', backoff(attempts)))
+        chat_bucket(chat_id).block(retry_after)
+        return 'retry', retry_after, body.get('description'), None
+    if status >= 500:
+        return 'retry', backoff(attempts), body.get('description'), None
+    # 400/403: неверный запрос или бот удалён из чата — повтор не поможет
+    return 'failed', 0.0, body.get('description'), None
+
+
+def record(results: List[Tuple[Tuple, Outcome]]) -> None:
+    updates = []
+    for row, (outcome, delay, error, result) in results:
+        attempts = row[7]
+        if outcome == 'retry' and attempts >= OUTBOX_MAX_ATTEMPTS:
+            outcome = 'failed'
+        status = outcome if outcome in ('sent', 'failed') else 'pending'
+        updates.append((
+            status,
+            delay,
+            1 if outcome in ('deferred', 'released') else 0,
+            error,
+            json.dumps(result) if result is not None else None,
+            outcome,
+            row[0],
+        ))
+
+    files = []
+    for row, (outcome, _, _, result) in results:
+        uploaded = uploaded_file(result) if outcome == 'sent' and row[8] else None
+        if uploaded:
+            files.append((row[8], uploaded['file_id'], uploaded.get('file_unique_id'), uploaded.get('file_size')))
+
+    with connection() as conn:
+        with conn.cursor() as cur:
+            execute_batch(
+                cur,
+                """
+                UPDATE telegram_outbox
+                SET status = %s,
+                    next_attempt_at = NOW() + make_interval(secs => %s),
+                    attempts = attempts - %s,
+                    last_error = %s,
+                    response = %s,
+                    sent_at = CASE WHEN %s = 'sent' THEN NOW() END
+                WHERE id = %s
+                """,
+                updates
+            )
+            if files:
+                # Запоминаем file_id первой загрузки: повторные отправки того же контента пойдут без байтов
+                execute_batch(
+                    cur,
+                    """
+                    INSERT INTO telegram_files (content_sha256, file_id, file_unique_id, byte_size)
+                    VALUES (%s, %s, %s, %s)
+                    ON CONFLICT (content_sha256) DO UPDATE SET file_id = EXCLUDED.file_id
+                    """,
+                    files
+                )
+        conn.commit()
+
+
+def post(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    bot_token = os.environ.get('TELEGRAM_BOT_TOKEN')
+    if not bot_token:
+        return error(500, 'Bot token not configured')
+
+    stats: Counter = Counter()
+    deadline = time.monotonic() + DISPATCH_TIME_BUDGET
+    while deadline - time.monotonic() >= DISPATCH_SEND_RESERVE:
+        batch = claim_batch(OUTBOX_BATCH_SIZE)
+        if not batch:
+            break
+        known_files = known_file_ids(batch)
+        # Остаток бюджета проверяется перед каждой отправкой, не только между пачками
+        results = [(row, deliver(bot_token, row, known_files, deadline)) for row in batch]
+        record(results)
+        outcomes = [outcome for _, (outcome, _, _, _) in results]
+        stats.update(outcomes)
+        if all(outcome == 'deferred' for outcome in outcomes):
+            # Вся пачка упёрлась в лимиты чатов — дальше крутить цикл бессмысленно
+            break
+
+    return respond(200, {
+        'sent': stats['sent'],
+        'retried': stats['retry'],
+        'deferred': stats['deferred'],
+        'released': stats['released'],
+        'failed': stats['failed']
+    })
@@ -0,0 +1,116 @@
+'''
+Business: Предобработка скриншотов и QR-кодов перед отправкой в Telegram
+Args: data URL или голый base64 из тела запроса
+Returns: JPEG с ограниченными размерами и качеством без метаданных (или исходный файл, если он уже такой и не больше)
+         и статистику сэкономленных байт
+'''
+
+import binascii
+import io
+import os
+from typing import Any, Dict, Optional, Tuple
+
+from PIL import Image, ImageOps
+
+MAX_UPLOAD_BYTES = int(os.environ.get('PROOF_MAX_UPLOAD_BYTES', str(10 * 1024 * 1024)))
+MAX_DIMENSION = int(os.environ.get('PROOF_MAX_DIMENSION', '2560'))
+JPEG_QUALITY = int(os.environ.get('PROOF_JPEG_QUALITY', '85'))
+# Защита от «декомпрессионных бомб»: крошечный PNG может распаковаться в гигабайты пикселей
+Image.MAX_IMAGE_PIXELS = 50_000_000
+
+SIGNATURES = (
+    (b'\xff\xd8\xff', 'jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+)
+# Форматы, которые sendPhoto принимает как есть: такой файл можно отправить без перекодирования
+PASSTHROUGH_TYPES = {'jpeg': 'image/jpeg', 'png': 'image/png', 'gif': 'image/gif'}
+# Ключи Image.info, в которых Pillow отдаёт EXIF, XMP, комментарии и прочие метаданные
+METADATA_KEYS = ('exif', 'xmp', 'XML:com.adobe.xmp', 'comment', 'photoshop', 'iptc')
+
+
+class ImageRejected(ValueError):
+    def __init__(self, status_code: int, message: str) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def sniff(head: bytes) -> Optional[str]:
+    '''Тип по сигнатуре, а не по префиксу data URL, которому нельзя доверять'''
+    for signature, kind in SIGNATURES:
+        if head.startswith(signature):
+            return kind
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'webp'
+    return None
+
+
+def decode_data_url(data_url: str) -> bytes:
+    '''Проверяет размер и тип до полного декодирования; срез после префикса data URL - единственная копия base64'''
+    start = data_url.find(',') + 1
+    encoded_len = len(data_url) - start
+    if encoded_len * 3 // 4 > MAX_UPLOAD_BYTES:
+        raise ImageRejected(413, f'Image is larger than {MAX_UPLOAD_BYTES} bytes')
+
+    # 16 символов base64 = 12 байт: хватает на любую сигнатуру
+    if sniff(_a2b_base64(data_url[start:start + 16])) is None:
+        raise ImageRejected(415, 'Unsupported image type')
+    return _a2b_base64(data_url[start:])
+
+
+def _a2b_base64(encoded: str) -> bytes:
+    try:
+        return binascii.a2b_base64(encoded)
+    except ValueError:
+        # binascii.Error и не-ASCII символы в строке; ImageRejected сюда не попадает
+        raise ImageRejected(400, 'Image is not valid base64')
+
+
+def has_metadata(image: Image.Image) -> bool:
+    # У PNG текстовые чанки (tEXt, iTXt) лежат в image.text
+    return any(key in image.info for key in METADATA_KEYS) or bool(getattr(image, 'text', None))
+
+
+def preprocess(raw: bytes) -> Tuple[bytes, Dict[str, Any]]:
+    '''Уменьшает до MAX_DIMENSION по большей стороне и перекодирует в JPEG без EXIF и прочих метаданных.
+    Исходный файл без метаданных и в пределах MAX_DIMENSION остаётся как есть, если JPEG вышел не меньше'''
+    source_type = sniff(raw[:12])
+    try:
+        with Image.open(io.BytesIO(raw)) as image:
+            original_size = image.size
+            keep_allowed = (
+                source_type in PASSTHROUGH_TYPES
+                and max(image.size) <= MAX_DIMENSION
+                and not has_metadata(image)
+            )
+            # Для JPEG draft() уменьшает картинку прямо при декодировании DCT — дешевле, чем resize после
+            image.draft('RGB', (MAX_DIMENSION, MAX_DIMENSION))
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((MAX_DIMENSION, MAX_DIMENSION), Image.LANCZOS)
+            if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+                background = Image.new('RGB', image.size, (255, 255, 255))
+                background.paste(image, mask=image.convert('RGBA').getchannel('A'))
+                image = background
+            elif image.mode != 'RGB':
+                image = image.convert('RGB')
+
+            out = io.BytesIO()
+            image.save(out, format='JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+            width, height = image.size
+    except (Image.DecompressionBombError, OSError, SyntaxError) as e:
+        raise ImageRejected(400, f'Cannot decode image: {e}')
+
+    processed, stored_type = out.getvalue(), 'jpeg'
+    if keep_allowed and len(processed) >= len(raw):
+        processed, stored_type, (width, height) = raw, source_type, original_size
+    return processed, {
+        'source_type': source_type,
+        'stored_type': stored_type,
+        'content_type': PASSTHROUGH_TYPES[stored_type],
+        'original_bytes': len(raw),
+        'stored_bytes': len(processed),
+        'bytes_saved': len(raw) - len(processed),
+        'width': width,
+        'height': height,
+    }
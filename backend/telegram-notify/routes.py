@@ -0,0 +1,133 @@
+'''
+Business: Приём скриншота оплаты: нормализация картинки и постановка в telegram_outbox; index.py импортирует модуль
+          (Pillow, psycopg2) при первом POST, не на холодном старте
+Args: event, context - как у handler в index.py
+Returns: post - HTTP response dict
+'''
+import hashlib
+import json
+from typing import Dict, Any
+
+from db import connection
+from imaging import ImageRejected, decode_data_url, preprocess
+from metrics import phase
+from outbox import enqueue
+from runtime import error, json_body, respond
+
+def post(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    try:
+        body_data = json_body(event)
+        
+        # Получаем данные из запроса
+        image_base64 = body_data.get('image')
+        chat_id = body_data.get('chat_id', '-1003174200950')  # ID чата куда отправлять
+        amount = body_data.get('amount', '')
+        currency = body_data.get('currency', 'CNY')
+        
+        if not image_base64:
+            return error(400, 'Image is required')
+        
+        # Декодируем base64 изображение (префикс data:image/...;base64 отбрасывается),
+        # затем уменьшаем и перекодируем в JPEG без метаданных, если это не увеличит файл
+        try:
+            with phase('decode'):
+                raw_image = decode_data_url(image_base64)
+            with phase('preprocess'):
+                image_bytes, image_stats = preprocess(raw_image)
+        except ImageRejected as e:
+            return error(e.status_code, str(e))
+        print(json.dumps({'event': 'image_preprocessed', 'request_id': context.request_id, **image_stats}))
+        
+        # Получаем тип изображения
+        image_type = body_data.get('type', 'qr_code')
+        transaction_id = body_data.get('transaction_id', 'N/A')
+        
+        # Формируем сообщение в зависимости от типа
+        if image_type == 'payment_proof':
+            caption = f"✅ Скриншот оплаты\n\n"
+            caption += f"Сумма: {amount} {currency}\n"
+            caption += f"Transaction ID: {transaction_id}\n"
+            caption += f"Request ID: {context.request_id}"
+        else:
+            caption = f"💰 Новая заявка на пополнение (QR-код)\n\n"
+            caption += f"Сумма: {amount} {currency}\n"
+            caption += f"Transaction ID: {transaction_id}\n"
+            caption += f"Request ID: {context.request_id}"
+        
+        data = {
+            'caption': caption
+        }
+        
+        # Добавляем кнопки только для скриншотов оплаты
+        if image_type == 'payment_proof' and transaction_id != 'N/A':
+            reply_markup = {
+                'inline_keyboard': [[
+                    {
+                        'text': '✅ Оплата получена',
+                        'callback_data': f'approve_{transaction_id}'
+                    },
+                    {
+                        'text': '❌ Платёж отказан',
+                        'callback_data': f'reject_{transaction_id}'
+                    }
+                ]]
+            }
+            data['reply_markup'] = reply_markup
+        
+        # Одинаковые картинки после нормализации дают одинаковый хэш
+        content_sha256 = hashlib.sha256(image_bytes).hexdigest()
+        
+        # Фото уходит в telegram_outbox, отправит его telegram-dispatcher с учётом лимитов Telegram
+        with connection() as conn:
+            with conn.cursor() as cur:
+                if str(transaction_id).isdigit():
+                    cur.execute(
+                        """
+                        INSERT INTO transaction_images (transaction_id, image_type, content_sha256)
+                        VALUES (%s, %s, %s)
+                        ON CONFLICT DO NOTHING
+                        RETURNING id
+                        """,
+                        (int(transaction_id), image_type, content_sha256)
+                    )
+                    if cur.fetchone() is None:
+                        # Та же картинка к той же транзакции уже стоит в очереди или отправлена
+                        conn.commit()
+                        return respond(200, {
+                            'success': True,
+                            'duplicate': True,
+                            'message': 'Screenshot already submitted for this transaction',
+                            'content_sha256': content_sha256
+                        })
+                
+                # Если такую картинку Telegram уже видел, шлём file_id вместо повторной загрузки
+                cur.execute("SELECT file_id FROM telegram_files WHERE content_sha256 = %s", (content_sha256,))
+                row = cur.fetchone()
+                if row:
+                    outbox_id = enqueue(cur, 'sendPhoto', chat_id, {**data, 'photo': row[0]}, content_sha256=content_sha256)
+                else:
+                    outbox_id = enqueue(
+                        cur,
+                        'sendPhoto',
+                        chat_id,
+                        data,
+                        photo=image_bytes,
+                        photo_filename=f"screenshot.{image_stats['stored_type']}",
+                        photo_content_type=image_stats['content_type'],
+                        content_sha256=content_sha256
+                    )
+            conn.commit()
+        
+        return respond(200, {
+            'success': True,
+            'duplicate': False,
+            'message': 'Screenshot queued for Telegram',
+            'outbox_id': outbox_id,
+            'content_sha256': content_sha256,
+            'reused_file_id': row is not None,
+            'original_bytes': image_stats['original_bytes'],
+            'bytes_saved': image_stats['bytes_saved']
+        })
+    
+    except Exception as e:
+        return error(500, str(e))
\ No newline at end of file
@@ -0,0 +1,81 @@
+'''
+Business: Параллельные вызовы Telegram Bot API из webhook через одну keep-alive сессию
+Args: TELEGRAM_API_URL - адрес Bot API; TELEGRAM_CONNECT_TIMEOUT / TELEGRAM_READ_TIMEOUT - таймауты в секундах
+Returns: Future с (ok, миллисекунды) для каждого вызова; тайминги пишутся в лог одной JSON-строкой
+'''
+
+import json
+import os
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from db import connection
+from metrics import phase, propagate
+
+TELEGRAM_API_URL = os.environ.get('TELEGRAM_API_URL', 'https://api.telegram.org')
+TELEGRAM_CONNECT_TIMEOUT = float(os.environ.get('TELEGRAM_CONNECT_TIMEOUT', '2'))
+TELEGRAM_READ_TIMEOUT = float(os.environ.get('TELEGRAM_READ_TIMEOUT', '5'))
+FANOUT_WORKERS = 4
+
+# Сессия и пул потоков живут между тёплыми вызовами: TLS-рукопожатие с api.telegram.org делается один раз
+_session = requests.Session()
+_session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=FANOUT_WORKERS))
+_session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=FANOUT_WORKERS))
+_executor = ThreadPoolExecutor(max_workers=FANOUT_WORKERS, thread_name_prefix='telegram')
+
+
+def call(bot_token: str, method: str, payload: Dict[str, Any], request_id: str) -> Tuple[bool, float]:
+    started = time.perf_counter()
+    status: Optional[int] = None
+    try:
+        with phase('telegram'):
+            response = _session.post(
+                f"{TELEGRAM_API_URL}/bot{bot_token}/{method}",
+                json=payload,
+                timeout=(TELEGRAM_CONNECT_TIMEOUT, TELEGRAM_READ_TIMEOUT)
+            )
+        status = response.status_code
+        ok = status == 200 and bool(response.json().get('ok'))
+    except (requests.RequestException, ValueError):
+        ok = False
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    print(json.dumps({
+        'event': 'telegram_call',
+        'request_id': request_id,
+        'method': method,
+        'status': status,
+        'ok': ok,
+        'ms': round(elapsed_ms, 1)
+    }))
+    return ok, elapsed_ms
+
+
+def send_outbox_row(bot_token: str, outbox_id: int, method: str, payload: Dict[str, Any], request_id: str) -> Tuple[bool, float]:
+    '''Быстрый путь для записи из telegram_outbox: при неудаче снимаем аренду, и запись отправит диспетчер'''
+    ok, elapsed_ms = call(bot_token, method, payload, request_id)
+    with connection() as conn:
+        with conn.cursor() as cur:
+            if ok:
+                cur.execute(
+                    "UPDATE telegram_outbox SET status = 'sent', sent_at = NOW() WHERE id = %s AND status = 'pending'",
+                    (outbox_id,)
+                )
+            else:
+                cur.execute(
+                    "UPDATE telegram_outbox SET next_attempt_at = NOW() WHERE id = %s AND status = 'pending'",
+                    (outbox_id,)
+                )
+        conn.commit()
+    return ok, elapsed_ms
+
+
+def submit_call(bot_token: str, method: str, payload: Dict[str, Any], request_id: str) -> 'Future[Tuple[bool, float]]':
+    return _executor.submit(propagate(call), bot_token, method, payload, request_id)
+
+
+def submit_outbox_row(bot_token: str, outbox_id: int, method: str, payload: Dict[str, Any], request_id: str) -> 'Future[Tuple[bool, float]]':
+    return _executor.submit(propagate(send_outbox_row), bot_token, outbox_id, method, payload, request_id)
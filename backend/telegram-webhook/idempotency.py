@@ -0,0 +1,99 @@
+'''
+Business: Идемпотентность запросов: LRU в памяти процесса поверх индексированной таблицы idempotency_keys
+Args: IDEMPOTENCY_TTL_SECONDS - сколько хранить ответ; IDEMPOTENCY_LRU_SIZE - размер LRU
+Returns: lookup()/claim()/store() для повтора сохранённого ответа вместо повторной записи
+'''
+
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from psycopg2.extensions import cursor as PgCursor
+
+IDEMPOTENCY_TTL_SECONDS = int(os.environ.get('IDEMPOTENCY_TTL_SECONDS', str(24 * 3600)))
+IDEMPOTENCY_LRU_SIZE = int(os.environ.get('IDEMPOTENCY_LRU_SIZE', '1024'))
+PURGE_PROBABILITY = 0.01
+PURGE_BATCH = 500
+
+# (status_code, body, request_sha256)
+Stored = Tuple[int, str, Optional[str]]
+
+_lru: 'OrderedDict[Tuple[str, str], Tuple[float, Stored]]' = OrderedDict()
+_lru_lock = threading.Lock()
+
+
+def cached(scope: str, key: str) -> Optional[Stored]:
+    '''Ответ из LRU процесса: повтор на тёплом контейнере не ходит в БД вовсе'''
+    with _lru_lock:
+        entry = _lru.get((scope, key))
+        if entry is None:
+            return None
+        expires_at, stored = entry
+        if expires_at < time.time():
+            del _lru[(scope, key)]
+            return None
+        _lru.move_to_end((scope, key))
+        return stored
+
+
+def remember(scope: str, key: str, stored: Stored) -> None:
+    '''Кладём в LRU только после коммита, чтобы не повторять ответ откатившейся транзакции'''
+    with _lru_lock:
+        _lru[(scope, key)] = (time.time() + IDEMPOTENCY_TTL_SECONDS, stored)
+        _lru.move_to_end((scope, key))
+        while len(_lru) > IDEMPOTENCY_LRU_SIZE:
+            _lru.popitem(last=False)
+
+
+def lookup(cur: PgCursor, scope: str, key: str) -> Optional[Stored]:
+    '''Один поиск по первичному ключу; незавершённые (без ответа) записи не возвращаются'''
+    cur.execute(
+        """
+        SELECT status_code, body, request_sha256 FROM idempotency_keys
+        WHERE scope = %s AND key = %s AND expires_at > NOW() AND status_code IS NOT NULL
+        """,
+        (scope, key)
+    )
+    row = cur.fetchone()
+    return (row[0], row[1], row[2]) if row else None
+
+
+def claim(cur: PgCursor, scope: str, key: str, request_sha256: Optional[str] = None) -> bool:
+    '''Резервирует ключ в текущей транзакции. Параллельный запрос с тем же ключом ждёт на уникальном
+    индексе до нашего коммита и получает False; просроченная запись перезанимается'''
+    cur.execute(
+        """
+        INSERT INTO idempotency_keys (scope, key, request_sha256, expires_at)
+        VALUES (%s, %s, %s, NOW() + make_interval(secs => %s))
+        ON CONFLICT (scope, key) DO UPDATE
+            SET request_sha256 = EXCLUDED.request_sha256,
+                status_code = NULL,
+                body = NULL,
+                created_at = NOW(),
+                expires_at = EXCLUDED.expires_at
+            WHERE idempotency_keys.expires_at <= NOW()
+        RETURNING 1
+        """,
+        (scope, key, request_sha256, IDEMPOTENCY_TTL_SECONDS)
+    )
+    return cur.fetchone() is not None
+
+
+def store(cur: PgCursor, scope: str, key: str, status_code: int, body: str) -> None:
+    cur.execute(
+        "UPDATE idempotency_keys SET status_code = %s, body = %s WHERE scope = %s AND key = %s",
+        (status_code, body, scope, key)
+    )
+    if random.random() < PURGE_PROBABILITY:
+        # Просроченные ключи подчищаем понемногу попутно, без отдельного крона
+        cur.execute(
+            """
+            DELETE FROM idempotency_keys WHERE ctid IN (
+                SELECT ctid FROM idempotency_keys WHERE expires_at < NOW() LIMIT %s
+            )
+            """,
+            (PURGE_BATCH,)
+        )
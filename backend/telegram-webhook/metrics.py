@@ -0,0 +1,175 @@
+'''
+Business: Замеры фаз запроса: спаны по context.request_id, JSON-строка в лог, заголовок Server-Timing и гистограммы процесса
+Args: METRICS_LOG - all (по умолчанию) | slow | off; METRICS_SLOW_MS - порог для slow;
+      METRICS_SERVER_TIMING - 1, чтобы отдавать заголовок Server-Timing; METRICS_TOKEN - включает GET ?view=metrics
+      (Authorization: Bearer <token>) с гистограммами в текстовом формате Prometheus
+Returns: instrumented(function_name) - декоратор handler; phase(name) - замер участка кода; prometheus_text()
+'''
+
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+METRICS_LOG = os.environ.get('METRICS_LOG', 'all')
+METRICS_SLOW_MS = float(os.environ.get('METRICS_SLOW_MS', '500'))
+METRICS_SERVER_TIMING = os.environ.get('METRICS_SERVER_TIMING', '0') == '1'
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+# Границы корзин в секундах: от быстрого поиска по PK до долгого ожидания Telegram
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Handler = Callable[[Dict[str, Any], Any], Dict[str, Any]]
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    __slots__ = ('counts', 'total', 'count')
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float) -> None:
+        index = 0
+        while index < len(BUCKETS) and seconds > BUCKETS[index]:
+            index += 1
+        self.counts[index] += 1
+        self.total += seconds
+        self.count += 1
+
+
+_histograms: Dict[Tuple[str, Labels], Histogram] = {}
+_histograms_lock = threading.Lock()
+# Фазы текущего запроса: имя -> [миллисекунды, вызовы]. ContextVar, а не глобальная переменная:
+# долгий опрос и пул потоков webhook обслуживают несколько запросов сразу
+_spans: 'contextvars.ContextVar[Optional[Dict[str, List[float]]]]' = contextvars.ContextVar('metrics_spans', default=None)
+_function = ''
+
+
+def observe(name: str, labels: Labels, seconds: float) -> None:
+    key = (name, labels)
+    with _histograms_lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = Histogram()
+        histogram.observe(seconds)
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    '''Участок запроса: попадает в спаны запроса (если он идёт) и в гистограмму backend_phase_seconds процесса'''
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        spans = _spans.get()
+        if spans is not None:
+            span = spans.get(name)
+            if span is None:
+                spans[name] = [elapsed * 1000, 1]
+            else:
+                span[0] += elapsed * 1000
+                span[1] += 1
+        observe('backend_phase_seconds', (('function', _function), ('phase', name)), elapsed)
+
+
+def propagate(fn: Callable[..., Any]) -> Callable[..., Any]:
+    '''Для задач в пуле потоков: фазы внутри fn попадут в спаны запроса, который её поставил'''
+    ctx = contextvars.copy_context()
+    return lambda *args, **kwargs: ctx.run(fn, *args, **kwargs)
+
+
+def prometheus_text() -> str:
+    lines: List[str] = []
+    with _histograms_lock:
+        items = sorted(_histograms.items())
+        snapshot = [(name, labels, list(h.counts), h.total, h.count) for (name, labels), h in items]
+    typed = set()
+    for name, labels, counts, total, count in snapshot:
+        if name not in typed:
+            lines.append(f'# TYPE {name} histogram')
+            typed.add(name)
+        label_text = ','.join(f'{key}="{value}"' for key, value in labels)
+        cumulative = 0
+        for bound, bucket in zip(BUCKETS + (float('inf'),), counts):
+            cumulative += bucket
+            le = '+Inf' if bound == float('inf') else repr(bound)
+            lines.append(f'{name}_bucket{{{label_text},le="{le}"}} {cumulative}')
+        lines.append(f'{name}_sum{{{label_text}}} {total:.6f}')
+        lines.append(f'{name}_count{{{label_text}}} {count}')
+    return '\n'.join(lines) + '\n'
+
+
+def _metrics_response(event: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    if not METRICS_TOKEN or event.get('httpMethod') != 'GET':
+        return None
+    if (event.get('queryStringParameters') or {}).get('view') != 'metrics':
+        return None
+    authorization = next((value for key, value in (event.get('headers') or {}).items() if key.lower() == 'authorization'), '')
+    if authorization != f'Bearer {METRICS_TOKEN}':
+        return {
+            'statusCode': 401,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': 'Unauthorized'}),
+            'isBase64Encoded': False
+        }
+    return {
+        'statusCode': 200,
+        'headers': {'Content-Type': 'text/plain; version=0.0.4', 'Cache-Control': 'no-store'},
+        'body': prometheus_text(),
+        'isBase64Encoded': False
+    }
+
+
+def instrumented(function_name: str) -> Callable[[Handler], Handler]:
+    '''Оборачивает handler: общий замер, спаны фаз, лог, Server-Timing; сам обработчик не меняется'''
+    global _function
+    _function = function_name
+
+    def decorate(handler: Handler) -> Handler:
+        @wraps(handler)
+        def wrapper(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+            metrics = _metrics_response(event)
+            if metrics is not None:
+                return metrics
+            spans: Dict[str, List[float]] = {}
+            token = _spans.set(spans)
+            started = time.perf_counter()
+            status = 500
+            response: Optional[Dict[str, Any]] = None
+            try:
+                response = handler(event, context)
+                status = response.get('statusCode', 200)
+                return response
+            finally:
+                elapsed = time.perf_counter() - started
+                _spans.reset(token)
+                method = event.get('httpMethod', '')
+                observe('backend_request_seconds', (('function', function_name), ('method', method), ('status', str(status))), elapsed)
+                total_ms = elapsed * 1000
+                if METRICS_LOG == 'all' or (METRICS_LOG == 'slow' and total_ms >= METRICS_SLOW_MS):
+                    print(json.dumps({
+                        'event': 'request_timing',
+                        'function': function_name,
+                        'request_id': getattr(context, 'request_id', None),
+                        'method': method,
+                        'status': status,
+                        'ms': round(total_ms, 1),
+                        'phases': {name: {'ms': round(ms, 2), 'calls': int(calls)} for name, (ms, calls) in spans.items()}
+                    }))
+                if METRICS_SERVER_TIMING and response is not None:
+                    timing = ', '.join(f'{name};dur={ms:.1f}' for name, (ms, _) in spans.items())
+                    response['headers'] = {
+                        **(response.get('headers') or {}),
+                        'Server-Timing': (timing + ', ' if timing else '') + f'total;dur={total_ms:.1f}',
+                        # Без этого браузер не отдаёт Server-Timing чужого origin в Performance API
+                        'Timing-Allow-Origin': '*'
+                    }
+        return wrapper
+    return decorate
@@ -0,0 +1,46 @@
+'''
+Business: Постановка вызовов Telegram Bot API в таблицу telegram_outbox
+Args: cur - курсор в транзакции вызывающего, method/chat_id/payload - параметры вызова Bot API
+Returns: id записи; отправкой занимается функция telegram-dispatcher
+'''
+
+import json
+from typing import Any, Dict, Optional
+
+import psycopg2
+from psycopg2.extensions import cursor as PgCursor
+
+
+def enqueue(
+    cur: PgCursor,
+    method: str,
+    chat_id: Any,
+    payload: Dict[str, Any],
+    photo: Optional[bytes] = None,
+    photo_filename: Optional[str] = None,
+    photo_content_type: Optional[str] = None,
+    lease_seconds: float = 0,
+    content_sha256: Optional[str] = None,
+) -> int:
+    '''Запись попадает в очередь только вместе с коммитом транзакции вызывающего.
+    lease_seconds > 0 - вызывающий сам пробует отправить сразу, диспетчер подхватит запись после аренды.
+    content_sha256 - хэш фото: по нему диспетчер переиспользует file_id из telegram_files'''
+    cur.execute(
+        """
+        INSERT INTO telegram_outbox
+            (method, chat_id, payload, photo, photo_filename, photo_content_type, next_attempt_at, content_sha256)
+        VALUES (%s, %s, %s, %s, %s, %s, NOW() + make_interval(secs => %s), %s)
+        RETURNING id
+        """,
+        (
+            method,
+            str(chat_id),
+            json.dumps({'chat_id': chat_id, **payload}),
+            psycopg2.Binary(photo) if photo is not None else None,
+            photo_filename,
+            photo_content_type,
+            lease_seconds,
+            content_sha256,
+        )
+    )
+    return cur.fetchone()[0]
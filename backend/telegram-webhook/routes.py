@@ -0,0 +1,115 @@
+'''
+Business: Разбор callback_query от кнопок подтверждения/отклонения платежей; index.py импортирует модуль (requests,
+          psycopg2) при первом POST, не на холодном старте
+Args: event, context - как у handler в index.py
+Returns: post - HTTP response dict
+'''
+import os
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Dict, Any
+
+from db import connection
+from fanout import TELEGRAM_CONNECT_TIMEOUT, TELEGRAM_READ_TIMEOUT, submit_call, submit_outbox_row
+from idempotency import Stored, cached, claim, lookup, remember, store
+from outbox import enqueue
+from runtime import dumps, json_body, respond, respond_raw
+
+FANOUT_LEASE_SECONDS = 30
+DEDUP_SCOPE = 'telegram_update'
+
+def replay_response(stored: Stored) -> Dict[str, Any]:
+    status_code, body, _ = stored
+    return respond_raw(status_code, body)
+
+def post(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    body_data = json_body(event)
+    
+    # Проверяем, есть ли callback_query от нажатия на кнопку
+    if 'callback_query' in body_data:
+        callback = body_data['callback_query']
+        callback_id = callback['id']
+        callback_data = callback['data']
+        chat_id = callback['message']['chat']['id']
+        message_id = callback['message']['message_id']
+        
+        # Повторная доставка того же update не должна повторять UPDATE и сообщения в чат
+        dedup_key = str(body_data.get('update_id') or callback_id)
+        stored = cached(DEDUP_SCOPE, dedup_key)
+        if stored is not None:
+            return replay_response(stored)
+        
+        # Разбираем данные кнопки: "approve_123" или "reject_123"
+        action, transaction_id = callback_data.split('_')
+        
+        # Обновляем статус транзакции
+        if action == 'approve':
+            new_status = 'completed'
+            status_text = '✅ Оплата получена'
+        else:
+            new_status = 'failed'
+            status_text = '❌ Платёж отказан'
+        
+        edit_payload = {
+            'chat_id': chat_id,
+            'message_id': message_id,
+            'reply_markup': {'inline_keyboard': []}
+        }
+        message_payload = {
+            'chat_id': chat_id,
+            'text': f'{status_text}\n\nTransaction ID: {transaction_id}'
+        }
+        
+        # Статус и оба сообщения в чат коммитятся одной транзакцией до любых запросов в Telegram.
+        # Сообщения ставим в telegram_outbox под аренду: сначала отправляем сами, диспетчер - страховка
+        response_body = dumps({'ok': True})
+        with connection() as conn:
+            with conn.cursor() as cursor:
+                stored = lookup(cursor, DEDUP_SCOPE, dedup_key)
+                if stored is None and not claim(cursor, DEDUP_SCOPE, dedup_key):
+                    # Параллельная доставка того же update уже всё сделала
+                    stored = lookup(cursor, DEDUP_SCOPE, dedup_key) or (200, response_body, None)
+                if stored is not None:
+                    remember(DEDUP_SCOPE, dedup_key, stored)
+                    return replay_response(stored)
+                
+                # Кнопка решает только свободную pending-строку: взятую оператором из очереди или уже решённую не трогаем
+                cursor.execute(
+                    """
+                    UPDATE transactions SET status = %s, updated_at = NOW(), claimed_by = NULL, claim_expires_at = NULL
+                    WHERE id = %s AND status = 'pending' AND (claim_expires_at IS NULL OR claim_expires_at <= NOW())
+                    """,
+                    (new_status, int(transaction_id))
+                )
+                if cursor.rowcount == 0:
+                    status_text = '⚠️ Платёж уже обработан другим оператором'
+                    message_payload['text'] = f'{status_text}\n\nTransaction ID: {transaction_id}'
+                edit_outbox_id = enqueue(cursor, 'editMessageReplyMarkup', chat_id, edit_payload, lease_seconds=FANOUT_LEASE_SECONDS)
+                message_outbox_id = enqueue(cursor, 'sendMessage', chat_id, message_payload, lease_seconds=FANOUT_LEASE_SECONDS)
+                store(cursor, DEDUP_SCOPE, dedup_key, 200, response_body)
+            conn.commit()
+        remember(DEDUP_SCOPE, dedup_key, (200, response_body, None))
+        
+        # Получаем токен бота
+        bot_token = os.environ.get('TELEGRAM_BOT_TOKEN')
+        
+        # Все три вызова уходят параллельно по одной keep-alive сессии
+        answer = submit_call(bot_token, 'answerCallbackQuery', {
+            'callback_query_id': callback_id,
+            'text': status_text
+        }, context.request_id)
+        # Редактируем сообщение, удаляя кнопки
+        submit_outbox_row(bot_token, edit_outbox_id, 'editMessageReplyMarkup', edit_payload, context.request_id)
+        # Отправляем новое сообщение с результатом
+        submit_outbox_row(bot_token, message_outbox_id, 'sendMessage', message_payload, context.request_id)
+        
+        # Отвечаем Telegram, как только подтверждён answerCallbackQuery (убирает "часики" на кнопке);
+        # остальные вызовы досылаются в фоне или диспетчером после аренды
+        try:
+            answered, _ = answer.result(timeout=TELEGRAM_CONNECT_TIMEOUT + TELEGRAM_READ_TIMEOUT)
+        except FutureTimeout:
+            answered = False
+        
+        return respond(200, {'ok': True, 'answered': answered})
+    
+    # Если это не callback_query, просто отвечаем OK (для проверки webhook)
+    return respond(200, {'ok': True})
@@ -0,0 +1,224 @@
+'''
+Business: Общая обвязка HTTP-функций: маршрутизация по методу, заранее собранные ответы на preflight и 405,
+          ленивый импорт модулей с psycopg2 / requests / Pillow, быстрый JSON, сжатие больших ответов и ?fields=
+Args: JSON_BACKEND - orjson (по умолчанию, если пакет установлен) | stdlib;
+      COMPRESS_MIN_BYTES - с какого размера тела сжимать; GZIP_LEVEL, BROTLI_QUALITY - степень сжатия;
+      COMPRESSED_CACHE_SIZE - сколько сжатых тел из кэша листингов держать готовыми
+Returns: Api(routes, allow_headers) - handler с таблицей методов; lazy(module, name) - обработчик метода из модуля,
+         который импортируется при первом запросе этим методом; respond/respond_raw/error - ответы; dumps/loads;
+         respond_negotiated() - ответ, сжатый br/gzip по Accept-Encoding; parse_fields()/project() - проекция полей;
+         timer_event() - вызов по таймеру, а не HTTP
+'''
+
+import base64
+import importlib
+import importlib.util
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from metrics import phase
+
+Event = Dict[str, Any]
+Response = Dict[str, Any]
+Route = Callable[[Event, Any], Response]
+
+orjson: Any = None
+if os.environ.get('JSON_BACKEND', 'orjson') == 'orjson':
+    try:
+        import orjson
+    except ImportError:
+        pass
+
+if orjson is not None:
+    def dumps(value: Any) -> str:
+        return orjson.dumps(value).decode()
+
+    loads = orjson.loads
+else:
+    def dumps(value: Any) -> str:
+        # Тот же вывод, что у orjson: без пробелов и без \u-экранирования кириллицы
+        return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+
+    loads = json.loads
+
+COMPRESS_MIN_BYTES = int(os.environ.get('COMPRESS_MIN_BYTES', '1024'))
+GZIP_LEVEL = int(os.environ.get('GZIP_LEVEL', '6'))
+BROTLI_QUALITY = int(os.environ.get('BROTLI_QUALITY', '5'))
+COMPRESSED_CACHE_SIZE = int(os.environ.get('COMPRESSED_CACHE_SIZE', '16'))
+# В порядке предпочтения сервера при равном q; brotli - необязательный пакет, импортируется при первом сжатии
+ENCODINGS: Tuple[str, ...] = ('br', 'gzip') if importlib.util.find_spec('brotli') else ('gzip',)
+
+# Общие для всех ответов словари: дополнять только копией {**JSON_HEADERS, ...}, не изменять на месте
+CORS_HEADERS: Mapping[str, str] = {'Access-Control-Allow-Origin': '*'}
+JSON_HEADERS: Mapping[str, str] = {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'}
+
+
+def respond_raw(status_code: int, body: str, headers: Mapping[str, str] = JSON_HEADERS) -> Response:
+    return {'statusCode': status_code, 'headers': headers, 'body': body, 'isBase64Encoded': False}
+
+
+def respond(status_code: int, payload: Any, headers: Mapping[str, str] = JSON_HEADERS) -> Response:
+    return respond_raw(status_code, dumps(payload), headers)
+
+
+def error(status_code: int, message: str) -> Response:
+    return respond(status_code, {'error': message})
+
+
+def json_body(event: Event) -> Any:
+    '''Объект или массив из тела запроса; битый JSON и скаляры - ValueError, который обработчики отдают как 400'''
+    body = loads(event.get('body') or '{}')
+    if not isinstance(body, (dict, list)):
+        raise ValueError('Request body must be a JSON object or array')
+    return body
+
+
+def header(event: Event, name: str) -> Optional[str]:
+    name = name.lower()
+    for key, value in (event.get('headers') or {}).items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+def timer_event(event: Event) -> bool:
+    '''Вызов триггером-таймером: сообщение без httpMethod, event_type ...TimerMessage'''
+    if 'httpMethod' in event:
+        return False
+    messages = event.get('messages') or []
+    return bool(messages) and all(
+        str((message.get('event_metadata') or {}).get('event_type', '')).endswith('TimerMessage')
+        for message in messages if isinstance(message, dict)
+    )
+
+
+def accepted_encoding(event: Event) -> Optional[str]:
+    '''Лучшее из ENCODINGS по Accept-Encoding клиента с учётом q; None - отдавать без сжатия'''
+    accept = header(event, 'Accept-Encoding')
+    if not accept:
+        return None
+    weights: Dict[str, float] = {}
+    for part in accept.split(','):
+        name, _, params = part.partition(';')
+        weight = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[name.strip().lower()] = weight
+    best, best_weight = None, 0.0
+    for encoding in ENCODINGS:
+        weight = weights.get(encoding, weights.get('*', 0.0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        import brotli
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    import gzip
+    # mtime=0: одно и то же тело даёт одни и те же байты
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+# (кодирование, id тела) -> (тело, base64 сжатого тела). Тело из кэша листингов - один и тот же объект str
+# между запросами; ссылка на него в записи не даёт id достаться другой строке, пока запись жива
+_compressed: 'OrderedDict[Tuple[str, int], Tuple[str, str]]' = OrderedDict()
+_compressed_lock = threading.Lock()
+
+
+def _compressed_body(body: str, encoding: str, reuse: bool) -> str:
+    key = (encoding, id(body))
+    if reuse:
+        with _compressed_lock:
+            entry = _compressed.get(key)
+            if entry is not None and entry[0] is body:
+                _compressed.move_to_end(key)
+                return entry[1]
+    with phase('compress'):
+        encoded = base64.b64encode(compress(body.encode(), encoding)).decode()
+    if reuse:
+        with _compressed_lock:
+            _compressed[key] = (body, encoded)
+            _compressed.move_to_end(key)
+            while len(_compressed) > COMPRESSED_CACHE_SIZE:
+                _compressed.popitem(last=False)
+    return encoded
+
+
+def respond_negotiated(event: Event, status_code: int, body: str, headers: Mapping[str, str] = JSON_HEADERS,
+                       reuse: bool = False) -> Response:
+    '''Тело от COMPRESS_MIN_BYTES сжимается br/gzip под Accept-Encoding и уходит в base64 (isBase64Encoded);
+    reuse=True - тело взято из кэша и будет отдано снова, сжатый вариант стоит запомнить'''
+    headers = {**headers, 'Vary': 'Accept-Encoding'}
+    encoding = accepted_encoding(event) if len(body) >= COMPRESS_MIN_BYTES else None
+    if encoding is None:
+        return respond_raw(status_code, body, headers)
+    headers['Content-Encoding'] = encoding
+    return {
+        'statusCode': status_code,
+        'headers': headers,
+        'body': _compressed_body(body, encoding, reuse),
+        'isBase64Encoded': True
+    }
+
+
+def parse_fields(query_params: Dict[str, Any], allowed: Sequence[str]) -> Optional[Tuple[str, ...]]:
+    '''?fields=id,status - только эти ключи элементов листинга, в порядке allowed; None - все поля'''
+    raw = query_params.get('fields')
+    if not raw:
+        return None
+    requested = {name.strip() for name in raw.split(',') if name.strip()}
+    unknown = requested.difference(allowed)
+    if unknown or not requested:
+        raise ValueError(f"fields must be a comma-separated subset of: {', '.join(allowed)}")
+    return tuple(name for name in allowed if name in requested)
+
+
+def project(items: List[Dict[str, Any]], fields: Optional[Tuple[str, ...]]) -> List[Dict[str, Any]]:
+    if fields is None:
+        return items
+    return [{name: item[name] for name in fields} for item in items]
+
+
+def lazy(module: str, name: str) -> Route:
+    '''Обработчик name из module; модуль и всё, что он тянет (psycopg2, requests, Pillow), импортируется при первом
+    вызове, поэтому холодный старт с preflight или 405 их не загружает'''
+    resolved: List[Route] = []
+
+    def route(event: Event, context: Any) -> Response:
+        if not resolved:
+            resolved.append(getattr(importlib.import_module(module), name))
+        return resolved[0](event, context)
+    return route
+
+
+class Api:
+    '''Таблица метод -> обработчик; OPTIONS и неизвестные методы отвечают ответами, собранными один раз при импорте'''
+    __slots__ = ('routes', 'preflight', 'not_allowed')
+
+    def __init__(self, routes: Dict[str, Route], allow_headers: str = 'Content-Type') -> None:
+        self.routes = routes
+        self.preflight = respond_raw(200, '', {
+            'Access-Control-Allow-Origin': '*',
+            'Access-Control-Allow-Methods': ', '.join([*routes, 'OPTIONS']),
+            'Access-Control-Allow-Headers': allow_headers,
+            'Access-Control-Max-Age': '86400'
+        })
+        self.not_allowed = error(405, 'Method not allowed')
+
+    def __call__(self, event: Event, context: Any) -> Response:
+        method = event.get('httpMethod', 'GET')
+        route = self.routes.get(method)
+        if route is not None:
+            return route(event, context)
+        # Копия верхнего уровня: обёртка metrics.instrumented дописывает в ответ свои заголовки
+        return dict(self.preflight if method == 'OPTIONS' else self.not_allowed)
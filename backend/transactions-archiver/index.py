@@ -0,0 +1,20 @@
+'''
+Business: Обслуживание помесячных секций transactions: создаёт будущие, архивирует закрытые месяцы
+Args: event - вызов по таймеру (раз в сутки) или POST (ручной запуск); context - object с request_id
+Returns: HTTP response dict со списками created/archived/skipped секций
+'''
+from typing import Any, Dict
+
+from metrics import instrumented
+from runtime import Api, lazy, timer_event
+
+# psycopg2 импортируется при первом запуске: preflight и 405 отвечают без него
+run = lazy('routes', 'post')
+# DETACH, DROP INDEX и VACUUM запускают только таймер и POST: GET и HEAD от краулеров и проверок живости получают 405
+api = Api({'POST': run})
+
+@instrumented('transactions-archiver')
+def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    if timer_event(event):
+        return run(event, context)
+    return api(event, context)
@@ -0,0 +1,133 @@
+'''
+Business: Обслуживание помесячных секций transactions: создаёт будущие, архивирует закрытые месяцы;
+          index.py импортирует модуль (psycopg2) при первом запуске, не на холодном старте
+Args: event, context - как у handler в index.py
+Returns: post - HTTP response dict со списками created/archived/skipped секций
+'''
+import os
+from datetime import date
+from typing import Any, Dict, List
+
+from psycopg2 import errors
+from psycopg2.extensions import cursor as PgCursor
+
+from db import connection
+from runtime import respond
+
+PARTITION_MONTHS_AHEAD = int(os.environ.get('PARTITION_MONTHS_AHEAD', '3'))
+ARCHIVE_AFTER_MONTHS = int(os.environ.get('ARCHIVE_AFTER_MONTHS', '6'))
+# DETACH берёт эксклюзивную блокировку родителя: не ждём её дольше, чем готовы задержать запросы
+ARCHIVE_LOCK_TIMEOUT = os.environ.get('ARCHIVE_LOCK_TIMEOUT', '2s')
+ARCHIVE_SCHEMA = 'archive'
+# В архиве таблица только читается по id: вторичные индексы горячего листинга там лишние
+ARCHIVE_KEEP_INDEX_SUFFIX = '_pkey'
+
+
+def add_months(day: date, months: int) -> date:
+    total = day.year * 12 + day.month - 1 + months
+    return date(total // 12, total % 12 + 1, 1)
+
+
+def attached_partitions(cur: PgCursor) -> Dict[str, date]:
+    '''Помесячные секции transactions и первый день их месяца'''
+    cur.execute(
+        r"""
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'transactions'::regclass AND c.relname ~ '^transactions_\d{4}_\d{2}$'
+        """
+    )
+    partitions = {}
+    for (name,) in cur.fetchall():
+        year, month = name.split('_')[1:]
+        partitions[name] = date(int(year), int(month), 1)
+    return partitions
+
+
+def ensure_partitions(today: date) -> List[str]:
+    '''Секции на текущий месяц и PARTITION_MONTHS_AHEAD вперёд: вставка в месяц без секции упала бы'''
+    with connection() as conn:
+        with conn.cursor() as cur:
+            existing = attached_partitions(cur)
+            created = []
+            for offset in range(PARTITION_MONTHS_AHEAD + 1):
+                month = add_months(today, offset)
+                if month not in existing.values():
+                    cur.execute('SELECT transactions_create_partition(%s)', (month,))
+                    created.append(cur.fetchone()[0])
+        conn.commit()
+    return created
+
+
+def archivable_partitions(today: date) -> List[str]:
+    '''Присоединённые секции, месяц которых закончился не позже ARCHIVE_AFTER_MONTHS назад'''
+    cutoff = add_months(today, -ARCHIVE_AFTER_MONTHS)
+    with connection() as conn:
+        with conn.cursor() as cur:
+            partitions = attached_partitions(cur)
+    return sorted(name for name, month in partitions.items() if add_months(month, 1) <= cutoff)
+
+
+def archive_partition(name: str) -> str:
+    '''archived, если секция ушла в архив; иначе причина, по которой она осталась на месте'''
+    with connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(f"SET LOCAL lock_timeout = '{ARCHIVE_LOCK_TIMEOUT}'")
+            # Частичный индекс idx_transactions_pending есть и на секции: проверка не читает кучу
+            pending_sql = f"SELECT EXISTS (SELECT 1 FROM public.{name} WHERE status = 'pending')"
+            cur.execute(pending_sql)
+            if cur.fetchone()[0]:
+                return 'pending'
+            try:
+                cur.execute(f'ALTER TABLE transactions DETACH PARTITION public.{name}')
+            except errors.LockNotAvailable:
+                conn.rollback()
+                return 'locked'
+            # Повтор под эксклюзивной блокировкой: между проверкой и DETACH статус мог вернуться в pending
+            cur.execute(pending_sql)
+            if cur.fetchone()[0]:
+                conn.rollback()
+                return 'pending'
+            cur.execute(f'ALTER TABLE public.{name} SET SCHEMA {ARCHIVE_SCHEMA}')
+            cur.execute(
+                "SELECT indexname FROM pg_indexes WHERE schemaname = %s AND tablename = %s",
+                (ARCHIVE_SCHEMA, name)
+            )
+            for (index_name,) in cur.fetchall():
+                if not index_name.endswith(ARCHIVE_KEEP_INDEX_SUFFIX):
+                    cur.execute(f'DROP INDEX {ARCHIVE_SCHEMA}.{index_name}')
+            # DETACH не запускает триггеры: листинг изменился, ETag должен смениться
+            cur.execute(
+                "UPDATE collection_versions SET version = version + 1 "
+                "WHERE name = 'transactions' AND slot = pg_backend_pid() % 16"
+            )
+        conn.commit()
+
+        # Строки больше не меняются: замораживаем, чтобы автовакуум к секции больше не возвращался
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cur:
+                cur.execute(f'VACUUM (FREEZE, ANALYZE) {ARCHIVE_SCHEMA}.{name}')
+        finally:
+            conn.autocommit = False
+    return 'archived'
+
+
+def post(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    today = date.today()
+    created = ensure_partitions(today)
+    archived: List[str] = []
+    skipped: Dict[str, str] = {}
+    for name in archivable_partitions(today):
+        outcome = archive_partition(name)
+        if outcome == 'archived':
+            archived.append(name)
+        else:
+            skipped[name] = outcome
+
+    return respond(200, {
+        'created': created,
+        'archived': archived,
+        'skipped': skipped
+    })
@@ -0,0 +1,139 @@
+'''
+Business: Выбор реквизитов для нового пополнения по счётчикам payment_detail_load, чтобы поток не шёл на один счёт
+Args: ALLOCATION_STRATEGY - weighted_round_robin (по умолчанию) | least_pending | first;
+      дневной лимит daily_cap_cny и вес weight задаются на реквизитах и действуют при любой стратегии
+Returns: create_statement() - вставка с выбором реквизитов одним запросом; allocate_many() - реквизиты для пачки;
+         lock_load_for() - блокировка счётчиков перед многострочной сменой статуса
+'''
+
+import os
+from decimal import Decimal
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from psycopg2.extensions import cursor as PgCursor
+
+from statements import Statement, execute, statement
+
+
+class Candidate:
+    '''Строка payment_detail_load с параметрами реквизита; пачка двигает счётчики в памяти так же, как триггер'''
+    __slots__ = ('id', 'currency', 'weight', 'daily_cap_cny', 'wrr_pass', 'pending_amount_cny', 'day_amount_cny')
+
+    def __init__(self, row: Tuple) -> None:
+        (self.id, self.currency, self.weight, self.daily_cap_cny,
+         self.wrr_pass, self.pending_amount_cny, self.day_amount_cny) = row
+
+    def fits(self, amount_cny: Decimal) -> bool:
+        return self.daily_cap_cny is None or self.day_amount_cny + amount_cny <= self.daily_cap_cny
+
+    def assign(self, amount_cny: Decimal) -> None:
+        self.wrr_pass += Decimal(1) / self.weight
+        self.pending_amount_cny += amount_cny
+        self.day_amount_cny += amount_cny
+
+
+class Strategy(NamedTuple):
+    # ORDER BY над l (payment_detail_load) и pd (payment_details) и тот же порядок для пачки в Python
+    order_by: str
+    key: Callable[[Candidate], Tuple]
+
+
+STRATEGIES: Dict[str, Strategy] = {
+    # Stride-планировщик: реквизит с весом 3 получает втрое больше пополнений, чем с весом 1, и вперемешку
+    'weighted_round_robin': Strategy(
+        'l.wrr_pass + 1.0 / pd.weight',
+        lambda c: (c.wrr_pass + Decimal(1) / c.weight,)
+    ),
+    # Меньше всего непроверенных денег на единицу веса; при равенстве - по очереди round-robin
+    'least_pending': Strategy(
+        'l.pending_amount_cny / pd.weight, l.wrr_pass',
+        lambda c: (c.pending_amount_cny / c.weight, c.wrr_pass)
+    ),
+    # Прежнее поведение: первые активные по id
+    'first': Strategy('pd.id', lambda c: ()),
+}
+ALLOCATION_STRATEGY = os.environ.get('ALLOCATION_STRATEGY', 'weighted_round_robin')
+if ALLOCATION_STRATEGY not in STRATEGIES:
+    raise ValueError(f"ALLOCATION_STRATEGY must be one of {', '.join(STRATEGIES)}")
+
+# Сумма за сегодня: строка счётчиков со вчерашним day ещё не обнулена, её обнуляет первая вставка нового дня
+DAY_AMOUNT_SQL = 'CASE WHEN l.day = CURRENT_DATE THEN l.day_amount_cny ELSE 0 END'
+
+PICK_SQL = """
+    SELECT pd.id
+    FROM payment_detail_load l
+    JOIN payment_details pd ON pd.id = l.payment_detail_id
+    WHERE pd.is_active = true
+      AND (pd.daily_cap_cny IS NULL OR {day_amount} + $3::numeric <= pd.daily_cap_cny)
+    ORDER BY (pd.currency = $1::varchar) DESC, {order_by}, pd.id
+    LIMIT 1
+"""
+
+# Счётчики выбранных реквизитов обновляет триггер transaction_load_apply в той же транзакции, что и вставка.
+# SKIP LOCKED: параллельная вставка берёт следующие по порядку реквизиты, а не ждёт коммита первой.
+# Если заняты все подходящие, берём лучшие без блокировки и ждём только на обновлении счётчика в триггере.
+# FOR UPDATE нельзя внутри UNION, поэтому две CTE и COALESCE; вторая выполняется только при промахе первой
+CREATE_SQL = """
+    WITH free AS ({pick} FOR UPDATE OF l SKIP LOCKED
+    ), busy AS ({pick}
+    ), ins AS (
+        INSERT INTO transactions (amount, currency, amount_cny, status, payment_detail_id)
+        SELECT $2::numeric, $1::varchar, $3::numeric, 'pending', COALESCE((SELECT id FROM free), (SELECT id FROM busy))
+        RETURNING id, amount, currency, amount_cny, status, created_at, payment_detail_id
+    )
+    SELECT ins.id, ins.amount, ins.currency, ins.amount_cny, ins.status, ins.created_at,
+           ins.payment_detail_id, pd.recipient_name, pd.account_number
+    FROM ins
+    LEFT JOIN payment_details pd ON pd.id = ins.payment_detail_id
+"""
+
+# Пачка блокирует счётчики всех активных реквизитов в порядке id, чтобы две пачки не взаимоблокировались
+LOCK_CANDIDATES_SQL = f"""
+    SELECT pd.id, pd.currency, pd.weight, pd.daily_cap_cny, l.wrr_pass, l.pending_amount_cny, {DAY_AMOUNT_SQL}
+    FROM payment_detail_load l
+    JOIN payment_details pd ON pd.id = l.payment_detail_id
+    WHERE pd.is_active = true
+    ORDER BY pd.id
+    FOR UPDATE OF l
+"""
+
+# Многострочный UPDATE статусов запускает transaction_load_apply построчно в порядке строк в heap и трогает счётчики
+# вразнобой, а allocate_many блокирует их по возрастанию id - встречные пачки взаимоблокировались бы.
+# Поэтому счётчики затронутых реквизитов блокируются заранее в том же порядке, что и в allocate_many
+LOCK_LOAD_FOR_TRANSACTIONS = statement('lock_load_for_transactions', """
+    SELECT l.payment_detail_id
+    FROM payment_detail_load l
+    WHERE l.payment_detail_id IN (SELECT payment_detail_id FROM transactions WHERE id = ANY($1::int[]))
+    ORDER BY l.payment_detail_id
+    FOR UPDATE OF l
+""")
+
+
+def create_statement(strategy: str = ALLOCATION_STRATEGY) -> Statement:
+    '''Вставка pending-пополнения с выбором реквизитов; параметры - (currency, amount, amount_cny)'''
+    pick = PICK_SQL.format(day_amount=DAY_AMOUNT_SQL, order_by=STRATEGIES[strategy].order_by)
+    return statement(f'tx_create_{strategy}', CREATE_SQL.format(pick=pick))
+
+
+def allocate_many(cur: PgCursor, rows: List[Tuple[Decimal, str, Decimal]],
+                  strategy: str = ALLOCATION_STRATEGY) -> List[Optional[int]]:
+    '''Реквизиты для каждой строки (amount, currency, amount_cny) пачки в том же порядке, что дал бы create_statement()
+    при последовательных вставках; None - активных реквизитов в пределах лимитов нет'''
+    cur.execute(LOCK_CANDIDATES_SQL)
+    candidates = [Candidate(row) for row in cur.fetchall()]
+    key = STRATEGIES[strategy].key
+    picked: List[Optional[int]] = []
+    for _, currency, amount_cny in rows:
+        fitting = [c for c in candidates if c.fits(amount_cny)]
+        if not fitting:
+            picked.append(None)
+            continue
+        best = min(fitting, key=lambda c: (c.currency != currency,) + key(c) + (c.id,))
+        best.assign(amount_cny)
+        picked.append(best.id)
+    return picked
+
+
+def lock_load_for(cur: PgCursor, transaction_ids: List[int]) -> None:
+    '''Вызывать в той же транзакции перед UPDATE статусов нескольких транзакций'''
+    execute(cur, LOCK_LOAD_FOR_TRANSACTIONS, [transaction_ids])
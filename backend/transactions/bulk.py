@@ -0,0 +1,94 @@
+'''
+Business: Пакетные записи: вся пачка одной командой, результат по каждому элементу, режим atomic или partial
+Args: body - массив элементов или {items, mode}; validate(item) - проверка элемента до БД (ValueError - ошибка элемента);
+      write(cur, items) - пишет пачку одним запросом и возвращает (HTTP-статус, данные) на каждый элемент по порядку
+Returns: parse_bulk() - (элементы, atomic) или None для обычного запроса; run_bulk() - (HTTP-статус, тело ответа)
+'''
+
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import psycopg2
+from psycopg2.extensions import cursor as PgCursor
+
+BULK_MAX_ITEMS = 1000
+BULK_MODES = ('atomic', 'partial')
+# 424: элемент сам по себе корректен, но не применён, потому что в atomic-пачке упал другой
+NOT_APPLIED = 424
+
+Outcome = Tuple[int, Any]
+Writer = Callable[[PgCursor, List[Any]], List[Outcome]]
+
+
+def parse_bulk(body: Any) -> Optional[Tuple[List[Any], bool]]:
+    if isinstance(body, list):
+        items, mode = body, 'atomic'
+    elif isinstance(body, dict) and isinstance(body.get('items'), list):
+        items, mode = body['items'], body.get('mode') or 'atomic'
+    else:
+        return None
+    if mode not in BULK_MODES:
+        raise ValueError(f"mode must be one of {', '.join(BULK_MODES)}")
+    if not items or len(items) > BULK_MAX_ITEMS:
+        raise ValueError(f'items must contain 1..{BULK_MAX_ITEMS} elements')
+    return items, mode == 'atomic'
+
+
+def _error(e: psycopg2.Error) -> str:
+    return (e.diag.message_primary if e.diag else None) or str(e).strip()
+
+
+def _write_one_by_one(cur: PgCursor, write: Writer, items: List[Any]) -> List[Outcome]:
+    '''Медленный путь partial-режима: пачка упала, ищем виновные элементы под отдельными savepoint'''
+    outcomes: List[Outcome] = []
+    for item in items:
+        cur.execute('SAVEPOINT bulk_item')
+        try:
+            outcomes.append(write(cur, [item])[0])
+            cur.execute('RELEASE SAVEPOINT bulk_item')
+        except psycopg2.Error as e:
+            cur.execute('ROLLBACK TO SAVEPOINT bulk_item')
+            outcomes.append((409, _error(e)))
+    return outcomes
+
+
+def run_bulk(cur: PgCursor, items: List[Any], atomic: bool,
+             validate: Callable[[Any], Any], write: Writer) -> Tuple[int, Dict[str, Any]]:
+    '''Пишет в текущей транзакции соединения; коммит - за вызывающим, откат неудачной atomic-пачки - здесь'''
+    results: List[Dict[str, Any]] = [{}] * len(items)
+    valid: List[Tuple[int, Any]] = []
+    for index, item in enumerate(items):
+        try:
+            valid.append((index, validate(item)))
+        except (ValueError, TypeError, KeyError, AttributeError) as e:
+            results[index] = {'index': index, 'status': 400, 'error': f'missing {e}' if isinstance(e, KeyError) else str(e)}
+
+    rolled_back = atomic and len(valid) < len(items)
+    outcomes: List[Outcome] = [(NOT_APPLIED, 'batch rolled back')] * len(valid)
+    if valid and not rolled_back:
+        cur.execute('SAVEPOINT bulk')
+        try:
+            outcomes = write(cur, [args for _, args in valid])
+        except psycopg2.Error as e:
+            cur.execute('ROLLBACK TO SAVEPOINT bulk')
+            # В atomic-режиме виновника не ищем: пачка не применена целиком
+            outcomes = [(409, _error(e))] * len(valid) if atomic else _write_one_by_one(cur, write, [args for _, args in valid])
+        if atomic and any(status >= 300 for status, _ in outcomes):
+            cur.execute('ROLLBACK TO SAVEPOINT bulk')
+            rolled_back = True
+        cur.execute('RELEASE SAVEPOINT bulk')
+
+    for (index, _), (status, data) in zip(valid, outcomes):
+        if rolled_back and status < 300:
+            status, data = NOT_APPLIED, 'batch rolled back'
+        key = 'error' if status >= 300 else 'item'
+        results[index] = {'index': index, 'status': status, key: data}
+
+    statuses = [result['status'] for result in results]
+    applied = sum(1 for status in statuses if status < 300)
+    if applied == len(items):
+        status_code = 200
+    elif applied:
+        status_code = 207
+    else:
+        status_code = min(status for status in statuses if status != NOT_APPLIED)
+    return status_code, {'applied': applied, 'failed': len(items) - applied, 'results': results}
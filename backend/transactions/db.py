@@ -0,0 +1,182 @@
+'''
+Business: Общий пул соединений Postgres, который переживает тёплые вызовы функции; чтение можно увести на реплики
+Args: DATABASE_URL - строка подключения к мастеру; DB_POOL_MIN / DB_POOL_MAX - размер каждого пула;
+      DB_POOL_PING_AFTER - через сколько секунд простоя проверять соединение;
+      DATABASE_REPLICA_URLS - строки подключения к репликам через запятую (пусто - всё идёт на мастер);
+      REPLICA_MAX_LAG_SECONDS - отставание, после которого реплика не используется;
+      REPLICA_LAG_CHECK_INTERVAL - как часто перемеривать отставание реплики
+Returns: контекстный менеджер connection(readonly=False), выдающий живое соединение из пула мастера
+         или, для readonly, из пула реплики с допустимым отставанием; replica_allowed(event) для обработчиков
+'''
+
+import itertools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import psycopg2
+from psycopg2 import pool as pg_pool
+from psycopg2.extensions import connection as PgConnection
+
+from metrics import phase
+
+DB_POOL_MIN = int(os.environ.get('DB_POOL_MIN', '1'))
+DB_POOL_MAX = int(os.environ.get('DB_POOL_MAX', '5'))
+DB_POOL_PING_AFTER = float(os.environ.get('DB_POOL_PING_AFTER', '30'))
+DATABASE_REPLICA_URLS: List[str] = [
+    dsn.strip() for dsn in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if dsn.strip()
+]
+REPLICA_MAX_LAG_SECONDS = float(os.environ.get('REPLICA_MAX_LAG_SECONDS', '5'))
+REPLICA_LAG_CHECK_INTERVAL = float(os.environ.get('REPLICA_LAG_CHECK_INTERVAL', '5'))
+# Клиент, который только что записал и сразу перечитывает (админка после сохранения), просит мастер
+CONSISTENCY_HEADER = 'x-consistency'
+
+# Реплика, которая всё проиграла, отстаёт на 0 секунд, даже если мастер давно ничего не писал.
+# Реплика без потока WAL (упал приёмник, мастер недоступен) - NULL: данные на ней неизвестной свежести.
+# status в pg_stat_wal_receiver виден ролям с pg_read_all_stats; без этой роли реплика считается отключённой
+REPLICA_LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN NOT EXISTS (SELECT 1 FROM pg_stat_wal_receiver WHERE status = 'streaming') THEN NULL
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+"""
+
+# Ключ пула - строка подключения; None - мастер из DATABASE_URL
+_pools: Dict[Optional[str], pg_pool.ThreadedConnectionPool] = {}
+_pool_lock = threading.Lock()
+_last_used: Dict[int, float] = {}
+# Реплика -> (отставание в секундах или None, если реплика недоступна, время замера)
+_replica_lag: Dict[str, Tuple[Optional[float], float]] = {}
+_replica_turn = itertools.count()
+
+
+def get_pool(dsn: Optional[str] = None) -> pg_pool.ThreadedConnectionPool:
+    pool = _pools.get(dsn)
+    if pool is None or pool.closed:
+        with _pool_lock:
+            pool = _pools.get(dsn)
+            if pool is None or pool.closed:
+                pool = _pools[dsn] = pg_pool.ThreadedConnectionPool(
+                    DB_POOL_MIN,
+                    DB_POOL_MAX,
+                    dsn=dsn or os.environ.get('DATABASE_URL'),
+                )
+    return pool
+
+
+def _close_pool(dsn: Optional[str]) -> None:
+    with _pool_lock:
+        pool = _pools.pop(dsn, None)
+        if pool is not None and not pool.closed:
+            pool.closeall()
+
+
+def reset_pool() -> None:
+    '''Закрывает все соединения, например после переключения мастера'''
+    for dsn in list(_pools):
+        _close_pool(dsn)
+    _last_used.clear()
+    _replica_lag.clear()
+
+
+def _is_alive(conn: PgConnection) -> bool:
+    if conn.closed:
+        return False
+    # Пингуем только соединения, которые долго простаивали: горячий путь не платит лишний round trip
+    if time.monotonic() - _last_used.get(id(conn), 0.0) < DB_POOL_PING_AFTER:
+        return True
+    try:
+        with conn.cursor() as cur:
+            cur.execute('SELECT 1')
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+
+def _checkout(dsn: Optional[str] = None) -> Tuple[pg_pool.ThreadedConnectionPool, PgConnection]:
+    pool = get_pool(dsn)
+    # Пул может целиком состоять из мёртвых соединений после failover — перебираем до DB_POOL_MAX раз
+    for _ in range(DB_POOL_MAX + 1):
+        conn = pool.getconn()
+        if _is_alive(conn):
+            return pool, conn
+        _last_used.pop(id(conn), None)
+        pool.putconn(conn, close=True)
+    _close_pool(dsn)
+    pool = get_pool(dsn)
+    return pool, pool.getconn()
+
+
+def _measure_lag(conn: PgConnection) -> Optional[float]:
+    with conn.cursor() as cur:
+        cur.execute(REPLICA_LAG_SQL)
+        lag = cur.fetchone()[0]
+    conn.rollback()
+    return float(lag) if lag is not None else None
+
+
+def _checkout_replica() -> Optional[Tuple[pg_pool.ThreadedConnectionPool, PgConnection]]:
+    '''Реплики по кругу; отставание перемеряется на выданном соединении не чаще REPLICA_LAG_CHECK_INTERVAL.
+    None - ни одна реплика сейчас не годится, читать нужно с мастера'''
+    start = next(_replica_turn)
+    for i in range(len(DATABASE_REPLICA_URLS)):
+        dsn = DATABASE_REPLICA_URLS[(start + i) % len(DATABASE_REPLICA_URLS)]
+        lag, checked_at = _replica_lag.get(dsn, (None, float('-inf')))
+        fresh = time.monotonic() - checked_at < REPLICA_LAG_CHECK_INTERVAL
+        if fresh and (lag is None or lag > REPLICA_MAX_LAG_SECONDS):
+            continue
+        pool, conn = None, None
+        try:
+            pool, conn = _checkout(dsn)
+            if not fresh:
+                lag = _measure_lag(conn)
+                _replica_lag[dsn] = (lag, time.monotonic())
+        except psycopg2.Error:
+            _replica_lag[dsn] = (None, time.monotonic())
+            if conn is not None:
+                _last_used.pop(id(conn), None)
+                pool.putconn(conn, close=True)
+            continue
+        if lag is not None and lag <= REPLICA_MAX_LAG_SECONDS:
+            return pool, conn
+        pool.putconn(conn)
+    return None
+
+
+def replica_allowed(event: Dict[str, Any]) -> bool:
+    '''GET без X-Consistency: primary - клиенту достаточно данных с отставанием до REPLICA_MAX_LAG_SECONDS'''
+    if event.get('httpMethod', 'GET') != 'GET':
+        return False
+    for name, value in (event.get('headers') or {}).items():
+        if name.lower() == CONSISTENCY_HEADER:
+            return str(value).strip().lower() != 'primary'
+    return True
+
+
+@contextmanager
+def connection(readonly: bool = False) -> Iterator[PgConnection]:
+    '''Выдаёт соединение из пула и всегда возвращает его обратно, даже при исключении.
+    readonly=True - только чтение, допускающее отставание до REPLICA_MAX_LAG_SECONDS; записи и чтение
+    сразу после своей записи идут на мастер'''
+    with phase('db_connect'):
+        checkout = _checkout_replica() if readonly and DATABASE_REPLICA_URLS else None
+        pool, conn = checkout or _checkout()
+    broken = False
+    try:
+        yield conn
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        broken = True
+        raise
+    finally:
+        broken = broken or bool(conn.closed)
+        if broken:
+            _last_used.pop(id(conn), None)
+        else:
+            _last_used[id(conn)] = time.monotonic()
+        # putconn сам откатывает незавершённую транзакцию перед возвратом в пул
+        pool.putconn(conn, close=broken)
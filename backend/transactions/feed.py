@@ -0,0 +1,173 @@
+'''
+Business: Лента смены статусов транзакций: одно LISTEN-соединение на контейнер будит всех ждущих клиентов
+Args: DATABASE_URL - строка подключения; STATUS_FEED_MAX_WAIT - предел long-poll в секундах;
+      STATUS_FEED_IDLE_SECONDS - через сколько секунд без ожидающих закрывать слушателя
+Returns: wait_for_status() - текущий статус транзакции сразу или после NOTIFY, либо по таймауту
+'''
+
+import json
+import os
+import select
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import psycopg2
+
+from db import connection
+from queries import TX_STATUS
+from statements import execute
+
+STATUS_CHANNEL = 'transaction_status_changed'
+STATUS_FEED_MAX_WAIT = float(os.environ.get('STATUS_FEED_MAX_WAIT', '25'))
+STATUS_FEED_IDLE_SECONDS = float(os.environ.get('STATUS_FEED_IDLE_SECONDS', '60'))
+LISTENER_START_TIMEOUT = 2.0
+LISTENER_POLL_SECONDS = 5.0
+# Пауза между попытками переподключиться удваивается до этого предела, пока база недоступна
+LISTENER_BACKOFF_MAX_SECONDS = 30.0
+
+
+class _Waiter:
+    __slots__ = ('event', 'status', 'reset')
+
+    def __init__(self) -> None:
+        self.event = threading.Event()
+        self.status: Optional[str] = None
+        # Слушатель переподключался: уведомления могли потеряться, нужно перечитать строку
+        self.reset = False
+
+
+_lock = threading.Lock()
+_waiters: Dict[int, List[_Waiter]] = {}
+_listener: Optional[threading.Thread] = None
+_ready = threading.Event()
+
+
+def parse_watch_query(query_params: Dict[str, Any]) -> Tuple[int, str, float]:
+    '''id транзакции, статус, который клиент уже знает, и сколько ждать смены'''
+    try:
+        transaction_id = int(query_params['id'])
+        timeout = float(query_params.get('timeout') or STATUS_FEED_MAX_WAIT)
+    except (KeyError, ValueError):
+        raise ValueError('id must be an integer and timeout a number')
+    return transaction_id, query_params.get('status') or 'pending', max(0.0, min(timeout, STATUS_FEED_MAX_WAIT))
+
+
+def _wake(transaction_id: Optional[int], status: Optional[str]) -> None:
+    with _lock:
+        if transaction_id is None:
+            targets = [waiter for waiters in _waiters.values() for waiter in waiters]
+        else:
+            targets = _waiters.get(transaction_id, [])
+        for waiter in targets:
+            if transaction_id is None:
+                waiter.reset = True
+            else:
+                waiter.status = status
+            waiter.event.set()
+
+
+def _should_stop(idle_since: float) -> bool:
+    '''Без ожидающих дольше STATUS_FEED_IDLE_SECONDS слушатель закрывается; решение под _lock,
+    чтобы новый ожидающий либо застал живого слушателя, либо запустил нового'''
+    global _listener
+    with _lock:
+        if _waiters or time.monotonic() - idle_since < STATUS_FEED_IDLE_SECONDS:
+            return False
+        _listener = None
+        _ready.clear()
+        return True
+
+
+def _listen() -> None:
+    idle_since = time.monotonic()
+    failures = 0
+    while True:
+        conn = None
+        try:
+            conn = psycopg2.connect(os.environ.get('DATABASE_URL'))
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                cur.execute(f'LISTEN {STATUS_CHANNEL}')
+            _ready.set()
+            failures = 0
+            while True:
+                if _waiters:
+                    idle_since = time.monotonic()
+                elif _should_stop(idle_since):
+                    return
+                if select.select([conn], [], [], LISTENER_POLL_SECONDS) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    notify = conn.notifies.pop(0)
+                    try:
+                        payload = json.loads(notify.payload)
+                        _wake(int(payload['id']), payload['status'])
+                    except (ValueError, KeyError, TypeError):
+                        continue
+        except (psycopg2.Error, OSError) as e:
+            print(json.dumps({'event': 'status_feed_listener_failed', 'error': str(e)}))
+            _ready.clear()
+            _wake(None, None)
+            # Без ожидающих слушатель не переподключается вечно: при недоступной базе он закрывается так же,
+            # как и при простое, а следующий ожидающий запустит нового
+            if _waiters:
+                idle_since = time.monotonic()
+            elif _should_stop(idle_since):
+                return
+            time.sleep(min(LISTENER_BACKOFF_MAX_SECONDS, 2 ** failures))
+            failures += 1
+        finally:
+            if conn is not None:
+                conn.close()
+
+
+def _ensure_listener() -> bool:
+    global _listener
+    with _lock:
+        if _listener is None or not _listener.is_alive():
+            _ready.clear()
+            _listener = threading.Thread(target=_listen, name='status-feed', daemon=True)
+            _listener.start()
+    return _ready.wait(LISTENER_START_TIMEOUT)
+
+
+def _read_status(transaction_id: int) -> Optional[str]:
+    with connection() as conn:
+        with conn.cursor() as cur:
+            execute(cur, TX_STATUS, [transaction_id])
+            row = cur.fetchone()
+        conn.commit()
+    return row[0] if row else None
+
+
+def wait_for_status(transaction_id: int, known_status: str, timeout: float) -> Tuple[Optional[str], bool]:
+    '''(статус, изменился ли). Ожидающий регистрируется и слушатель поднимается до чтения строки,
+    поэтому смена, закоммиченная после чтения, не потеряется. Соединение из пула на время ожидания не держим'''
+    waiter = _Waiter()
+    with _lock:
+        _waiters.setdefault(transaction_id, []).append(waiter)
+    try:
+        listening = _ensure_listener()
+        status = _read_status(transaction_id)
+        # Без слушателя ждать нечего: клиент получит текущий статус и повторит запрос
+        if status is None or status != known_status or not listening:
+            return status, status != known_status
+
+        deadline = time.monotonic() + timeout
+        while waiter.event.wait(max(0.0, deadline - time.monotonic())):
+            waiter.event.clear()
+            if waiter.reset:
+                status = _read_status(transaction_id)
+                return status, status != known_status
+            if waiter.status != known_status:
+                return waiter.status, True
+        return known_status, False
+    finally:
+        with _lock:
+            waiters = _waiters.get(transaction_id, [])
+            if waiter in waiters:
+                waiters.remove(waiter)
+            if not waiters:
+                _waiters.pop(transaction_id, None)
@@ -0,0 +1,95 @@
+'''
+Business: Именованные запросы функции transactions для реестра подготовленных выражений
+Args: filters - список (имя фильтра, значения) из parse_list_query
+Returns: Statement для statements.execute(), WHERE для серверного курсора выгрузки, TX_BULK_* для execute_values
+'''
+
+from string import Formatter
+from typing import Any, List, Tuple
+
+from statements import Statement, statement
+
+# Порядок ключей фиксирован: один и тот же набор фильтров всегда даёт одно имя и один план
+LIST_FILTERS = {
+    'status': 't.status = {}',
+    'currency': 't.currency = {}',
+    'date_from': 't.created_at >= {}::timestamp',
+    'date_to': 't.created_at < {}::timestamp',
+    # Отдельное условие на created_at нужно для отсечения секций: сравнение строк Postgres для этого не использует
+    'cursor': 't.created_at <= {0}::timestamp AND (t.created_at, t.id) < ({0}::timestamp, {1}::int)',
+}
+
+Filters = List[Tuple[str, List[Any]]]
+
+TX_UPDATE_STATUS = statement('tx_update_status', """
+    UPDATE transactions SET status = $1, updated_at = NOW()
+    WHERE id = $2
+    RETURNING id, amount, currency, status, created_at
+""")
+
+TX_STATUS = statement('tx_status', """
+    SELECT status FROM transactions WHERE id = $1::int
+""")
+
+# Пакетные варианты для execute_values. Реквизиты выбирает allocation.allocate_many() до вставки.
+# id из последовательности растут в порядке ord, поэтому ORDER BY id возвращает строки в порядке пачки
+TX_BULK_CREATE = """
+    WITH ins AS (
+        INSERT INTO transactions (amount, currency, amount_cny, status, payment_detail_id)
+        SELECT v.amount, v.currency, v.amount_cny, 'pending', v.payment_detail_id
+        FROM (VALUES %s) AS v(ord, amount, currency, amount_cny, payment_detail_id)
+        ORDER BY v.ord
+        RETURNING id, amount, currency, amount_cny, status, created_at, payment_detail_id
+    )
+    SELECT ins.id, ins.amount, ins.currency, ins.amount_cny, ins.status, ins.created_at,
+           ins.payment_detail_id, pd.recipient_name, pd.account_number
+    FROM ins
+    LEFT JOIN payment_details pd ON pd.id = ins.payment_detail_id
+    ORDER BY ins.id
+"""
+TX_BULK_CREATE_TEMPLATE = '(%s::int, %s::numeric, %s::varchar, %s::numeric, %s::int)'
+
+TX_BULK_UPDATE_STATUS = """
+    UPDATE transactions t
+    SET status = v.status, updated_at = NOW()
+    FROM (VALUES %s) AS v(id, status)
+    WHERE t.id = v.id
+    RETURNING t.id, t.amount, t.currency, t.status, t.created_at
+"""
+TX_BULK_UPDATE_STATUS_TEMPLATE = '(%s::int, %s::varchar)'
+
+
+def where_clause(filters: Filters, numbered: bool = True) -> Tuple[str, List[Any]]:
+    '''WHERE с плейсхолдерами $n для PREPARE или %s для обычного execute'''
+    conditions: List[str] = []
+    args: List[Any] = []
+    for name, values in filters:
+        template = LIST_FILTERS[name]
+        if numbered:
+            marks = []
+            for value in values:
+                args.append(value)
+                marks.append(f'${len(args)}')
+        else:
+            # %s позиционные: значение, которое шаблон использует дважды, передаётся дважды
+            fields = [field for _, field, _, _ in Formatter().parse(template) if field is not None]
+            args.extend(values[int(field) if field else i] for i, field in enumerate(fields))
+            marks = ['%s'] * len(values)
+        conditions.append(template.format(*marks))
+    return ('WHERE ' + ' AND '.join(conditions)) if conditions else '', args
+
+
+def list_statement(filters: Filters) -> Tuple[Statement, List[Any]]:
+    '''Отдельный подготовленный запрос на каждую комбинацию фильтров; последний параметр - LIMIT'''
+    where_sql, args = where_clause(filters)
+    name = 'tx_list_' + ('_'.join(name for name, _ in filters) or 'all')
+    stmt = statement(name, f"""
+        SELECT t.id, t.amount, t.currency, t.amount_cny, t.status,
+               t.created_at, pd.recipient_name, pd.account_number
+        FROM transactions t
+        LEFT JOIN payment_details pd ON t.payment_detail_id = pd.id
+        {where_sql}
+        ORDER BY t.created_at DESC, t.id DESC
+        LIMIT ${len(args) + 1}
+    """)
+    return stmt, args
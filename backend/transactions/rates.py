@@ -0,0 +1,152 @@
+'''
+Business: Курсы валют к CNY с кэшем в памяти (TTL + stale-while-revalidate) и конвертацией в Decimal
+Args: EXCHANGE_RATES_PROVIDER - db (по умолчанию), file:<путь к JSON> или static:<JSON>;
+      EXCHANGE_RATES_TTL / EXCHANGE_RATES_MAX_STALE - свежесть кэша в секундах
+Returns: current_rates() без блокировки на обновлении, to_cny() и convert_many() для пачки строк
+'''
+
+import json
+import os
+import threading
+import time
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Callable, Dict, Iterable, List, Optional
+
+from db import connection
+
+EXCHANGE_RATES_PROVIDER = os.environ.get('EXCHANGE_RATES_PROVIDER', 'db')
+EXCHANGE_RATES_TTL = float(os.environ.get('EXCHANGE_RATES_TTL', '300'))
+EXCHANGE_RATES_MAX_STALE = float(os.environ.get('EXCHANGE_RATES_MAX_STALE', '86400'))
+BASE_CURRENCY = 'CNY'
+CENT = Decimal('0.01')
+# Последний известный курс на случай пустой таблицы и недоступного провайдера
+FALLBACK_RATES = {'RUB': Decimal('11.40')}
+
+Rates = Dict[str, Decimal]
+
+_rates: Optional[Rates] = None
+_loaded_at = 0.0
+_lock = threading.Lock()
+_refreshing = threading.Event()
+
+
+class UnsupportedCurrency(ValueError):
+    pass
+
+
+def _parse(raw: Dict[str, object]) -> Rates:
+    return {currency.upper(): Decimal(str(rate)) for currency, rate in raw.items()}
+
+
+def _from_db() -> Rates:
+    with connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT DISTINCT ON (currency) currency, units_per_cny
+                FROM exchange_rates
+                ORDER BY currency, effective_at DESC
+                """
+            )
+            return {currency: rate for currency, rate in cur.fetchall()}
+
+
+def _from_file(path: str) -> Rates:
+    with open(path, encoding='utf-8') as f:
+        return _parse(json.load(f))
+
+
+def _record_history(rates: Rates, source: str) -> None:
+    '''Внешний провайдер пишет в exchange_rates только изменившиеся курсы'''
+    with connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                INSERT INTO exchange_rates (currency, units_per_cny, source)
+                SELECT new.currency, new.units_per_cny, %s
+                FROM unnest(%s::varchar[], %s::numeric[]) AS new(currency, units_per_cny)
+                WHERE new.units_per_cny IS DISTINCT FROM (
+                    SELECT units_per_cny FROM exchange_rates r
+                    WHERE r.currency = new.currency
+                    ORDER BY effective_at DESC LIMIT 1
+                )
+                """,
+                (source, list(rates), list(rates.values()))
+            )
+        conn.commit()
+
+
+def _fetch() -> Rates:
+    provider = EXCHANGE_RATES_PROVIDER
+    if provider.startswith('file:'):
+        rates = _from_file(provider[len('file:'):])
+        _record_history(rates, 'file')
+    elif provider.startswith('static:'):
+        rates = _parse(json.loads(provider[len('static:'):]))
+    else:
+        rates = _from_db()
+    return rates or dict(FALLBACK_RATES)
+
+
+def refresh() -> Rates:
+    global _rates, _loaded_at
+    rates = _fetch()
+    with _lock:
+        _rates = rates
+        _loaded_at = time.monotonic()
+    return rates
+
+
+def _refresh_in_background() -> None:
+    try:
+        refresh()
+    except Exception as e:
+        # Старый курс остаётся в кэше, следующий запрос попробует снова
+        print(json.dumps({'event': 'exchange_rates_refresh_failed', 'error': str(e)}))
+    finally:
+        _refreshing.clear()
+
+
+def current_rates() -> Rates:
+    '''Свежий кэш отдаётся сразу; устаревший тоже, но обновление запускается в фоне (одно на процесс).
+    Блокирующая загрузка только на холодном старте или если кэш старше EXCHANGE_RATES_MAX_STALE'''
+    rates, age = _rates, time.monotonic() - _loaded_at
+    if rates is None or age > EXCHANGE_RATES_MAX_STALE:
+        return refresh()
+    if age > EXCHANGE_RATES_TTL and not _refreshing.is_set():
+        with _lock:
+            if not _refreshing.is_set():
+                _refreshing.set()
+                threading.Thread(target=_refresh_in_background, daemon=True).start()
+    return rates
+
+
+def to_cny(amount: Decimal, currency: str, rates: Rates) -> Decimal:
+    if not isinstance(currency, str):
+        raise UnsupportedCurrency(f'Unsupported currency: {currency!r}')
+    currency = currency.upper()
+    if currency == BASE_CURRENCY:
+        return amount.quantize(CENT, rounding=ROUND_HALF_UP)
+    rate = rates.get(currency)
+    if rate is None:
+        raise UnsupportedCurrency(f'Unsupported currency: {currency}')
+    return (amount / rate).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def convert_many(
+    items: Iterable[Dict[str, object]],
+    rates: Rates,
+    amount_key: str = 'amount',
+    currency_key: str = 'currency',
+    target_key: str = 'amount_cny',
+    cast: Callable[[Decimal], object] = float,
+) -> List[Dict[str, object]]:
+    '''Пересчёт пачки строк одним проходом с одним снимком курсов: все строки видят один и тот же курс'''
+    converted = []
+    for item in items:
+        try:
+            item[target_key] = cast(to_cny(Decimal(str(item[amount_key])), str(item[currency_key]), rates))
+        except UnsupportedCurrency:
+            pass
+        converted.append(item)
+    return converted
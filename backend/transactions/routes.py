@@ -0,0 +1,363 @@
+'''
+Business: Обработчики методов API транзакций; index.py импортирует модуль при первом запросе, не на холодном старте
+Args: event, context - как у handler в index.py
+Returns: get / post / put - HTTP response dict
+'''
+
+import base64
+import hashlib
+import json
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+from typing import Callable, Dict, Any, List, Tuple
+
+from psycopg2.extensions import cursor as PgCursor
+from psycopg2.extras import execute_values
+
+from allocation import allocate_many, create_statement, lock_load_for
+from bulk import Outcome, parse_bulk, run_bulk
+from db import connection, replica_allowed
+from export import EXPORT_FORMATS, ExportTooLarge, export_transactions
+from feed import parse_watch_query, wait_for_status
+from idempotency import Stored, cached, claim, lookup, remember, store
+from metrics import phase
+from queries import (
+    Filters, TX_BULK_CREATE, TX_BULK_CREATE_TEMPLATE, TX_BULK_UPDATE_STATUS, TX_BULK_UPDATE_STATUS_TEMPLATE,
+    TX_UPDATE_STATUS, list_statement
+)
+from rates import Rates, convert_many, current_rates, to_cny
+from runtime import (
+    JSON_HEADERS, dumps, error, header, json_body, parse_fields, project, respond, respond_negotiated, respond_raw
+)
+from statements import execute
+from stats import TX_STATS, build_stats, lock_stats_for_create, lock_stats_for_status, parse_stats_range
+from versions import cached_body, collection_version, etag, not_modified, remember_body, variant_key
+from workqueue import parse_queue_request, run_queue_action
+
+DEFAULT_PAGE_LIMIT = 50
+MAX_PAGE_LIMIT = 500
+MAX_AMOUNT = Decimal('99999999.99')
+IDEMPOTENCY_SCOPE = 'transactions_create'
+VERSIONED_BY = ('transactions', 'payment_details')
+# Поля элемента листинга, которые можно запросить через ?fields=
+TRANSACTION_FIELDS = ('id', 'amount', 'currency', 'amount_cny', 'status', 'date', 'payment_details')
+TX_CREATE = create_statement()
+# no-cache: браузер хранит ответ, но каждый раз переспрашивает с If-None-Match и получает 304
+CACHE_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Expose-Headers': 'ETag',
+    'Cache-Control': 'no-cache',
+    # Тело листинга может прийти сжатым: промежуточные кэши различают варианты по Accept-Encoding
+    'Vary': 'Accept-Encoding'
+}
+WATCH_HEADERS = {**JSON_HEADERS, 'Cache-Control': 'no-store'}
+REPLAYED_HEADERS = {**JSON_HEADERS, 'Idempotent-Replayed': 'true'}
+
+def encode_cursor(created_at: datetime, transaction_id: int) -> str:
+    raw = json.dumps([created_at.isoformat(), transaction_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        created_at, transaction_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(transaction_id)
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+
+def parse_list_query(query_params: Dict[str, Any]) -> Tuple[Filters, int]:
+    '''Разбирает limit, cursor, status, currency, date_from, date_to в фильтры листинга'''
+    try:
+        limit = int(query_params.get('limit') or DEFAULT_PAGE_LIMIT)
+    except ValueError:
+        raise ValueError('limit must be an integer')
+    limit = max(1, min(limit, MAX_PAGE_LIMIT))
+    
+    filters: Filters = []
+    
+    for name in ('status', 'currency'):
+        if query_params.get(name):
+            filters.append((name, [query_params[name]]))
+    
+    for name in ('date_from', 'date_to'):
+        if query_params.get(name):
+            try:
+                value = datetime.fromisoformat(query_params[name])
+            except ValueError:
+                raise ValueError(f'{name} must be an ISO date')
+            filters.append((name, [value]))
+    
+    if query_params.get('cursor'):
+        filters.append(('cursor', list(decode_cursor(query_params['cursor']))))
+    
+    return filters, limit
+
+def parse_amount(raw: Any) -> Decimal:
+    '''Колонки amount и amount_cny - DECIMAL(10, 2), переполнение ловим до БД'''
+    try:
+        amount = Decimal(str(raw))
+        if not amount.is_finite() or amount <= 0 or amount > MAX_AMOUNT:
+            raise InvalidOperation()
+    except InvalidOperation:
+        raise ValueError('amount must be a number')
+    return amount
+
+def parse_currency(raw: Any) -> str:
+    if not isinstance(raw, str) or not raw:
+        raise ValueError('currency must be a string')
+    return raw
+
+def amount_in_cny(amount: Decimal, currency: str, rates: Rates) -> Decimal:
+    amount_cny = to_cny(amount, currency, rates)
+    if amount_cny > MAX_AMOUNT:
+        raise ValueError('amount is too large')
+    return amount_cny
+
+def parse_create_item(item: Dict[str, Any], rates: Callable[[], Rates]) -> Tuple[Decimal, str, Decimal]:
+    '''Курсы запрашиваются только для пополнения, прошедшего проверку суммы и валюты'''
+    amount = parse_amount(item.get('amount'))
+    currency = parse_currency(item.get('currency', 'CNY'))
+    return amount, currency, amount_in_cny(amount, currency, rates())
+
+def parse_status_item(item: Dict[str, Any]) -> Tuple[int, str]:
+    status = item.get('status')
+    if not isinstance(status, str) or not status or len(status) > 50:
+        raise ValueError('status must be a non-empty string')
+    return int(item['id']), status
+
+def serialize_created(row: Tuple) -> Dict[str, Any]:
+    return {
+        'id': row[0],
+        'amount': float(row[1]),
+        'currency': row[2],
+        'amount_cny': float(row[3]),
+        'status': row[4],
+        'date': row[5].isoformat() if row[5] else None,
+        'payment_details': {
+            'recipient_name': row[7],
+            'account_number': row[8]
+        } if row[6] else None
+    }
+
+def serialize_updated(row: Tuple) -> Dict[str, Any]:
+    return {
+        'id': row[0],
+        'amount': float(row[1]),
+        'currency': row[2],
+        'status': row[3],
+        'date': row[4].isoformat() if row[4] else None
+    }
+
+def write_creates(cur: PgCursor, rows: List[Tuple]) -> List[Outcome]:
+    detail_ids = allocate_many(cur, rows)
+    lock_stats_for_create(cur, [row[1] for row in rows])
+    numbered = [(ordinal,) + row + (detail_id,) for ordinal, (row, detail_id) in enumerate(zip(rows, detail_ids))]
+    created = execute_values(cur, TX_BULK_CREATE, numbered, template=TX_BULK_CREATE_TEMPLATE, page_size=len(rows), fetch=True)
+    return [(201, serialize_created(row)) for row in created]
+
+def write_status_updates(cur: PgCursor, rows: List[Tuple]) -> List[Outcome]:
+    lock_load_for(cur, [row[0] for row in rows])
+    lock_stats_for_status(cur, [row[0] for row in rows], [row[1] for row in rows])
+    updated = execute_values(cur, TX_BULK_UPDATE_STATUS, rows, template=TX_BULK_UPDATE_STATUS_TEMPLATE, page_size=len(rows), fetch=True)
+    by_id = {row[0]: serialize_updated(row) for row in updated}
+    return [(200, by_id[row[0]]) if row[0] in by_id else (404, 'Transaction not found') for row in rows]
+
+def replay_response(stored: Stored, request_sha256: str) -> Dict[str, Any]:
+    status_code, body, stored_sha256 = stored
+    if stored_sha256 and stored_sha256 != request_sha256:
+        return error(422, 'Idempotency-Key was already used with a different request')
+    return respond_raw(status_code, body, REPLAYED_HEADERS)
+
+def get(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    query_params = event.get('queryStringParameters', {}) or {}
+    is_stats = (event.get('path') or '').rstrip('/').endswith('/stats') or query_params.get('view') == 'stats'
+    is_watch = query_params.get('view') == 'watch'
+    try:
+        if is_watch:
+            watch_id, known_status, timeout = parse_watch_query(query_params)
+        elif is_stats:
+            date_from, date_to = parse_stats_range(query_params)
+        else:
+            filters, limit = parse_list_query(query_params)
+            fields = parse_fields(query_params, TRANSACTION_FIELDS)
+    except ValueError as e:
+        return error(400, str(e))
+    
+    if is_watch:
+        # Ожидание идёт на общем LISTEN-соединении процесса, а не на соединении из пула
+        status, changed = wait_for_status(watch_id, known_status, timeout)
+        if status is None:
+            return error(404, 'Transaction not found')
+        return respond(200, {'id': watch_id, 'status': status, 'changed': changed}, WATCH_HEADERS)
+    
+    with connection(readonly=replica_allowed(event)) as conn:
+        if is_stats:
+            with conn.cursor() as cur:
+                execute(cur, TX_STATS, [date_from, date_to])
+                rows = cur.fetchall()
+            return respond(200, build_stats(rows, date_from, date_to))
+        
+        export_format = query_params.get('format')
+        if export_format in EXPORT_FORMATS:
+            try:
+                payload = export_transactions(conn, filters, export_format)
+            except ExportTooLarge as e:
+                return error(413, str(e))
+            return {
+                'statusCode': 200,
+                'headers': {
+                    'Content-Type': EXPORT_FORMATS[export_format],
+                    'Content-Encoding': 'gzip',
+                    'Content-Disposition': f'attachment; filename="transactions.{export_format}"',
+                    'Access-Control-Allow-Origin': '*'
+                },
+                'body': base64.b64encode(payload).decode(),
+                'isBase64Encoded': True
+            }
+        
+        # rates=current зависит ещё и от курсов, такой ответ не кэшируем
+        cacheable = query_params.get('rates') != 'current'
+        with conn.cursor() as cur:
+            # Листинг включает реквизиты, поэтому версия — сумма счётчиков обеих таблиц
+            version = collection_version(cur, VERSIONED_BY) if cacheable else 0
+            list_key = variant_key('transactions', query_params)
+            list_etag = etag(list_key, version)
+            if cacheable and not_modified(event, list_etag):
+                return respond_raw(304, '', {**CACHE_HEADERS, 'ETag': list_etag})
+            
+            body = cached_body(list_key, version) if cacheable else None
+            if body is None:
+                # Keyset-пагинация по (created_at, id): глубина страницы не влияет на стоимость запроса
+                stmt, args = list_statement(filters)
+                execute(cur, stmt, args + [limit + 1])
+                rows = cur.fetchall()
+            
+                next_cursor = None
+                if len(rows) > limit:
+                    rows = rows[:limit]
+                    next_cursor = encode_cursor(rows[-1][5], rows[-1][0])
+            
+                with phase('serialize'):
+                    transactions = [{
+                        'id': row[0],
+                        'amount': float(row[1]),
+                        'currency': row[2],
+                        'amount_cny': float(row[3]),
+                        'status': row[4],
+                        'date': row[5].isoformat() if row[5] else None,
+                        'payment_details': {
+                            'recipient_name': row[6],
+                            'account_number': row[7]
+                        } if row[6] else None
+                    } for row in rows]
+            
+                    # rates=current: пересчёт суммы в CNY по текущему курсу одним проходом для всей страницы
+                    if not cacheable:
+                        transactions = convert_many(transactions, current_rates())
+                    body = dumps({'transactions': project(transactions, fields), 'next_cursor': next_cursor})
+                if cacheable:
+                    remember_body(list_key, version, body)
+    
+    headers = {**CACHE_HEADERS, 'Content-Type': 'application/json'}
+    if cacheable:
+        headers['ETag'] = list_etag
+    # Длинная история иначе упирается в лимит размера ответа функции; кэшированное тело сжимается один раз
+    return respond_negotiated(event, 200, body, headers, reuse=cacheable)
+
+def post_queue(event: Dict[str, Any]) -> Dict[str, Any]:
+    try:
+        action, operator, queue_params = parse_queue_request(json_body(event))
+    except ValueError as e:
+        return error(400, str(e))
+    with connection() as conn:
+        with conn.cursor() as cur:
+            result = run_queue_action(cur, action, operator, queue_params)
+        conn.commit()
+    return respond(200, result)
+
+def post(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    is_queue = (
+        (event.get('path') or '').rstrip('/').endswith('/queue')
+        or (event.get('queryStringParameters') or {}).get('view') == 'queue'
+    )
+    if is_queue:
+        return post_queue(event)
+    
+    idempotency_key = header(event, 'Idempotency-Key')
+    request_sha256 = hashlib.sha256((event.get('body') or '').encode()).hexdigest()
+    stored = cached(IDEMPOTENCY_SCOPE, idempotency_key) if idempotency_key else None
+    if stored is not None:
+        return replay_response(stored, request_sha256)
+    
+    try:
+        body_data = json_body(event)
+        bulk = parse_bulk(body_data)
+        # Одни курсы на весь запрос, но читаются только когда понадобились первому валидному пополнению
+        rates = lru_cache(maxsize=1)(current_rates)
+        if bulk is None:
+            amount, currency, amount_cny = parse_create_item(body_data, rates)
+    except ValueError as e:
+        return error(400, str(e))
+    
+    with connection() as conn:
+        with conn.cursor() as cur:
+            if idempotency_key:
+                # Повтор клиента стоит одного поиска по PK; гонку двух одновременных повторов решает claim()
+                stored = lookup(cur, IDEMPOTENCY_SCOPE, idempotency_key)
+                if stored is None and not claim(cur, IDEMPOTENCY_SCOPE, idempotency_key, request_sha256):
+                    stored = lookup(cur, IDEMPOTENCY_SCOPE, idempotency_key)
+                    if stored is None:
+                        return error(409, 'Request with this Idempotency-Key is in progress')
+                if stored is not None:
+                    remember(IDEMPOTENCY_SCOPE, idempotency_key, stored)
+                    return replay_response(stored, request_sha256)
+        
+            if bulk is not None:
+                # Пачка - один INSERT и один коммит; курсы прочитаны один раз на всю пачку
+                items, atomic = bulk
+                status_code, result = run_bulk(cur, items, atomic, lambda item: parse_create_item(item, rates), write_creates)
+                response_body = dumps(result)
+            else:
+                # Один round trip: выбор реквизитов по счётчикам и вставка одним запросом, см. allocation.py
+                execute(cur, TX_CREATE, [currency, amount, amount_cny])
+                row = cur.fetchone()
+                status_code = 201
+                response_body = dumps(serialize_created(row))
+        
+            # Ответ сохраняется в той же транзакции, что и вставка: либо есть оба, либо ни одного
+            if idempotency_key:
+                store(cur, IDEMPOTENCY_SCOPE, idempotency_key, status_code, response_body)
+        conn.commit()
+    if idempotency_key:
+        remember(IDEMPOTENCY_SCOPE, idempotency_key, (status_code, response_body, request_sha256))
+    
+    return respond_raw(status_code, response_body)
+
+def put(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    try:
+        body_data = json_body(event)
+        bulk = parse_bulk(body_data)
+    except ValueError as e:
+        return error(400, str(e))
+    
+    with connection() as conn:
+        if bulk is not None:
+            # Разбор дневного бэклога: одна команда UPDATE и один коммит на всю пачку
+            items, atomic = bulk
+            with conn.cursor() as cur:
+                status_code, result = run_bulk(cur, items, atomic, parse_status_item, write_status_updates)
+            conn.commit()
+            return respond(status_code, result)
+        
+        transaction_id = body_data.get('id')
+        status = body_data.get('status', '')
+    
+        with conn.cursor() as cur:
+            execute(cur, TX_UPDATE_STATUS, [status, transaction_id])
+            row = cur.fetchone()
+            conn.commit()
+    
+    if row:
+        return respond(200, serialize_updated(row))
+    return error(404, 'Transaction not found')
@@ -0,0 +1,96 @@
+'''
+Business: Сводка по транзакциям для админки из таблицы transaction_stats_daily
+Args: date_from / date_to - диапазон дней (по умолчанию последние STATS_DEFAULT_DAYS)
+Returns: счётчики и суммы по статусам, валютам и дням; стоимость O(дней), а не O(строк);
+         lock_stats_for_create()/lock_stats_for_status() - блокировка строк сводки перед записью пачки
+'''
+
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Any, Dict, List, Tuple
+
+from psycopg2.extensions import cursor as PgCursor
+
+from statements import execute, statement
+
+STATS_DEFAULT_DAYS = 30
+
+TX_STATS = statement('tx_stats', """
+    SELECT day, status, currency, tx_count, amount_sum, amount_cny_sum
+    FROM transaction_stats_daily
+    WHERE day >= $1::date AND day < $2::date AND tx_count > 0
+    ORDER BY day
+""")
+
+# Пачка через триггер transaction_stats_apply трогает строки сводки в порядке строк пачки, и две пачки с общими
+# днями и валютами взаимоблокировались бы. Поэтому строки сводки берутся заранее по возрастанию ключа - в том же
+# порядке, что и в триггере (V0015), и после счётчиков payment_detail_load, как и сами триггеры.
+# Недостающие строки создаются пустыми; DO UPDATE ... WHERE false блокирует существующую строку, не меняя её
+LOCK_STATS_SQL = """
+    INSERT INTO transaction_stats_daily AS s (day, status, currency)
+    SELECT DISTINCT k.day, k.status, k.currency FROM ({keys}) AS k(day, status, currency)
+    ORDER BY 1, 2, 3
+    ON CONFLICT (day, status, currency) DO UPDATE SET tx_count = s.tx_count WHERE false
+"""
+# Новые пополнения попадают в сегодняшнюю строку pending своей валюты (created_at DEFAULT NOW())
+LOCK_STATS_FOR_CREATE = statement('lock_stats_for_create', LOCK_STATS_SQL.format(keys="""
+    SELECT CURRENT_DATE, 'pending'::varchar, c FROM unnest($1::varchar[]) AS c
+"""))
+# Смена статуса уменьшает строку старого статуса и увеличивает строку нового
+LOCK_STATS_FOR_STATUS = statement('lock_stats_for_status', LOCK_STATS_SQL.format(keys="""
+    SELECT t.created_at::date, v.status, t.currency
+    FROM unnest($1::int[], $2::varchar[]) AS d(id, status)
+    JOIN transactions t ON t.id = d.id
+    CROSS JOIN LATERAL (VALUES (t.status), (d.status)) AS v(status)
+"""))
+
+
+def parse_stats_range(query_params: Dict[str, Any]) -> Tuple[date, date]:
+    '''Полуинтервал [date_from, date_to) в днях'''
+    try:
+        date_to = date.fromisoformat(query_params['date_to']) if query_params.get('date_to') else date.today() + timedelta(days=1)
+        date_from = date.fromisoformat(query_params['date_from']) if query_params.get('date_from') else date_to - timedelta(days=STATS_DEFAULT_DAYS)
+    except ValueError:
+        raise ValueError('date_from and date_to must be ISO dates')
+    return date_from, date_to
+
+
+def _bucket(buckets: Dict[str, Dict[str, Any]], key: str) -> Dict[str, Any]:
+    return buckets.setdefault(key, {'count': 0, 'amount_cny': Decimal(0)})
+
+
+def build_stats(rows: List[Tuple], date_from: date, date_to: date) -> Dict[str, Any]:
+    totals = {'count': 0, 'amount_cny': Decimal(0)}
+    by_status: Dict[str, Dict[str, Any]] = {}
+    by_currency: Dict[str, Dict[str, Any]] = {}
+    by_day: Dict[str, Dict[str, Any]] = {}
+
+    for day, status, currency, tx_count, amount_sum, amount_cny_sum in rows:
+        day_bucket = by_day.setdefault(day.isoformat(), {'count': 0, 'amount_cny': Decimal(0), 'by_status': {}})
+        currency_bucket = by_currency.setdefault(currency, {'count': 0, 'amount': Decimal(0), 'amount_cny': Decimal(0)})
+        currency_bucket['amount'] += amount_sum
+        for bucket in (totals, _bucket(by_status, status), currency_bucket, day_bucket, _bucket(day_bucket['by_status'], status)):
+            bucket['count'] += tx_count
+            bucket['amount_cny'] += amount_cny_sum
+
+    def as_json(value: Any) -> Any:
+        if isinstance(value, dict):
+            return {key: as_json(item) for key, item in value.items()}
+        return float(value) if isinstance(value, Decimal) else value
+
+    return {
+        'date_from': date_from.isoformat(),
+        'date_to': date_to.isoformat(),
+        'totals': as_json(totals),
+        'by_status': as_json(by_status),
+        'by_currency': as_json(by_currency),
+        'by_day': [{'day': day, **as_json(bucket)} for day, bucket in by_day.items()],
+    }
+
+
+def lock_stats_for_create(cur: PgCursor, currencies: List[str]) -> None:
+    execute(cur, LOCK_STATS_FOR_CREATE, [currencies])
+
+
+def lock_stats_for_status(cur: PgCursor, transaction_ids: List[int], statuses: List[str]) -> None:
+    execute(cur, LOCK_STATS_FOR_STATUS, [transaction_ids, statuses])
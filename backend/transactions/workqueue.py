@@ -0,0 +1,140 @@
+'''
+Business: Очередь ожидающих пополнений для нескольких операторов и ботов: аренда пачек и решения одним запросом
+Args: body POST /queue - action (claim | decide | release), operator, limit, lease_seconds, decisions [{id, status}], ids
+Returns: parse_queue_request() для разбора тела и run_queue_action() с результатом для JSON-ответа
+'''
+
+import os
+from typing import Any, Dict, List, Tuple
+
+from psycopg2.extensions import cursor as PgCursor
+
+from allocation import lock_load_for
+from statements import execute, statement
+from stats import lock_stats_for_status
+
+QUEUE_DEFAULT_BATCH = 20
+QUEUE_MAX_BATCH = 200
+QUEUE_LEASE_SECONDS = int(os.environ.get('QUEUE_LEASE_SECONDS', '300'))
+QUEUE_MAX_LEASE_SECONDS = 3600
+DECISION_STATUSES = ('completed', 'failed')
+QUEUE_ACTIONS = ('claim', 'decide', 'release')
+
+# SKIP LOCKED пропускает строки, которые прямо сейчас берёт другой оператор, аренда - строки, взятые раньше.
+# Свои непросроченные строки оператор получает снова с продлённой арендой: повтор claim безопасен
+TX_QUEUE_CLAIM = statement('tx_queue_claim', """
+    WITH claimed AS (
+        UPDATE transactions t
+        SET claimed_by = $1, claim_expires_at = NOW() + make_interval(secs => $2::int)
+        FROM (
+            SELECT id, created_at FROM transactions
+            WHERE status = 'pending'
+              AND (claim_expires_at IS NULL OR claim_expires_at <= NOW() OR claimed_by = $1)
+            ORDER BY created_at, id
+            LIMIT $3
+            FOR UPDATE SKIP LOCKED
+        ) due
+        WHERE t.id = due.id AND t.created_at = due.created_at
+        RETURNING t.id, t.amount, t.currency, t.amount_cny, t.created_at, t.payment_detail_id, t.claim_expires_at
+    )
+    SELECT c.id, c.amount, c.currency, c.amount_cny, c.created_at, c.claim_expires_at,
+           pd.recipient_name, pd.account_number
+    FROM claimed c
+    LEFT JOIN payment_details pd ON pd.id = c.payment_detail_id
+    ORDER BY c.created_at, c.id
+""")
+
+# Решение применяется только к своей непросроченной аренде: строку, которую уже перехватили, второй раз не решить
+TX_QUEUE_DECIDE = statement('tx_queue_decide', """
+    UPDATE transactions t
+    SET status = d.status, updated_at = NOW(), claimed_by = NULL, claim_expires_at = NULL
+    FROM unnest($2::int[], $3::varchar[]) AS d(id, status)
+    WHERE t.id = d.id AND t.status = 'pending' AND t.claimed_by = $1 AND t.claim_expires_at > NOW()
+    RETURNING t.id, t.status
+""")
+
+TX_QUEUE_RELEASE = statement('tx_queue_release', """
+    UPDATE transactions
+    SET claimed_by = NULL, claim_expires_at = NULL
+    WHERE status = 'pending' AND claimed_by = $1 AND (cardinality($2::int[]) = 0 OR id = ANY($2::int[]))
+    RETURNING id
+""")
+
+
+def _int_list(values: Any, name: str) -> List[int]:
+    if not isinstance(values, list):
+        raise ValueError(f'{name} must be a list')
+    try:
+        return [int(value) for value in values]
+    except (TypeError, ValueError):
+        raise ValueError(f'{name} must contain transaction ids')
+
+
+def _bounded(value: Any, default: int, upper: int, name: str) -> int:
+    try:
+        number = int(value if value is not None else default)
+    except (TypeError, ValueError):
+        raise ValueError(f'{name} must be an integer')
+    return max(1, min(number, upper))
+
+
+def parse_queue_request(body: Dict[str, Any]) -> Tuple[str, str, Dict[str, Any]]:
+    '''Проверяет тело до похода в БД; ошибки - ValueError с текстом для 400'''
+    if not isinstance(body, dict):
+        raise ValueError('body must be a JSON object')
+    action = body.get('action')
+    if action not in QUEUE_ACTIONS:
+        raise ValueError(f"action must be one of {', '.join(QUEUE_ACTIONS)}")
+    operator = str(body.get('operator') or '').strip()
+    if not operator or len(operator) > 64:
+        raise ValueError('operator is required (up to 64 characters)')
+
+    if action == 'claim':
+        return action, operator, {
+            'limit': _bounded(body.get('limit'), QUEUE_DEFAULT_BATCH, QUEUE_MAX_BATCH, 'limit'),
+            'lease_seconds': _bounded(body.get('lease_seconds'), QUEUE_LEASE_SECONDS, QUEUE_MAX_LEASE_SECONDS, 'lease_seconds'),
+        }
+
+    if action == 'decide':
+        decisions = body.get('decisions')
+        if not isinstance(decisions, list) or not decisions or len(decisions) > QUEUE_MAX_BATCH:
+            raise ValueError(f'decisions must be a list of 1..{QUEUE_MAX_BATCH} items')
+        ids = _int_list([item.get('id') if isinstance(item, dict) else None for item in decisions], 'decisions')
+        statuses = [item.get('status') for item in decisions]
+        if any(status not in DECISION_STATUSES for status in statuses):
+            raise ValueError(f"decision status must be one of {', '.join(DECISION_STATUSES)}")
+        return action, operator, {'ids': ids, 'statuses': statuses}
+
+    return action, operator, {'ids': _int_list(body.get('ids') or [], 'ids')}
+
+
+def run_queue_action(cur: PgCursor, action: str, operator: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    '''Один запрос на действие; коммит - за вызывающим'''
+    if action == 'claim':
+        execute(cur, TX_QUEUE_CLAIM, [operator, params['lease_seconds'], params['limit']])
+        return {
+            'transactions': [{
+                'id': row[0],
+                'amount': float(row[1]),
+                'currency': row[2],
+                'amount_cny': float(row[3]),
+                'date': row[4].isoformat() if row[4] else None,
+                'lease_expires_at': row[5].isoformat(),
+                'payment_details': {
+                    'recipient_name': row[6],
+                    'account_number': row[7]
+                } if row[6] else None
+            } for row in cur.fetchall()]
+        }
+
+    if action == 'decide':
+        lock_load_for(cur, params['ids'])
+        lock_stats_for_status(cur, params['ids'], params['statuses'])
+        execute(cur, TX_QUEUE_DECIDE, [operator, params['ids'], params['statuses']])
+        decided = [{'id': row[0], 'status': row[1]} for row in cur.fetchall()]
+        applied = {item['id'] for item in decided}
+        # Аренда истекла и строку взял другой, или решение уже принято
+        return {'decided': decided, 'rejected': [tx_id for tx_id in params['ids'] if tx_id not in applied]}
+
+    execute(cur, TX_QUEUE_RELEASE, [operator, params['ids']])
+    return {'released': [row[0] for row in cur.fetchall()]}
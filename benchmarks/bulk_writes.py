@@ -0,0 +1,109 @@
+'''
+Business: Бенчмарк пакетных записей: N одиночных вызовов обработчика против одного пакетного на той же работе
+Args: DATABASE_URL - локальный Postgres со схемой из db_migrations; --function payment-details | transactions;
+      --items - размер пачки; --mode atomic | partial
+Returns: таблица операция/способ/время (мс всего и на элемент); созданные строки удаляются в конце
+'''
+
+import argparse
+import json
+import os
+import sys
+import time
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Tuple
+
+CONTEXT = SimpleNamespace(request_id='bench-bulk-writes', function_name='bench')
+
+
+def call(handler: Callable, method: str, body: Any = None, query: Dict[str, str] = None) -> Dict[str, Any]:
+    response = handler({
+        'httpMethod': method,
+        'body': json.dumps(body) if body is not None else '',
+        'queryStringParameters': query or {},
+        'headers': {}
+    }, CONTEXT)
+    if response['statusCode'] >= 300:
+        raise RuntimeError(f"{method} -> {response['statusCode']}: {response['body']}")
+    return json.loads(response['body']) if response['body'] else {}
+
+
+def timed(run: Callable[[], Any]) -> Tuple[float, Any]:
+    started = time.perf_counter()
+    result = run()
+    return (time.perf_counter() - started) * 1000, result
+
+
+def bulk_ids(result: Dict[str, Any]) -> List[int]:
+    return [item['item']['id'] for item in result['results']]
+
+
+def bench_payment_details(handler: Callable, items: int, mode: str) -> List[Tuple[str, str, float]]:
+    new = [{'recipient_name': f'Bench {i}', 'account_number': f'+86 000 {i:08d}', 'currency': 'CNY'} for i in range(items)]
+    rows = []
+
+    ms, ids = timed(lambda: [call(handler, 'POST', item)['id'] for item in new])
+    rows.append(('insert', 'single', ms))
+    ms, _ = timed(lambda: [call(handler, 'PUT', {**item, 'id': i, 'is_active': False}) for i, item in zip(ids, new)])
+    rows.append(('update', 'single', ms))
+    ms, _ = timed(lambda: [call(handler, 'DELETE', query={'id': str(i)}) for i in ids])
+    rows.append(('delete', 'single', ms))
+
+    ms, result = timed(lambda: call(handler, 'POST', {'items': new, 'mode': mode}))
+    rows.append(('insert', 'bulk', ms))
+    ids = bulk_ids(result)
+    updates = [{**item, 'id': i, 'is_active': False} for i, item in zip(ids, new)]
+    ms, _ = timed(lambda: call(handler, 'PUT', {'items': updates, 'mode': mode}))
+    rows.append(('update', 'bulk', ms))
+    ms, _ = timed(lambda: call(handler, 'DELETE', {'items': ids, 'mode': mode}))
+    rows.append(('delete', 'bulk', ms))
+    return rows
+
+
+def bench_transactions(handler: Callable, items: int, mode: str) -> List[Tuple[str, str, float]]:
+    from db import connection
+
+    new = [{'amount': 1000 + i, 'currency': 'CNY'} for i in range(items)]
+    rows = []
+    created: List[int] = []
+    try:
+        ms, ids = timed(lambda: [call(handler, 'POST', item)['id'] for item in new])
+        created += ids
+        rows.append(('insert', 'single', ms))
+        ms, _ = timed(lambda: [call(handler, 'PUT', {'id': i, 'status': 'completed'}) for i in ids])
+        rows.append(('update', 'single', ms))
+
+        ms, result = timed(lambda: call(handler, 'POST', {'items': new, 'mode': mode}))
+        ids = bulk_ids(result)
+        created += ids
+        rows.append(('insert', 'bulk', ms))
+        decisions = [{'id': i, 'status': 'completed'} for i in ids]
+        ms, _ = timed(lambda: call(handler, 'PUT', {'items': decisions, 'mode': mode}))
+        rows.append(('update', 'bulk', ms))
+    finally:
+        with connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute('DELETE FROM transactions WHERE id = ANY(%s)', (created,))
+            conn.commit()
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--function', choices=['payment-details', 'transactions'], default='payment-details')
+    parser.add_argument('--items', type=int, default=500)
+    parser.add_argument('--mode', choices=['atomic', 'partial'], default='atomic')
+    args = parser.parse_args()
+
+    # Модули функций называются одинаково (db, queries, statements), поэтому одна функция на процесс
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', args.function))
+    from index import handler  # noqa: E402
+
+    bench = bench_payment_details if args.function == 'payment-details' else bench_transactions
+    print(f"{'operation':<10}{'mode':<8}{'total ms':>11}{'ms/item':>10}")
+    for operation, mode, ms in bench(handler, args.items, args.mode):
+        print(f'{operation:<10}{mode:<8}{ms:>11.1f}{ms / args.items:>10.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,302 @@
+'''
+Business: Локальный прогон обработчиков backend/*/index.py без деплоя: синтетические данные, холодные и тёплые вызовы
+Args: DATABASE_URL - локальный Postgres со схемой из db_migrations; --load --rows (1k..10M) --details - пересоздать данные
+      (ВСЕ строки transactions и payment_details удаляются); --functions; --requests и --concurrency - тёплый прогон
+      на каждый endpoint; --cold-runs - сколько свежих процессов на замер холодного старта; --out - файл отчёта;
+      --baseline - прошлый отчёт для сравнения p95
+Returns: JSON-отчёт: на каждый endpoint p50/p95/p99, пропускная способность и пиковый RSS процесса, холодный старт функции
+'''
+
+import argparse
+import base64
+import io
+import itertools
+import json
+import os
+import random
+import resource
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.join(BENCHMARKS_DIR, '..', 'backend')
+FUNCTIONS = ('transactions', 'payment-details', 'telegram-notify', 'telegram-webhook', 'telegram-dispatcher')
+WARMUP_CALLS = 5
+BENCH_CHAT_ID = '-100000000001'
+
+Event = Dict[str, Any]
+EventFactory = Callable[[int], Event]
+
+
+def event(method: str, query: Optional[Dict[str, str]] = None, body: Any = None) -> Event:
+    return {
+        'httpMethod': method,
+        'queryStringParameters': query or {},
+        'headers': {},
+        'body': json.dumps(body) if body is not None else '',
+    }
+
+
+def proof_image() -> str:
+    '''Скриншот телефонного размера: обработчик уменьшает и перекодирует его так же, как настоящий'''
+    from PIL import Image
+
+    image = Image.effect_noise((1170, 2532), 64).convert('RGB')
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG')
+    return 'data:image/png;base64,' + base64.b64encode(buffer.getvalue()).decode()
+
+
+def scenarios(function: str, dataset: Dict[str, int]) -> Dict[str, EventFactory]:
+    '''Endpoint -> событие по номеру вызова; id берутся из сгенерированного диапазона'''
+    max_tx, details = max(dataset['max_transaction_id'], 1), max(dataset['details'], 1)
+    # update_id и callback id должны быть уникальны между прогонами, иначе webhook ответит из кэша дедупликации
+    run = int(time.time() * 1000) * 100_000
+    if function == 'transactions':
+        return {
+            'list': lambda i: event('GET'),
+            'list_pending': lambda i: event('GET', {'status': 'pending'}),
+            'list_currency_page': lambda i: event('GET', {'currency': 'RUB', 'limit': '200'}),
+            'stats': lambda i: event('GET', {'view': 'stats'}),
+            'create': lambda i: event('POST', body={'amount': 1000 + i % 5000, 'currency': 'CNY'}),
+            'update_status': lambda i: event('PUT', body={'id': random.randint(1, max_tx), 'status': 'completed'}),
+            'preflight': lambda i: event('OPTIONS'),
+        }
+    if function == 'payment-details':
+        return {
+            'list': lambda i: event('GET'),
+            'get': lambda i: event('GET', {'id': str(random.randint(1, details))}),
+            'preflight': lambda i: event('OPTIONS'),
+        }
+    if function == 'telegram-notify':
+        image = proof_image()
+        return {
+            'enqueue_proof': lambda i: event('POST', body={
+                'image': image, 'chat_id': BENCH_CHAT_ID, 'amount': '1000', 'currency': 'CNY',
+                'type': 'payment_proof', 'transaction_id': str(random.randint(1, max_tx)),
+            }),
+            'preflight': lambda i: event('OPTIONS'),
+        }
+    if function == 'telegram-webhook':
+        return {
+            'callback': lambda i: event('POST', body={
+                'update_id': run + i,
+                'callback_query': {
+                    'id': f'bench-{run + i}',
+                    'data': f"{'approve' if i % 2 else 'reject'}_{random.randint(1, max_tx)}",
+                    'message': {'chat': {'id': int(BENCH_CHAT_ID)}, 'message_id': 1},
+                },
+            }),
+            'preflight': lambda i: event('OPTIONS'),
+        }
+    return {'dispatch': lambda i: event('POST')}
+
+
+def percentile(samples: List[float], q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss на Linux - в килобайтах
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def call(handler: Callable, function: str, factory: EventFactory, i: int) -> Tuple[float, bool]:
+    context = SimpleNamespace(request_id=f'bench-{function}-{i}', function_name=function)
+    started = time.perf_counter()
+    try:
+        ok = handler(factory(i), context)['statusCode'] < 500
+    except Exception:
+        ok = False
+    return (time.perf_counter() - started) * 1000, ok
+
+
+def run_worker(function: str, dataset: Dict[str, int], requests: int, concurrency: int, cold_only: bool) -> Dict[str, Any]:
+    '''Исполняется в отдельном процессе: модули функций называются одинаково (db, queries), и холодный старт - честный'''
+    started = time.perf_counter()
+    sys.path.insert(0, os.path.join(BACKEND_DIR, function))
+    from index import handler  # noqa: E402
+    import_ms = (time.perf_counter() - started) * 1000
+
+    factories = scenarios(function, dataset)
+    first_name = next(iter(factories))
+    first_ms, _ = call(handler, function, factories[first_name], 0)
+    result: Dict[str, Any] = {'import_ms': import_ms, 'cold_start_ms': import_ms + first_ms, 'endpoints': {}}
+    if cold_only:
+        return result
+
+    counter = itertools.count(1)
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for name, factory in factories.items():
+            first_call_ms, _ = call(handler, function, factory, next(counter))
+            for _ in range(WARMUP_CALLS):
+                call(handler, function, factory, next(counter))
+            wall_started = time.perf_counter()
+            outcomes = list(executor.map(lambda i: call(handler, function, factory, i),
+                                         [next(counter) for _ in range(requests)]))
+            wall = time.perf_counter() - wall_started
+            samples = [ms for ms, _ in outcomes]
+            result['endpoints'][name] = {
+                'first_call_ms': round(first_call_ms, 3),
+                'requests': requests,
+                'errors': sum(1 for _, ok in outcomes if not ok),
+                'mean_ms': round(statistics.mean(samples), 3),
+                'p50_ms': round(percentile(samples, 0.50), 3),
+                'p95_ms': round(percentile(samples, 0.95), 3),
+                'p99_ms': round(percentile(samples, 0.99), 3),
+                'throughput_rps': round(requests / wall, 1),
+                'peak_rss_mb': peak_rss_mb(),
+            }
+    return result
+
+
+def spawn_worker(function: str, dataset: Dict[str, int], args: argparse.Namespace, env: Dict[str, str],
+                 cold_only: bool) -> Dict[str, Any]:
+    with tempfile.NamedTemporaryFile(suffix='.json') as result_file:
+        subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--worker', function, '--result', result_file.name,
+             '--dataset', json.dumps(dataset), '--requests', str(args.requests),
+             '--concurrency', str(args.concurrency)] + (['--cold-only'] if cold_only else []),
+            env=env, check=True, stdout=subprocess.DEVNULL
+        )
+        with open(result_file.name) as f:
+            return json.load(f)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_telegram_stub(latency_ms: float) -> Tuple[subprocess.Popen, str]:
+    port = free_port()
+    stub = subprocess.Popen(
+        [sys.executable, os.path.join(BENCHMARKS_DIR, 'telegram_stub.py'), '--port', str(port),
+         '--latency-ms', str(latency_ms)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return stub, f'http://127.0.0.1:{port}'
+        except OSError:
+            time.sleep(0.05)
+    stub.kill()
+    raise RuntimeError('Telegram stub did not start')
+
+
+def describe_dataset() -> Dict[str, int]:
+    # Только в родительском процессе: в рабочем psycopg2 должен попасть в замер холодного импорта
+    import psycopg2
+
+    conn = psycopg2.connect(os.environ['DATABASE_URL'])
+    with conn.cursor() as cur:
+        cur.execute('SELECT COALESCE(MAX(id), 0), COUNT(*) FROM transactions')
+        max_id, rows = cur.fetchone()
+        cur.execute('SELECT COUNT(*) FROM payment_details')
+        details = cur.fetchone()[0]
+    conn.close()
+    return {'rows': rows, 'max_transaction_id': max_id, 'details': details}
+
+
+def print_comparison(report: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    print(f"{'function':<22}{'endpoint':<22}{'p95 ms':>10}{'baseline':>10}{'change':>9}")
+    for function, current in report['functions'].items():
+        for name, stats in current['endpoints'].items():
+            old = baseline.get('functions', {}).get(function, {}).get('endpoints', {}).get(name)
+            old_p95 = old['p95_ms'] if old else None
+            change = f'{(stats["p95_ms"] / old_p95 - 1) * 100:+.1f}%' if old_p95 else '-'
+            print(f"{function:<22}{name:<22}{stats['p95_ms']:>10.2f}{old_p95 if old_p95 else '-':>10}{change:>9}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--load', action='store_true')
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--details', type=int, default=100)
+    parser.add_argument('--functions', default=','.join(FUNCTIONS))
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--cold-runs', type=int, default=3)
+    parser.add_argument('--telegram-latency-ms', type=float, default=30)
+    parser.add_argument('--out', default='handlers-report.json')
+    parser.add_argument('--baseline')
+    # Режим дочернего процесса
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    parser.add_argument('--result', help=argparse.SUPPRESS)
+    parser.add_argument('--dataset', help=argparse.SUPPRESS)
+    parser.add_argument('--cold-only', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        result = run_worker(args.worker, json.loads(args.dataset), args.requests, args.concurrency, args.cold_only)
+        with open(args.result, 'w') as f:
+            json.dump(result, f)
+        return
+
+    if args.load:
+        # Тот же генератор, что у регрессии планов: распределения статусов и валют как на проде
+        import psycopg2
+        from query_plans import load  # noqa: E402
+        conn = psycopg2.connect(os.environ['DATABASE_URL'])
+        load(conn, args.rows, args.details)
+        conn.close()
+    dataset = describe_dataset()
+
+    stub, stub_url = start_telegram_stub(args.telegram_latency_ms)
+    env = {
+        **os.environ,
+        'TELEGRAM_API_URL': stub_url,
+        'TELEGRAM_BOT_TOKEN': os.environ.get('TELEGRAM_BOT_TOKEN', 'bench-token'),
+        # Один вызов диспетчера не должен крутиться весь бюджет боевой функции
+        'DISPATCH_TIME_BUDGET': os.environ.get('DISPATCH_TIME_BUDGET', '2'),
+    }
+    report: Dict[str, Any] = {
+        'started_at': datetime.now(timezone.utc).isoformat(),
+        'dataset': dataset,
+        'requests': args.requests,
+        'concurrency': args.concurrency,
+        'replicas': bool(os.environ.get('DATABASE_REPLICA_URLS')),
+        # Накладные расходы замеров: прогон с METRICS_LOG=off как --baseline для прогона с all
+        'metrics_log': os.environ.get('METRICS_LOG', 'all'),
+        'functions': {},
+    }
+    try:
+        for function in args.functions.split(','):
+            cold = [spawn_worker(function, dataset, args, env, cold_only=True)['cold_start_ms']
+                    for _ in range(args.cold_runs)]
+            warm = spawn_worker(function, dataset, args, env, cold_only=False)
+            report['functions'][function] = {
+                'cold_start_ms': round(statistics.median(cold), 3),
+                'import_ms': round(warm['import_ms'], 3),
+                'endpoints': warm['endpoints'],
+            }
+            print(f'{function}: cold start {statistics.median(cold):.1f} ms', file=sys.stderr)
+    finally:
+        stub.terminate()
+
+    with open(args.out, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print(f"{'function':<22}{'endpoint':<22}{'p50':>9}{'p95':>9}{'p99':>9}{'rps':>9}{'rss MB':>9}{'err':>6}")
+    for function, current in report['functions'].items():
+        for name, stats in current['endpoints'].items():
+            print(f"{function:<22}{name:<22}{stats['p50_ms']:>9.2f}{stats['p95_ms']:>9.2f}{stats['p99_ms']:>9.2f}"
+                  f"{stats['throughput_rps']:>9.1f}{stats['peak_rss_mb']:>9.1f}{stats['errors']:>6}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            print_comparison(report, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+'''
+Business: Микробенчмарк горячих запросов: SQL из f-строк против подготовленных выражений из statements.py
+Args: DATABASE_URL - локальный Postgres со схемой из db_migrations; --iterations - число повторов
+Returns: таблица латентностей (mean/p50/p95/p99, мс) по каждому запросу и режиму
+'''
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List
+
+import psycopg2
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'transactions'))
+
+from allocation import create_statement  # noqa: E402
+from queries import TX_UPDATE_STATUS, list_statement  # noqa: E402
+from statements import execute  # noqa: E402
+
+
+def percentile(samples: List[float], q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def measure(conn, iterations: int, run: Callable[[object, int], None]) -> List[float]:
+    samples = []
+    with conn.cursor() as cur:
+        for i in range(iterations):
+            started = time.perf_counter()
+            run(cur, i)
+            cur.fetchall()
+            samples.append((time.perf_counter() - started) * 1000)
+            # Вставки и обновления не должны копиться между прогонами
+            conn.rollback()
+    return samples
+
+
+def fstring_list(cur, i: int) -> None:
+    cur.execute(
+        f"SELECT t.id, t.amount, t.currency, t.amount_cny, t.status, t.created_at, pd.recipient_name, pd.account_number "
+        f"FROM transactions t LEFT JOIN payment_details pd ON t.payment_detail_id = pd.id "
+        f"WHERE t.status = 'pending' ORDER BY t.created_at DESC, t.id DESC LIMIT {50 + i % 7}"
+    )
+
+
+def prepared_list(cur, i: int) -> None:
+    stmt, args = list_statement([('status', ['pending'])])
+    execute(cur, stmt, args + [50 + i % 7])
+
+
+def fstring_create(cur, i: int) -> None:
+    amount = 500 + i
+    cur.execute(
+        f"INSERT INTO transactions (amount, currency, amount_cny, status, payment_detail_id) "
+        f"SELECT {amount}, 'RUB', {round(amount / 11.4, 2)}, 'pending', "
+        f"(SELECT id FROM payment_details WHERE is_active = true LIMIT 1) RETURNING id"
+    )
+
+
+def prepared_create(cur, i: int) -> None:
+    amount = 500 + i
+    execute(cur, create_statement(), ['RUB', amount, round(amount / 11.4, 2)])
+
+
+def fstring_update(cur, i: int) -> None:
+    cur.execute(f"UPDATE transactions SET status = 'pending', updated_at = NOW() WHERE id = {i + 1} RETURNING id")
+
+
+def prepared_update(cur, i: int) -> None:
+    execute(cur, TX_UPDATE_STATUS, ['pending', i + 1])
+
+
+CASES: Dict[str, Dict[str, Callable[[object, int], None]]] = {
+    'list_pending': {'fstring': fstring_list, 'prepared': prepared_list},
+    'create': {'fstring': fstring_create, 'prepared': prepared_create},
+    'update_status': {'fstring': fstring_update, 'prepared': prepared_update},
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--iterations', type=int, default=2000)
+    parser.add_argument('--warmup', type=int, default=100)
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(os.environ['DATABASE_URL'])
+    print(f"{'query':<16}{'mode':<10}{'mean':>9}{'p50':>9}{'p95':>9}{'p99':>9}")
+    for case, modes in CASES.items():
+        for mode, run in modes.items():
+            measure(conn, args.warmup, run)
+            samples = measure(conn, args.iterations, run)
+            print(
+                f'{case:<16}{mode:<10}{statistics.mean(samples):>9.3f}{percentile(samples, 0.5):>9.3f}'
+                f'{percentile(samples, 0.95):>9.3f}{percentile(samples, 0.99):>9.3f}'
+            )
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,233 @@
+'''
+Business: Регрессионный прогон планов горячих запросов на синтетических данных: ни один не должен скатиться в Seq Scan
+Args: DATABASE_URL - локальный Postgres со схемой из db_migrations; --load - пересоздать данные (--rows транзакций,
+      --details реквизитов; ВСЕ строки transactions и payment_details удаляются)
+Returns: таблица запрос/режим плана/индексы; код выхода 1, если хоть один план нарушил ожидания
+'''
+
+import argparse
+import os
+import sys
+import time
+from datetime import timedelta
+from typing import Any, Dict, FrozenSet, Iterator, List, NamedTuple, Optional, Sequence
+
+import psycopg2
+from psycopg2.extensions import connection as PgConnection, cursor as PgCursor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'transactions'))
+
+from allocation import STRATEGIES, create_statement  # noqa: E402
+from queries import TX_STATUS, TX_UPDATE_STATUS, list_statement  # noqa: E402
+from statements import Statement, statement  # noqa: E402
+from workqueue import TX_QUEUE_CLAIM  # noqa: E402
+
+LOAD_CHUNK_ROWS = 1_000_000
+# Проверяем оба режима: первые пять EXECUTE получают custom-план, дальше Postgres может перейти на generic
+PLAN_MODES = ('force_custom_plan', 'force_generic_plan')
+
+CREATED_AT = frozenset({'idx_transactions_created_at_id'})
+BY_STATUS = frozenset({'idx_transactions_status_created_at_id', 'idx_transactions_pending'})
+BY_CURRENCY = frozenset({'idx_transactions_currency_created_at_id'})
+
+# Та же проверка, которую Postgres делает по внешнему ключу при pd_delete (для секционированной таблицы без ONLY)
+FK_CHECK = statement('plan_fk_check', """
+    SELECT 1 FROM transactions x WHERE $1::int = payment_detail_id FOR KEY SHARE OF x
+""")
+
+# Секции и их индексы в плане называются по-своему: сверяем по родителю
+PARENTS_SQL = """
+    SELECT c.relname, p.relname
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    JOIN pg_class p ON p.oid = i.inhparent
+"""
+PARTITIONS_UP_TO_SQL = """
+    SELECT COUNT(*)
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = 'transactions'::regclass
+      AND to_date(substr(c.relname, 14), 'YYYY_MM') <= %s
+"""
+
+
+class Case(NamedTuple):
+    name: str
+    stmt: Statement
+    params: Sequence[Any]
+    # Индексы, через которые разрешено читать таблицу; таблицы вне словаря не проверяются
+    indexes: Dict[str, FrozenSet[str]]
+    # Листинг с LIMIT обязан идти в порядке индекса: Sort над миллионами строк - та же регрессия
+    ordered: bool = False
+    # Сколько секций transactions может остаться в плане после отсечения; None - не проверяется
+    max_partitions: Optional[int] = None
+
+
+def list_case(name: str, filters: List, indexes: FrozenSet[str], max_partitions: Optional[int] = None) -> Case:
+    stmt, args = list_statement(filters)
+    # Способ соединения с маленькой payment_details зависит от оценки LIMIT и не проверяется
+    return Case(name, stmt, args + [50], {'transactions': indexes}, True, max_partitions)
+
+
+def cases(cur: PgCursor) -> List[Case]:
+    cur.execute('SELECT min(created_at) + (max(created_at) - min(created_at)) / 2 FROM transactions')
+    middle = cur.fetchone()[0]
+    cursor = [middle, 2 ** 31 - 1]
+    # Курсор отсекает все секции новее себя; более старые листинг читает по мере надобности
+    cur.execute(PARTITIONS_UP_TO_SQL, (middle,))
+    up_to_cursor = cur.fetchone()[0]
+    return [
+        list_case('list_all', [], CREATED_AT),
+        list_case('list_pending', [('status', ['pending'])], BY_STATUS),
+        list_case('list_completed', [('status', ['completed'])], BY_STATUS),
+        list_case('list_currency', [('currency', ['RUB'])], BY_CURRENCY),
+        list_case('list_status_currency', [('status', ['pending']), ('currency', ['USD'])], BY_STATUS | BY_CURRENCY),
+        list_case('list_date_range', [('date_from', [middle]), ('date_to', [middle + timedelta(days=30)])], CREATED_AT, 2),
+        list_case('list_status_date_range', [('status', ['pending']), ('date_from', [middle]),
+                                             ('date_to', [middle + timedelta(days=30)])], BY_STATUS, 2),
+        list_case('list_cursor', [('cursor', cursor)], CREATED_AT, up_to_cursor),
+        list_case('list_status_cursor', [('status', ['completed']), ('cursor', cursor)], BY_STATUS, up_to_cursor),
+    ] + [
+        # Выбор реквизитов читает только счётчики payment_detail_load и не трогает transactions
+        Case(f'tx_create_{name}', create_statement(name), ['RUB', 1000, 87.72], {'transactions': frozenset()})
+        for name in STRATEGIES
+    ] + [
+        Case('tx_update_status', TX_UPDATE_STATUS, ['completed', 1], {'transactions': frozenset({'transactions_pkey'})}),
+        Case('tx_status', TX_STATUS, [1], {'transactions': frozenset({'transactions_pkey'})}),
+        # Очередь операторов читает только частичный индекс pending, без обхода завершённых строк
+        Case('queue_claim', TX_QUEUE_CLAIM, ['plan-check', 300, 20],
+             {'transactions': frozenset({'idx_transactions_pending', 'transactions_pkey'})}),
+        Case('pd_delete_fk_check', FK_CHECK, [1], {'transactions': frozenset({'idx_transactions_payment_detail_id'})}),
+    ]
+
+
+def load(conn: PgConnection, rows: int, details: int) -> None:
+    '''Синтетика по распределению прода: 2% pending, 8% failed, остальное completed; 70% CNY, 25% RUB, 5% USD'''
+    with conn.cursor() as cur:
+        # Триггеры сводки, версий и NOTIFY на десятках миллионов строк не нужны; ключи согласованы генерацией
+        cur.execute('SET session_replication_role = replica')
+        cur.execute('TRUNCATE transactions, payment_details, transaction_stats_daily RESTART IDENTITY CASCADE')
+        cur.execute(
+            """
+            SELECT transactions_create_partition(month::date)
+            FROM generate_series(NOW() - interval '731 days', NOW(), interval '1 month') AS month
+            """
+        )
+        cur.execute(
+            """
+            INSERT INTO payment_details (recipient_name, account_number, currency, is_active)
+            SELECT 'Recipient ' || n, '+86 138 ' || lpad(n::text, 8, '0'),
+                   (ARRAY['CNY', 'RUB', 'USD'])[1 + n %% 3], n %% 10 <> 0
+            FROM generate_series(1, %s) AS n
+            """,
+            (details,)
+        )
+        # Триггер payment_details при replica не срабатывает: строки счётчиков создаём сами
+        cur.execute('INSERT INTO payment_detail_load (payment_detail_id) SELECT id FROM payment_details')
+        conn.commit()
+        for start in range(0, rows, LOAD_CHUNK_ROWS):
+            started = time.perf_counter()
+            cur.execute(
+                """
+                INSERT INTO transactions (amount, currency, amount_cny, status, payment_detail_id, created_at, updated_at)
+                SELECT amount, currency, round(amount / 11.4, 2),
+                       CASE WHEN r < 0.02 THEN 'pending' WHEN r < 0.10 THEN 'failed' ELSE 'completed' END,
+                       1 + (n::bigint * 7919) %% %s, at, at
+                FROM (
+                    SELECT n, random() AS r, round((100 + random() * 99900)::numeric, 2) AS amount,
+                           CASE WHEN n %% 20 < 14 THEN 'CNY' WHEN n %% 20 < 19 THEN 'RUB' ELSE 'USD' END AS currency,
+                           NOW() - interval '730 days' * (1 - n::float8 / %s) AS at
+                    FROM generate_series(%s, %s) AS n
+                ) g
+                """,
+                (details, rows, start + 1, min(start + LOAD_CHUNK_ROWS, rows))
+            )
+            conn.commit()
+            print(f'loaded {min(start + LOAD_CHUNK_ROWS, rows):>11,} rows ({time.perf_counter() - started:.1f}s)', file=sys.stderr)
+        cur.execute('SET session_replication_role = DEFAULT')
+    conn.commit()
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute('VACUUM ANALYZE payment_details')
+        cur.execute('VACUUM ANALYZE payment_detail_load')
+        cur.execute('VACUUM ANALYZE transactions')
+    conn.autocommit = False
+
+
+def walk(node: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    yield node
+    for child in node.get('Plans', []):
+        yield from walk(child)
+
+
+def violations(plan: Dict[str, Any], case: Case, parents: Dict[str, str]) -> List[str]:
+    found = []
+    partitions = set()
+    for node in walk(plan):
+        relation = node.get('Relation Name')
+        index = node.get('Index Name')
+        if relation in parents:
+            if parents[relation] == 'transactions':
+                partitions.add(relation)
+            relation = parents[relation]
+        index = parents.get(index, index)
+        if node['Node Type'] == 'Seq Scan' and relation in case.indexes:
+            found.append(f'Seq Scan on {relation}')
+        if index and relation in case.indexes and index not in case.indexes[relation]:
+            found.append(f'{index} on {relation}')
+        if node['Node Type'] == 'Bitmap Index Scan' and index not in set().union(*case.indexes.values()):
+            found.append(f'bitmap {index}')
+        if case.ordered and node['Node Type'] in ('Sort', 'Incremental Sort'):
+            found.append(node['Node Type'])
+    if case.max_partitions is not None and len(partitions) > case.max_partitions:
+        found.append(f'{len(partitions)} partitions, expected at most {case.max_partitions}')
+    return found
+
+
+def explain(cur: PgCursor, case: Case, mode: str) -> Dict[str, Any]:
+    cur.execute(f'SET plan_cache_mode = {mode}')
+    cur.execute(f'PREPARE {case.stmt.name} AS {case.stmt.sql}')
+    marks = ' (' + ', '.join(['%s'] * case.stmt.arity) + ')' if case.stmt.arity else ''
+    cur.execute(f'EXPLAIN (FORMAT JSON) EXECUTE {case.stmt.name}{marks}', list(case.params) or None)
+    plan = cur.fetchone()[0][0]['Plan']
+    cur.execute(f'DEALLOCATE {case.stmt.name}')
+    return plan
+
+
+def indexes_used(plan: Dict[str, Any], parents: Dict[str, str]) -> str:
+    used = {parents.get(node['Index Name'], node['Index Name']) for node in walk(plan) if node.get('Index Name')}
+    return ', '.join(sorted(used)) or '-'
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--load', action='store_true')
+    parser.add_argument('--rows', type=int, default=10_000_000)
+    parser.add_argument('--details', type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    conn = psycopg2.connect(os.environ['DATABASE_URL'])
+    if args.load:
+        load(conn, args.rows, args.details)
+
+    failed = 0
+    with conn.cursor() as cur:
+        cur.execute(PARENTS_SQL)
+        parents = dict(cur.fetchall())
+        print(f"{'query':<32}{'plan':<10}{'result':<8}indexes")
+        for case in cases(cur):
+            for mode in PLAN_MODES:
+                plan = explain(cur, case, mode)
+                problems = violations(plan, case, parents)
+                failed += bool(problems)
+                print(f"{case.name:<32}{mode.split('_')[1]:<10}{'FAIL' if problems else 'ok':<8}{indexes_used(plan, parents)}")
+                for problem in problems:
+                    print(f'{"":<50}{problem}')
+    # EXPLAIN ничего не пишет, но PREPARE INSERT/UPDATE держит блокировки до конца транзакции
+    conn.rollback()
+    conn.close()
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,100 @@
+'''
+Business: Проверка маршрутизации чтения на реплику на двух локальных Postgres с потоковой репликацией
+Args: DATABASE_URL - мастер; DATABASE_REPLICA_URLS - реплика (роль с правом pg_wal_replay_pause, обычно суперпользователь);
+      --max-lag, --check-interval - пороги роутера на время проверки
+Returns: журнал шагов; код выхода 1, если чтение ушло не туда: на реплику при отставании или на мастер без него
+'''
+
+import argparse
+import json
+import os
+import sys
+import time
+from types import SimpleNamespace
+from typing import List
+
+import psycopg2
+
+
+def server_role(conn) -> str:
+    with conn.cursor() as cur:
+        cur.execute('SELECT pg_is_in_recovery()')
+        in_recovery = cur.fetchone()[0]
+    conn.rollback()
+    return 'replica' if in_recovery else 'primary'
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--max-lag', type=float, default=1.0)
+    parser.add_argument('--check-interval', type=float, default=0.5)
+    args = parser.parse_args()
+
+    # Пороги роутер читает при импорте db
+    os.environ['REPLICA_MAX_LAG_SECONDS'] = str(args.max_lag)
+    os.environ['REPLICA_LAG_CHECK_INTERVAL'] = str(args.check_interval)
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'transactions'))
+    from db import DATABASE_REPLICA_URLS, connection  # noqa: E402
+    from index import handler  # noqa: E402
+
+    if not DATABASE_REPLICA_URLS:
+        print('DATABASE_REPLICA_URLS is not set', file=sys.stderr)
+        return 1
+    replica = psycopg2.connect(DATABASE_REPLICA_URLS[0])
+    replica.autocommit = True
+    primary = psycopg2.connect(os.environ['DATABASE_URL'])
+    primary.autocommit = True
+    failures: List[str] = []
+
+    def expect(step: str, readonly: bool, role: str) -> None:
+        with connection(readonly=readonly) as conn:
+            got = server_role(conn)
+        print(f"{step:<44}{'readonly' if readonly else 'write':<10}{got}")
+        if got != role:
+            failures.append(f'{step}: expected {role}, got {got}')
+
+    def wait_for_recheck() -> None:
+        time.sleep(args.check_interval + 0.2)
+
+    expect('replica in sync', True, 'replica')
+    expect('replica in sync', False, 'primary')
+
+    with replica.cursor() as cur:
+        cur.execute('SELECT pg_wal_replay_pause()')
+    try:
+        # Транзакция с xid оставляет в WAL запись о коммите, которую реплика теперь не проигрывает
+        with primary.cursor() as cur:
+            cur.execute('SELECT txid_current()')
+        time.sleep(args.max_lag + 0.5)
+        wait_for_recheck()
+        expect('replay paused, lag over threshold', True, 'primary')
+    finally:
+        with replica.cursor() as cur:
+            cur.execute('SELECT pg_wal_replay_resume()')
+
+    deadline = time.monotonic() + 30
+    with replica.cursor() as cur:
+        while time.monotonic() < deadline:
+            cur.execute('SELECT pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn()')
+            if cur.fetchone()[0]:
+                break
+            time.sleep(0.1)
+    wait_for_recheck()
+    expect('replay resumed', True, 'replica')
+
+    context = SimpleNamespace(request_id='replica-routing', function_name='transactions')
+    for headers in ({}, {'X-Consistency': 'primary'}):
+        response = handler({'httpMethod': 'GET', 'queryStringParameters': {'limit': '5'}, 'headers': headers}, context)
+        print(f"{'GET /transactions ' + json.dumps(headers):<54}{response['statusCode']}")
+        if response['statusCode'] != 200:
+            failures.append(f'GET with {headers} -> {response["statusCode"]}')
+
+    replica.close()
+    primary.close()
+    for failure in failures:
+        print(f'FAIL {failure}')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
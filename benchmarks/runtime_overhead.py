@@ -0,0 +1,179 @@
+'''
+Business: Холодный импорт и накладные расходы обвязки HTTP-функций без базы: preflight, 405 и JSON листинга
+Args: --functions; --cold-runs - сколько свежих процессов на замер импорта; --calls - вызовов на замер тёплого пути;
+      --rows - строк в листинге для замера JSON; --out - файл отчёта; --baseline - прошлый отчёт для сравнения
+Returns: JSON-отчёт: медиана импорта index.py, первый preflight, какие тяжёлые модули загрузил импорт,
+         микросекунды на OPTIONS и 405, миллисекунды на dumps/loads листинга, размер и время его сжатия br/gzip
+'''
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Any, Callable, Dict
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.join(BENCHMARKS_DIR, '..', 'backend')
+FUNCTIONS = ('transactions', 'payment-details', 'telegram-notify', 'telegram-webhook')
+HEAVY_MODULES = ('psycopg2', 'requests', 'PIL')
+
+
+def per_call_us(fn: Callable[[], Any], calls: int) -> float:
+    started = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - started) / calls * 1_000_000
+
+
+def listing(rows: int) -> Dict[str, Any]:
+    '''Страница /transactions той же формы, что отдаёт обработчик'''
+    return {
+        'transactions': [{
+            'id': i,
+            'amount': 1000.0 + i,
+            'currency': 'RUB',
+            'amount_cny': 80.5 + i,
+            'status': 'pending',
+            'date': '2026-10-01T12:00:00.123456+00:00',
+            'payment_details': {'recipient_name': 'Иван Петров', 'account_number': '40817810099910004312'},
+        } for i in range(rows)],
+        'next_cursor': 'WyIyMDI2LTEwLTAxVDEyOjAwOjAwIiwgMV0',
+    }
+
+
+def run_worker(function: str, calls: int, rows: int, cold_only: bool) -> Dict[str, Any]:
+    '''Исполняется в свежем процессе, иначе импорт уже закэширован в sys.modules'''
+    started = time.perf_counter()
+    sys.path.insert(0, os.path.join(BACKEND_DIR, function))
+    from index import handler  # noqa: E402
+    import_ms = (time.perf_counter() - started) * 1000
+
+    context = SimpleNamespace(request_id=f'overhead-{function}', function_name=function)
+    preflight = {'httpMethod': 'OPTIONS', 'headers': {}, 'queryStringParameters': {}, 'body': ''}
+    started = time.perf_counter()
+    handler(preflight, context)
+    result: Dict[str, Any] = {
+        'import_ms': import_ms,
+        'first_preflight_ms': (time.perf_counter() - started) * 1000,
+        'heavy_modules_loaded': [name for name in HEAVY_MODULES if name in sys.modules],
+    }
+    if cold_only:
+        return result
+
+    not_allowed = {**preflight, 'httpMethod': 'PATCH'}
+    result['preflight_us'] = per_call_us(lambda: handler(preflight, context), calls)
+    try:
+        handler(not_allowed, context)
+        result['not_allowed_us'] = per_call_us(lambda: handler(not_allowed, context), calls)
+    except Exception as e:
+        # Обработчик, который берёт соединение до проверки метода, без базы на 405 не ответит
+        result['not_allowed_error'] = f'{type(e).__name__}: {e}'.splitlines()[0]
+
+    payload = listing(rows)
+    try:
+        from runtime import dumps, loads
+    except ImportError:
+        dumps, loads = json.dumps, json.loads
+    body = dumps(payload)
+    json_calls = max(1, calls // 100)
+    result['json_backend'] = getattr(loads, '__module__', 'json')
+    result['dumps_ms'] = per_call_us(lambda: dumps(payload), json_calls) / 1000
+    result['loads_ms'] = per_call_us(lambda: loads(body), json_calls) / 1000
+    result['body_bytes'] = len(body.encode())
+    try:
+        from runtime import ENCODINGS, compress
+    except ImportError:
+        return result
+    for encoding in ENCODINGS:
+        data = body.encode()
+        result[f'{encoding}_bytes'] = len(compress(data, encoding))
+        result[f'{encoding}_ms'] = per_call_us(lambda: compress(data, encoding), json_calls) / 1000
+    return result
+
+
+def spawn_worker(function: str, args: argparse.Namespace, cold_only: bool) -> Dict[str, Any]:
+    # Лог каждого вызова из metrics.py - отдельная статья расходов, здесь меряем только обвязку
+    env = {'METRICS_LOG': 'off', **os.environ}
+    with tempfile.NamedTemporaryFile(suffix='.json') as result_file:
+        subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--worker', function, '--result', result_file.name,
+             '--calls', str(args.calls), '--rows', str(args.rows)] + (['--cold-only'] if cold_only else []),
+            env=env, check=True, stdout=subprocess.DEVNULL
+        )
+        with open(result_file.name) as f:
+            return json.load(f)
+
+
+def print_comparison(report: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    print(f"{'function':<20}{'metric':<22}{'now':>10}{'baseline':>10}{'change':>9}")
+    for function, current in report['functions'].items():
+        old_function = baseline.get('functions', {}).get(function, {})
+        for metric in ('import_ms', 'first_preflight_ms', 'preflight_us', 'not_allowed_us', 'dumps_ms', 'loads_ms',
+                       'gzip_ms', 'br_ms'):
+            now, old = current.get(metric), old_function.get(metric)
+            if now is None:
+                continue
+            change = f'{(now / old - 1) * 100:+.1f}%' if old else '-'
+            print(f"{function:<20}{metric:<22}{now:>10.3f}{old if old is not None else '-':>10}{change:>9}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--functions', default=','.join(FUNCTIONS))
+    parser.add_argument('--cold-runs', type=int, default=7)
+    parser.add_argument('--calls', type=int, default=20_000)
+    parser.add_argument('--rows', type=int, default=500)
+    parser.add_argument('--out', default='runtime-overhead-report.json')
+    parser.add_argument('--baseline')
+    # Режим дочернего процесса
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    parser.add_argument('--result', help=argparse.SUPPRESS)
+    parser.add_argument('--cold-only', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        result = run_worker(args.worker, args.calls, args.rows, args.cold_only)
+        with open(args.result, 'w') as f:
+            json.dump(result, f)
+        return
+
+    report: Dict[str, Any] = {
+        'started_at': datetime.now(timezone.utc).isoformat(),
+        'python': sys.version.split()[0],
+        'cold_runs': args.cold_runs,
+        'calls': args.calls,
+        'rows': args.rows,
+        'functions': {},
+    }
+    for function in args.functions.split(','):
+        cold = [spawn_worker(function, args, cold_only=True) for _ in range(args.cold_runs)]
+        warm = spawn_worker(function, args, cold_only=False)
+        report['functions'][function] = {
+            **{key: round(value, 3) for key, value in warm.items() if isinstance(value, float)},
+            'import_ms': round(statistics.median(run['import_ms'] for run in cold), 3),
+            'first_preflight_ms': round(statistics.median(run['first_preflight_ms'] for run in cold), 3),
+            'heavy_modules_loaded': warm['heavy_modules_loaded'],
+            'json_backend': warm['json_backend'],
+            'not_allowed_error': warm.get('not_allowed_error'),
+            **{key: value for key, value in warm.items() if key.endswith('_bytes')},
+        }
+
+    print(f"{'function':<20}{'import ms':>11}{'preflight':>11}{'OPTIONS us':>12}{'405 us':>9}{'dumps ms':>10}  heavy modules")
+    for function, stats in report['functions'].items():
+        print(f"{function:<20}{stats['import_ms']:>11.2f}{stats['first_preflight_ms']:>11.3f}{stats['preflight_us']:>12.2f}"
+              f"{stats.get('not_allowed_us', float('nan')):>9.2f}{stats['dumps_ms']:>10.3f}  {', '.join(stats['heavy_modules_loaded']) or '-'}")
+    with open(args.out, 'w') as f:
+        json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            print_comparison(report, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+'''
+Business: Локальная заглушка Telegram Bot API для telegram-dispatcher, telegram-notify и telegram-webhook
+Args: --port, --latency-ms (задержка ответа), --chat-rate (сообщений в секунду на чат, иначе 429),
+      --error-rate (доля ответов 500)
+Returns: HTTP-сервер; TELEGRAM_API_URL=http://127.0.0.1:<port>, журнал вызовов - GET /calls
+'''
+
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from email.parser import BytesParser
+from email.policy import default as default_policy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Tuple
+
+_calls: List[Dict[str, Any]] = []
+_last_sent: Dict[str, float] = {}
+_lock = threading.Lock()
+_message_ids = iter(range(1, 10 ** 9))
+
+
+def parse_body(content_type: str, raw: bytes) -> Tuple[Dict[str, Any], bytes]:
+    '''JSON, form или multipart (sendPhoto); возвращает поля и байты фото'''
+    if content_type.startswith('application/json'):
+        return json.loads(raw or b'{}'), b''
+    if content_type.startswith('multipart/form-data'):
+        message = BytesParser(policy=default_policy).parsebytes(
+            f'Content-Type: {content_type}\r\n\r\n'.encode() + raw
+        )
+        fields: Dict[str, Any] = {}
+        photo = b''
+        for part in message.iter_parts():
+            name = part.get_param('name', header='content-disposition')
+            if part.get_filename():
+                photo = part.get_payload(decode=True) or b''
+            else:
+                fields[name] = part.get_content().strip()
+        return fields, photo
+    return {}, b''
+
+
+class TelegramStub(BaseHTTPRequestHandler):
+    options: argparse.Namespace
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def reply(self, status: int, body: Dict[str, Any]) -> None:
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self) -> None:
+        if self.path == '/calls':
+            with _lock:
+                self.reply(200, {'calls': list(_calls)})
+        else:
+            self.reply(404, {'ok': False, 'description': 'Not Found'})
+
+    def do_DELETE(self) -> None:
+        with _lock:
+            _calls.clear()
+            _last_sent.clear()
+        self.reply(200, {'ok': True})
+
+    def do_POST(self) -> None:
+        received_at = time.time()
+        raw = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        method = self.path.rsplit('/', 1)[-1]
+        fields, photo = parse_body(self.headers.get('Content-Type', ''), raw)
+        chat_id = str(fields.get('chat_id', ''))
+
+        if self.options.latency_ms:
+            time.sleep(self.options.latency_ms / 1000)
+
+        status, body = 200, None
+        with _lock:
+            if random.random() < self.options.error_rate:
+                status, body = 500, {'ok': False, 'error_code': 500, 'description': 'Internal Server Error'}
+            elif chat_id and self.options.chat_rate:
+                elapsed = received_at - _last_sent.get(chat_id, 0.0)
+                min_gap = 1 / self.options.chat_rate
+                if elapsed < min_gap:
+                    retry_after = max(1, int(min_gap - elapsed + 0.999))
+                    status, body = 429, {
+                        'ok': False,
+                        'error_code': 429,
+                        'description': f'Too Many Requests: retry after {retry_after}',
+                        'parameters': {'retry_after': retry_after}
+                    }
+                else:
+                    _last_sent[chat_id] = received_at
+            _calls.append({
+                'method': method,
+                'chat_id': chat_id,
+                'status': status,
+                'photo_bytes': len(photo),
+                'received_at': received_at,
+                'fields': {key: value for key, value in fields.items() if key != 'photo'},
+            })
+
+        if body is None:
+            body = {'ok': True, 'result': self.result_for(method, chat_id, fields, photo)}
+        self.reply(status, body)
+
+    def result_for(self, method: str, chat_id: str, fields: Dict[str, Any], photo: bytes) -> Any:
+        if method == 'answerCallbackQuery':
+            return True
+        message: Dict[str, Any] = {
+            'message_id': next(_message_ids),
+            'date': int(time.time()),
+            'chat': {'id': int(chat_id) if chat_id.lstrip('-').isdigit() else chat_id},
+        }
+        if method == 'sendPhoto':
+            photo_id = fields.get('photo') or 'stub-' + hashlib.sha256(photo).hexdigest()[:32]
+            message['photo'] = [{'file_id': photo_id, 'file_unique_id': photo_id[-16:], 'file_size': len(photo)}]
+        if 'text' in fields:
+            message['text'] = fields['text']
+        return message
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--chat-rate', type=float, default=0)
+    parser.add_argument('--error-rate', type=float, default=0)
+    TelegramStub.options = parser.parse_args()
+
+    server = ThreadingHTTPServer((TelegramStub.options.host, TelegramStub.options.port), TelegramStub)
+    print(f'Telegram Bot API stub on http://{TelegramStub.options.host}:{TelegramStub.options.port}')
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
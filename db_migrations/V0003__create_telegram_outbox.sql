@@ -0,0 +1,18 @@
+CREATE TABLE IF NOT EXISTS telegram_outbox (
+    id BIGSERIAL PRIMARY KEY,
+    method VARCHAR(64) NOT NULL,
+    chat_id VARCHAR(64) NOT NULL,
+    payload JSONB NOT NULL,
+    photo BYTEA,
+    photo_filename VARCHAR(255),
+    photo_content_type VARCHAR(64),
+    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    last_error TEXT,
+    response JSONB,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    sent_at TIMESTAMP
+);
+
+CREATE INDEX idx_telegram_outbox_due ON telegram_outbox(next_attempt_at, id) WHERE status = 'pending';
@@ -0,0 +1,18 @@
+CREATE TABLE IF NOT EXISTS telegram_files (
+    content_sha256 CHAR(64) PRIMARY KEY,
+    file_id TEXT NOT NULL,
+    file_unique_id TEXT,
+    byte_size INTEGER,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS transaction_images (
+    id SERIAL PRIMARY KEY,
+    transaction_id INTEGER NOT NULL,
+    image_type VARCHAR(20) NOT NULL,
+    content_sha256 CHAR(64) NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    UNIQUE (transaction_id, image_type, content_sha256)
+);
+
+ALTER TABLE telegram_outbox ADD COLUMN IF NOT EXISTS content_sha256 CHAR(64);
@@ -0,0 +1,12 @@
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    scope VARCHAR(32) NOT NULL,
+    key VARCHAR(255) NOT NULL,
+    request_sha256 CHAR(64),
+    status_code INTEGER,
+    body TEXT,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    expires_at TIMESTAMP NOT NULL,
+    PRIMARY KEY (scope, key)
+);
+
+CREATE INDEX idx_idempotency_keys_expires_at ON idempotency_keys(expires_at);
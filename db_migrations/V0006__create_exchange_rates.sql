@@ -0,0 +1,12 @@
+CREATE TABLE IF NOT EXISTS exchange_rates (
+    id SERIAL PRIMARY KEY,
+    currency VARCHAR(10) NOT NULL,
+    units_per_cny NUMERIC(18, 8) NOT NULL CHECK (units_per_cny > 0),
+    source VARCHAR(64) NOT NULL DEFAULT 'manual',
+    effective_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX idx_exchange_rates_currency_effective ON exchange_rates(currency, effective_at DESC);
+
+INSERT INTO exchange_rates (currency, units_per_cny, source)
+VALUES ('RUB', 11.40, 'seed');
@@ -0,0 +1,52 @@
+CREATE TABLE IF NOT EXISTS transaction_stats_daily (
+    day DATE NOT NULL,
+    status VARCHAR(50) NOT NULL,
+    currency VARCHAR(10) NOT NULL,
+    tx_count BIGINT NOT NULL DEFAULT 0,
+    amount_sum NUMERIC(18, 2) NOT NULL DEFAULT 0,
+    amount_cny_sum NUMERIC(18, 2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, status, currency)
+);
+
+-- Сводка меняется в той же транзакции, что и строка transactions: INSERT из POST,
+-- смена статуса из PUT и из telegram-webhook, удаление
+CREATE OR REPLACE FUNCTION transaction_stats_apply() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE transaction_stats_daily
+        SET tx_count = tx_count - 1,
+            amount_sum = amount_sum - OLD.amount,
+            amount_cny_sum = amount_cny_sum - OLD.amount_cny
+        WHERE day = OLD.created_at::date AND status = OLD.status AND currency = OLD.currency;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO transaction_stats_daily AS s (day, status, currency, tx_count, amount_sum, amount_cny_sum)
+        VALUES (NEW.created_at::date, NEW.status, NEW.currency, 1, NEW.amount, NEW.amount_cny)
+        ON CONFLICT (day, status, currency) DO UPDATE
+        SET tx_count = s.tx_count + 1,
+            amount_sum = s.amount_sum + EXCLUDED.amount_sum,
+            amount_cny_sum = s.amount_cny_sum + EXCLUDED.amount_cny_sum;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Миграция выполняется одной транзакцией: триггеры и начальное заполнение под одной блокировкой,
+-- чтобы ни одна вставка не проскочила между ними
+LOCK TABLE transactions IN SHARE ROW EXCLUSIVE MODE;
+
+CREATE TRIGGER trg_transaction_stats_insert_delete
+AFTER INSERT OR DELETE ON transactions
+FOR EACH ROW EXECUTE FUNCTION transaction_stats_apply();
+
+CREATE TRIGGER trg_transaction_stats_update
+AFTER UPDATE OF status, currency, amount, amount_cny, created_at ON transactions
+FOR EACH ROW
+WHEN ((OLD.status, OLD.currency, OLD.amount, OLD.amount_cny, OLD.created_at::date)
+      IS DISTINCT FROM (NEW.status, NEW.currency, NEW.amount, NEW.amount_cny, NEW.created_at::date))
+EXECUTE FUNCTION transaction_stats_apply();
+
+INSERT INTO transaction_stats_daily (day, status, currency, tx_count, amount_sum, amount_cny_sum)
+SELECT created_at::date, status, currency, COUNT(*), SUM(amount), SUM(amount_cny)
+FROM transactions
+GROUP BY created_at::date, status, currency;
@@ -0,0 +1,17 @@
+-- Смена статуса из PUT /transactions и из telegram-webhook (и любого будущего пути) публикуется одним триггером.
+-- NOTIFY доставляется слушателям только после коммита, откатившиеся изменения никто не увидит
+CREATE OR REPLACE FUNCTION transaction_status_notify() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify(
+        'transaction_status_changed',
+        json_build_object('id', NEW.id, 'status', NEW.status)::text
+    );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_transaction_status_notify
+AFTER UPDATE OF status ON transactions
+FOR EACH ROW
+WHEN (OLD.status IS DISTINCT FROM NEW.status)
+EXECUTE FUNCTION transaction_status_notify();
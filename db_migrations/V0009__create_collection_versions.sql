@@ -0,0 +1,24 @@
+-- Счётчик версии на коллекцию для ETag: любая запись в таблицу увеличивает его в той же транзакции.
+-- Триггер уровня оператора: пачка из тысячи строк двигает версию один раз
+CREATE TABLE IF NOT EXISTS collection_versions (
+    name VARCHAR(50) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0
+);
+
+INSERT INTO collection_versions (name) VALUES ('payment_details'), ('transactions')
+ON CONFLICT (name) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION collection_version_bump() RETURNS trigger AS $$
+BEGIN
+    UPDATE collection_versions SET version = version + 1 WHERE name = TG_TABLE_NAME;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_payment_details_version
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON payment_details
+FOR EACH STATEMENT EXECUTE FUNCTION collection_version_bump();
+
+CREATE TRIGGER trg_transactions_version
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON transactions
+FOR EACH STATEMENT EXECUTE FUNCTION collection_version_bump();
@@ -0,0 +1,28 @@
+-- Индексы под фактические запросы обработчиков; план каждого запроса проверяет benchmarks/query_plans.py
+-- Одиночные индексы по is_active и status заменены составными: булев флаг почти не отсекает строк,
+-- а status без created_at, id всё равно требует сортировки всех найденных строк перед LIMIT
+DROP INDEX IF EXISTS idx_payment_details_active;
+DROP INDEX IF EXISTS idx_transactions_status;
+DROP INDEX IF EXISTS idx_transactions_created_at;
+
+-- tx_create: активные реквизиты в валюте пополнения с минимальным id; INCLUDE отдаёт имя и счёт без чтения кучи
+CREATE INDEX idx_payment_details_active_currency ON payment_details(currency, id)
+    INCLUDE (recipient_name, account_number) WHERE is_active;
+
+-- Листинг без фильтров, по датам и по курсору: порядок индекса совпадает с ORDER BY created_at DESC, id DESC
+CREATE INDEX idx_transactions_created_at_id ON transactions(created_at DESC, id DESC);
+
+-- Листинг с фильтром по статусу или валюте читает первые limit строк индекса без сортировки;
+-- работает и в generic-плане подготовленного выражения, где значение параметра неизвестно
+CREATE INDEX idx_transactions_status_created_at_id ON transactions(status, created_at DESC, id DESC);
+CREATE INDEX idx_transactions_currency_created_at_id ON transactions(currency, created_at DESC, id DESC);
+
+-- Очередь ожидающих оплат: pending - малая доля таблицы, частичный индекс на порядки меньше полного
+CREATE INDEX idx_transactions_pending ON transactions(created_at, id)
+    INCLUDE (amount, currency, amount_cny, payment_detail_id) WHERE status = 'pending';
+
+-- Соединение с реквизитами и проверка внешнего ключа при удалении реквизитов
+CREATE INDEX idx_transactions_payment_detail_id ON transactions(payment_detail_id);
+
+ANALYZE payment_details;
+ANALYZE transactions;
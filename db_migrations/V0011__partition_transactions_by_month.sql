@@ -0,0 +1,100 @@
+-- transactions становится секционированной по месяцам created_at. Закрытые месяцы без pending
+-- отсоединяет и уносит в схему archive функция transactions-archiver, она же создаёт секции наперёд.
+-- Первичный ключ обязан включать ключ секционирования, поэтому он теперь (id, created_at);
+-- уникальность id по-прежнему обеспечивает последовательность transactions_id_seq
+CREATE SCHEMA IF NOT EXISTS archive;
+
+CREATE OR REPLACE FUNCTION transactions_create_partition(month DATE) RETURNS TEXT AS $$
+DECLARE
+    month_start DATE := date_trunc('month', month)::date;
+    partition_name TEXT := 'transactions_' || to_char(month_start, 'YYYY_MM');
+BEGIN
+    IF to_regclass('public.' || partition_name) IS NULL THEN
+        EXECUTE format(
+            'CREATE TABLE public.%I PARTITION OF transactions FOR VALUES FROM (%L) TO (%L)',
+            partition_name, month_start, (month_start + interval '1 month')::date
+        );
+    END IF;
+    RETURN partition_name;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Вся миграция идёт одной транзакцией под эксклюзивной блокировкой: ни одна запись не потеряется при переносе
+LOCK TABLE transactions IN ACCESS EXCLUSIVE MODE;
+
+ALTER TABLE transactions RENAME TO transactions_unpartitioned;
+-- Имена индексов общие на схему: освобождаем их для новой таблицы, старая всё равно будет удалена
+ALTER TABLE transactions_unpartitioned DROP CONSTRAINT transactions_pkey;
+DROP INDEX idx_transactions_created_at_id;
+DROP INDEX idx_transactions_status_created_at_id;
+DROP INDEX idx_transactions_currency_created_at_id;
+DROP INDEX idx_transactions_pending;
+DROP INDEX idx_transactions_payment_detail_id;
+
+CREATE TABLE transactions (
+    id INTEGER NOT NULL DEFAULT nextval('transactions_id_seq'),
+    amount DECIMAL(10, 2) NOT NULL,
+    currency VARCHAR(10) NOT NULL DEFAULT 'CNY',
+    amount_cny DECIMAL(10, 2) NOT NULL,
+    status VARCHAR(50) NOT NULL DEFAULT 'pending',
+    payment_detail_id INTEGER REFERENCES payment_details(id),
+    qr_code_url TEXT,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    updated_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    payment_proof_url TEXT,
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+-- Иначе DROP старой таблицы унесёт с собой и последовательность
+ALTER SEQUENCE transactions_id_seq OWNED BY transactions.id;
+
+-- Секции с первого месяца, где есть данные, и на три месяца вперёд
+SELECT transactions_create_partition(month::date)
+FROM generate_series(
+    date_trunc('month', LEAST(COALESCE((SELECT MIN(created_at) FROM transactions_unpartitioned), NOW()), NOW())),
+    date_trunc('month', NOW()) + interval '3 months',
+    interval '1 month'
+) AS month;
+
+-- Индексы на родителе создаются и на всех секциях, включая будущие
+CREATE INDEX idx_transactions_created_at_id ON transactions(created_at DESC, id DESC);
+CREATE INDEX idx_transactions_status_created_at_id ON transactions(status, created_at DESC, id DESC);
+CREATE INDEX idx_transactions_currency_created_at_id ON transactions(currency, created_at DESC, id DESC);
+CREATE INDEX idx_transactions_pending ON transactions(created_at, id)
+    INCLUDE (amount, currency, amount_cny, payment_detail_id) WHERE status = 'pending';
+CREATE INDEX idx_transactions_payment_detail_id ON transactions(payment_detail_id);
+
+-- Перенос до создания триггеров: сводка transaction_stats_daily уже учитывает эти строки
+INSERT INTO transactions (id, amount, currency, amount_cny, status, payment_detail_id, qr_code_url,
+                          created_at, updated_at, payment_proof_url)
+SELECT id, amount, currency, amount_cny, status, payment_detail_id, qr_code_url,
+       created_at, updated_at, payment_proof_url
+FROM transactions_unpartitioned;
+
+DROP TABLE transactions_unpartitioned;
+
+-- Триггеры V0007, V0008 и V0009 ушли вместе со старой таблицей; на родителе они действуют во всех секциях
+CREATE TRIGGER trg_transaction_stats_insert_delete
+AFTER INSERT OR DELETE ON transactions
+FOR EACH ROW EXECUTE FUNCTION transaction_stats_apply();
+
+CREATE TRIGGER trg_transaction_stats_update
+AFTER UPDATE OF status, currency, amount, amount_cny, created_at ON transactions
+FOR EACH ROW
+WHEN ((OLD.status, OLD.currency, OLD.amount, OLD.amount_cny, OLD.created_at::date)
+      IS DISTINCT FROM (NEW.status, NEW.currency, NEW.amount, NEW.amount_cny, NEW.created_at::date))
+EXECUTE FUNCTION transaction_stats_apply();
+
+CREATE TRIGGER trg_transaction_status_notify
+AFTER UPDATE OF status ON transactions
+FOR EACH ROW
+WHEN (OLD.status IS DISTINCT FROM NEW.status)
+EXECUTE FUNCTION transaction_status_notify();
+
+CREATE TRIGGER trg_transactions_version
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON transactions
+FOR EACH STATEMENT EXECUTE FUNCTION collection_version_bump();
+
+UPDATE collection_versions SET version = version + 1 WHERE name = 'transactions';
+
+ANALYZE transactions;
@@ -0,0 +1,15 @@
+-- Аренда ожидающих пополнений операторами: строку с непросроченной арендой не заберёт и не решит никто другой.
+-- Колонки не индексируются, поэтому взятие в аренду - HOT-обновление без записи в индексы
+ALTER TABLE transactions ADD COLUMN IF NOT EXISTS claimed_by VARCHAR(64);
+ALTER TABLE transactions ADD COLUMN IF NOT EXISTS claim_expires_at TIMESTAMP;
+
+-- Аренда не видна в листинге: ETag меняется только при записи колонок, которые листинг отдаёт
+DROP TRIGGER IF EXISTS trg_transactions_version ON transactions;
+
+CREATE TRIGGER trg_transactions_version
+AFTER INSERT OR DELETE OR TRUNCATE ON transactions
+FOR EACH STATEMENT EXECUTE FUNCTION collection_version_bump();
+
+CREATE TRIGGER trg_transactions_version_update
+AFTER UPDATE OF amount, currency, amount_cny, status, payment_detail_id, created_at ON transactions
+FOR EACH STATEMENT EXECUTE FUNCTION collection_version_bump();
@@ -0,0 +1,103 @@
+-- Распределение пополнений по реквизитам: вес для взвешенного round-robin и необязательный дневной лимит в CNY
+ALTER TABLE payment_details ADD COLUMN IF NOT EXISTS weight INTEGER NOT NULL DEFAULT 1 CHECK (weight > 0);
+ALTER TABLE payment_details ADD COLUMN IF NOT EXISTS daily_cap_cny NUMERIC(12, 2) CHECK (daily_cap_cny > 0);
+
+-- Одна строка счётчиков на реквизит: выбор получателя читает только её, а не транзакции.
+-- wrr_pass - виртуальное время stride-планировщика: каждое назначение сдвигает его на 1 / weight
+CREATE TABLE IF NOT EXISTS payment_detail_load (
+    payment_detail_id INTEGER PRIMARY KEY REFERENCES payment_details(id) ON DELETE CASCADE,
+    wrr_pass NUMERIC(20, 6) NOT NULL DEFAULT 0,
+    pending_count INTEGER NOT NULL DEFAULT 0,
+    pending_amount_cny NUMERIC(18, 2) NOT NULL DEFAULT 0,
+    day DATE NOT NULL DEFAULT CURRENT_DATE,
+    day_amount_cny NUMERIC(18, 2) NOT NULL DEFAULT 0
+);
+
+-- Новые и снова включённые реквизиты встают в очередь с минимальным wrr_pass среди активных,
+-- иначе с нулём они забрали бы весь поток, пока не догонят остальных
+CREATE OR REPLACE FUNCTION payment_detail_load_init() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO payment_detail_load AS l (payment_detail_id, wrr_pass)
+    VALUES (NEW.id, COALESCE((
+        SELECT MIN(a.wrr_pass)
+        FROM payment_detail_load a
+        JOIN payment_details pd ON pd.id = a.payment_detail_id
+        WHERE pd.is_active = true AND pd.id <> NEW.id
+    ), 0))
+    ON CONFLICT (payment_detail_id) DO UPDATE SET wrr_pass = EXCLUDED.wrr_pass;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_payment_detail_load_insert
+AFTER INSERT ON payment_details
+FOR EACH ROW EXECUTE FUNCTION payment_detail_load_init();
+
+CREATE TRIGGER trg_payment_detail_load_activate
+AFTER UPDATE OF is_active ON payment_details
+FOR EACH ROW
+WHEN (NOT OLD.is_active AND NEW.is_active)
+EXECUTE FUNCTION payment_detail_load_init();
+
+-- Счётчики меняются в той же транзакции, что и строка transactions, при любом пути записи:
+-- POST, пакетный POST, PUT, очередь операторов и telegram-webhook
+CREATE OR REPLACE FUNCTION transaction_load_apply() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.status = 'pending' AND OLD.payment_detail_id IS NOT NULL THEN
+        UPDATE payment_detail_load
+        SET pending_count = pending_count - 1,
+            pending_amount_cny = pending_amount_cny - OLD.amount_cny
+        WHERE payment_detail_id = OLD.payment_detail_id;
+    END IF;
+    IF TG_OP = 'INSERT' AND NEW.payment_detail_id IS NOT NULL THEN
+        UPDATE payment_detail_load l
+        SET wrr_pass = l.wrr_pass + 1.0 / pd.weight,
+            day = GREATEST(l.day, NEW.created_at::date),
+            day_amount_cny = CASE
+                WHEN l.day = NEW.created_at::date THEN l.day_amount_cny + NEW.amount_cny
+                WHEN l.day < NEW.created_at::date THEN NEW.amount_cny
+                ELSE l.day_amount_cny
+            END,
+            pending_count = l.pending_count + (NEW.status = 'pending')::int,
+            pending_amount_cny = l.pending_amount_cny + CASE WHEN NEW.status = 'pending' THEN NEW.amount_cny ELSE 0 END
+        FROM payment_details pd
+        WHERE l.payment_detail_id = NEW.payment_detail_id AND pd.id = NEW.payment_detail_id;
+    ELSIF TG_OP = 'UPDATE' AND NEW.status = 'pending' AND NEW.payment_detail_id IS NOT NULL THEN
+        UPDATE payment_detail_load
+        SET pending_count = pending_count + 1,
+            pending_amount_cny = pending_amount_cny + NEW.amount_cny
+        WHERE payment_detail_id = NEW.payment_detail_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Триггеры и начальное заполнение под одной блокировкой, как в V0007
+LOCK TABLE transactions IN SHARE ROW EXCLUSIVE MODE;
+
+CREATE TRIGGER trg_transaction_load_insert_delete
+AFTER INSERT OR DELETE ON transactions
+FOR EACH ROW EXECUTE FUNCTION transaction_load_apply();
+
+CREATE TRIGGER trg_transaction_load_update
+AFTER UPDATE OF status, amount_cny, payment_detail_id ON transactions
+FOR EACH ROW
+WHEN ((OLD.status, OLD.amount_cny, OLD.payment_detail_id) IS DISTINCT FROM (NEW.status, NEW.amount_cny, NEW.payment_detail_id))
+EXECUTE FUNCTION transaction_load_apply();
+
+INSERT INTO payment_detail_load (payment_detail_id, pending_count, pending_amount_cny, day, day_amount_cny)
+SELECT pd.id,
+       COALESCE(pending.tx_count, 0), COALESCE(pending.amount_cny, 0),
+       CURRENT_DATE, COALESCE(today.amount_cny, 0)
+FROM payment_details pd
+LEFT JOIN (
+    SELECT payment_detail_id, COUNT(*) AS tx_count, SUM(amount_cny) AS amount_cny
+    FROM transactions WHERE status = 'pending'
+    GROUP BY payment_detail_id
+) pending ON pending.payment_detail_id = pd.id
+LEFT JOIN (
+    SELECT payment_detail_id, SUM(amount_cny) AS amount_cny
+    FROM transactions WHERE created_at >= CURRENT_DATE
+    GROUP BY payment_detail_id
+) today ON today.payment_detail_id = pd.id
+ON CONFLICT (payment_detail_id) DO NOTHING;
@@ -0,0 +1,20 @@
+-- Версия коллекции делится на 16 строк-слотов: запись увеличивает слот своего соединения (pg_backend_pid() % 16),
+-- и параллельные транзакции из пула не выстраиваются в очередь за блокировкой одной строки до коммита.
+-- Версия - SUM(version) по слотам: обычное MVCC-чтение, новое значение видно ровно вместе с закоммиченными данными
+ALTER TABLE collection_versions ADD COLUMN IF NOT EXISTS slot SMALLINT NOT NULL DEFAULT 0;
+ALTER TABLE collection_versions DROP CONSTRAINT IF EXISTS collection_versions_pkey;
+ALTER TABLE collection_versions ADD PRIMARY KEY (name, slot);
+
+INSERT INTO collection_versions (name, slot)
+SELECT c.name, s.slot
+FROM (VALUES ('payment_details'), ('transactions')) AS c(name)
+CROSS JOIN generate_series(1, 15) AS s(slot)
+ON CONFLICT (name, slot) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION collection_version_bump() RETURNS trigger AS $$
+BEGIN
+    UPDATE collection_versions SET version = version + 1
+    WHERE name = TG_TABLE_NAME AND slot = pg_backend_pid() % 16;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
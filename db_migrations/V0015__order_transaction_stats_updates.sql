@@ -0,0 +1,42 @@
+-- Смена статуса трогает две строки сводки: старый ключ уменьшается, новый увеличивается. Раньше порядок был
+-- всегда «старый, затем новый», и встречные смены статуса блокировали одни и те же строки в разном порядке.
+-- Теперь меньший ключ (day, status, currency) трогается первым - в том же порядке, в каком пачки из
+-- transactions/stats.py блокируют строки сводки заранее
+CREATE OR REPLACE FUNCTION transaction_stats_remove(
+    p_day DATE, p_status VARCHAR, p_currency VARCHAR, p_amount NUMERIC, p_amount_cny NUMERIC
+) RETURNS void AS $$
+    UPDATE transaction_stats_daily
+    SET tx_count = tx_count - 1,
+        amount_sum = amount_sum - p_amount,
+        amount_cny_sum = amount_cny_sum - p_amount_cny
+    WHERE day = p_day AND status = p_status AND currency = p_currency;
+$$ LANGUAGE sql;
+
+CREATE OR REPLACE FUNCTION transaction_stats_add(
+    p_day DATE, p_status VARCHAR, p_currency VARCHAR, p_amount NUMERIC, p_amount_cny NUMERIC
+) RETURNS void AS $$
+    INSERT INTO transaction_stats_daily AS s (day, status, currency, tx_count, amount_sum, amount_cny_sum)
+    VALUES (p_day, p_status, p_currency, 1, p_amount, p_amount_cny)
+    ON CONFLICT (day, status, currency) DO UPDATE
+    SET tx_count = s.tx_count + 1,
+        amount_sum = s.amount_sum + EXCLUDED.amount_sum,
+        amount_cny_sum = s.amount_cny_sum + EXCLUDED.amount_cny_sum;
+$$ LANGUAGE sql;
+
+CREATE OR REPLACE FUNCTION transaction_stats_apply() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE'
+       AND (NEW.created_at::date, NEW.status, NEW.currency) < (OLD.created_at::date, OLD.status, OLD.currency) THEN
+        PERFORM transaction_stats_add(NEW.created_at::date, NEW.status, NEW.currency, NEW.amount, NEW.amount_cny);
+        PERFORM transaction_stats_remove(OLD.created_at::date, OLD.status, OLD.currency, OLD.amount, OLD.amount_cny);
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM transaction_stats_remove(OLD.created_at::date, OLD.status, OLD.currency, OLD.amount, OLD.amount_cny);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM transaction_stats_add(NEW.created_at::date, NEW.status, NEW.currency, NEW.amount, NEW.amount_cny);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
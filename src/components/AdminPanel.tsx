@@ -38,6 +38,7 @@ interface AdminPanelProps {
 const AdminPanel = ({ onBack }: AdminPanelProps) => {
   const [paymentDetails, setPaymentDetails] = useState<PaymentDetail[]>([]);
   const [transactions, setTransactions] = useState<Transaction[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [view, setView] = useState<'payment-details' | 'transactions'>('payment-details');
   const [editingId, setEditingId] = useState<number | null>(null);
   const [formData, setFormData] = useState({
@@ -56,9 +57,10 @@ const AdminPanel = ({ onBack }: AdminPanelProps) => {
     }
   }, [view]);
 
-  const fetchPaymentDetails = async () => {
+  const fetchPaymentDetails = async (afterWrite = false) => {
     try {
-      const response = await fetch(PAYMENT_DETAILS_URL);
+      // Сразу после своей записи читаем с мастера: реплика может ещё не получить изменение
+      const response = await fetch(PAYMENT_DETAILS_URL, afterWrite ? { headers: { 'X-Consistency': 'primary' } } : undefined);
       const data = await response.json();
       setPaymentDetails(data);
     } catch (error) {
@@ -66,11 +68,13 @@ const AdminPanel = ({ onBack }: AdminPanelProps) => {
     }
   };
 
-  const fetchTransactions = async () => {
+  // API отдаёт страницы по курсору: без cursor - первая, следующие дописываются в конец списка
+  const fetchTransactions = async (cursor?: string) => {
     try {
-      const response = await fetch(TRANSACTIONS_URL);
+      const response = await fetch(cursor ? `${TRANSACTIONS_URL}?cursor=${encodeURIComponent(cursor)}` : TRANSACTIONS_URL);
       const data = await response.json();
-      setTransactions(data);
+      setTransactions((current) => (cursor ? [...current, ...data.transactions] : data.transactions));
+      setNextCursor(data.next_cursor ?? null);
     } catch (error) {
       console.error('Failed to fetch transactions:', error);
     }
@@ -113,7 +117,7 @@ const AdminPanel = ({ onBack }: AdminPanelProps) => {
 
       setFormData({ recipient_name: '', account_number: '', currency: 'CNY', is_active: true });
       setEditingId(null);
-      fetchPaymentDetails();
+      fetchPaymentDetails(true);
     } catch (error) {
       console.error('Failed to save payment detail:', error);
       toast({
@@ -145,7 +149,7 @@ const AdminPanel = ({ onBack }: AdminPanelProps) => {
         title: '✅ Успешно',
         description: 'Реквизит удален',
       });
-      fetchPaymentDetails();
+      fetchPaymentDetails(true);
     } catch (error) {
       console.error('Failed to delete payment detail:', error);
       toast({
@@ -395,6 +399,11 @@ const AdminPanel = ({ onBack }: AdminPanelProps) => {
                   </Card>
                 ))
               )}
+              {nextCursor && (
+                <Button variant="outline" className="w-full" onClick={() => fetchTransactions(nextCursor)}>
+                  Показать ещё
+                </Button>
+              )}
             </div>
           )}
         </div>
@@ -17,10 +17,12 @@ interface Transaction {
 
 interface HistoryViewProps {
   transactions: Transaction[];
+  hasMore: boolean;
+  onLoadMore: () => void;
   onBack: () => void;
 }
 
-const HistoryView = ({ transactions, onBack }: HistoryViewProps) => {
+const HistoryView = ({ transactions, hasMore, onLoadMore, onBack }: HistoryViewProps) => {
   const getStatusIcon = (status: string) => {
     switch (status) {
       case 'completed':
@@ -103,6 +105,11 @@ const HistoryView = ({ transactions, onBack }: HistoryViewProps) => {
                 </div>
               ))
             )}
+            {hasMore && (
+              <Button variant="outline" className="w-full" onClick={onLoadMore}>
+                Показать ещё
+              </Button>
+            )}
           </div>
         </Card>
       </div>
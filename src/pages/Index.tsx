@@ -26,6 +26,8 @@ interface Transaction {
 const CNY_TO_RUB_RATE = 11.40;
 const API_BASE_URL = 'https://functions.poehali.dev';
 const TRANSACTIONS_URL = `${API_BASE_URL}/414252e7-8c91-4292-98d5-f6fd21aab3f4`;
+// История показывает только эти поля; реквизиты получателя ей не нужны
+const HISTORY_FIELDS = 'id,amount,currency,amount_cny,status,date';
 
 const Index = () => {
   const [view, setView] = useState<View>('main');
@@ -35,6 +37,7 @@ const Index = () => {
   const [qrUploaded, setQrUploaded] = useState(false);
   const [paymentProofUploaded, setPaymentProofUploaded] = useState(false);
   const [transactions, setTransactions] = useState<Transaction[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [currentTransaction, setCurrentTransaction] = useState<Transaction | null>(null);
   const { toast } = useToast();
 
@@ -51,11 +54,14 @@ const Index = () => {
     }
   }, [view]);
 
-  const fetchTransactions = async () => {
+  // API отдаёт страницы по курсору: без cursor - первая, следующие дописываются в конец истории
+  const fetchTransactions = async (cursor?: string) => {
     try {
-      const response = await fetch(TRANSACTIONS_URL);
+      const query = `fields=${HISTORY_FIELDS}` + (cursor ? `&cursor=${encodeURIComponent(cursor)}` : '');
+      const response = await fetch(`${TRANSACTIONS_URL}?${query}`);
       const data = await response.json();
-      setTransactions(data);
+      setTransactions((current) => (cursor ? [...current, ...data.transactions] : data.transactions));
+      setNextCursor(data.next_cursor ?? null);
     } catch (error) {
       console.error('Failed to fetch transactions:', error);
     }
@@ -190,40 +196,48 @@ const Index = () => {
           description: 'Ожидайте подтверждения...',
         });
 
-        // Запускаем проверку статуса каждые 3 секунды
-        const statusCheckInterval = setInterval(async () => {
-          if (!currentTransaction) return;
-          
-          const response = await fetch(TRANSACTIONS_URL);
-          const transactions = await response.json();
-          const updatedTransaction = transactions.find((t: Transaction) => t.id === currentTransaction.id);
-          
-          if (updatedTransaction && updatedTransaction.status !== 'pending') {
-            clearInterval(statusCheckInterval);
-            
-            if (updatedTransaction.status === 'completed') {
-              toast({
-                title: '✅ Оплата получена!',
-                description: 'Средства зачислены на ваш счёт',
-              });
-            } else if (updatedTransaction.status === 'failed') {
-              toast({
-                title: '❌ Платёж отказан',
-                description: 'Попробуйте снова или обратитесь в поддержку',
-                variant: 'destructive',
-              });
+        // Long-poll: сервер держит запрос до смены статуса (или до таймаута), вместо опроса всей ленты каждые 3 секунды
+        const watchStatus = async (transactionId: number) => {
+          const deadline = Date.now() + 300000;
+          let status = 'pending';
+
+          while (status === 'pending' && Date.now() < deadline) {
+            try {
+              const response = await fetch(
+                `${TRANSACTIONS_URL}?view=watch&id=${transactionId}&status=${status}&timeout=25`
+              );
+              if (response.status === 404) return;
+              if (!response.ok) throw new Error(`HTTP ${response.status}`);
+              ({ status } = await response.json());
+            } catch (error) {
+              console.error('Failed to watch transaction status:', error);
+              await new Promise((resolve) => setTimeout(resolve, 3000));
             }
-            
-            setTimeout(() => {
-              handleTopupComplete();
-            }, 2000);
           }
-        }, 3000);
 
-        // Останавливаем проверку через 5 минут
-        setTimeout(() => {
-          clearInterval(statusCheckInterval);
-        }, 300000);
+          if (status === 'pending') return;
+
+          if (status === 'completed') {
+            toast({
+              title: '✅ Оплата получена!',
+              description: 'Средства зачислены на ваш счёт',
+            });
+          } else if (status === 'failed') {
+            toast({
+              title: '❌ Платёж отказан',
+              description: 'Попробуйте снова или обратитесь в поддержку',
+              variant: 'destructive',
+            });
+          }
+
+          setTimeout(() => {
+            handleTopupComplete();
+          }, 2000);
+        };
+
+        if (currentTransaction) {
+          watchStatus(currentTransaction.id);
+        }
       };
       
       reader.readAsDataURL(file);
@@ -276,6 +290,8 @@ const Index = () => {
     return (
       <HistoryView
         transactions={transactions}
+        hasMore={nextCursor !== null}
+        onLoadMore={() => nextCursor && fetchTransactions(nextCursor)}
         onBack={() => setView('main')}
       />
     );